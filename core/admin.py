@@ -1,6 +1,140 @@
+import json
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Job, JobTask, Equipment
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from .models import ArchivedJob, User, Job, JobTask, Equipment
+
+# Seconds a table's row estimate is reused for
+ROW_ESTIMATE_CACHE_SECONDS = 60
+
+def estimated_rows(model, using='default'):
+    """PostgreSQL's row count of ``model``'s table as of its last VACUUM or
+    ANALYZE, -1 before the first one."""
+    table = model._meta.db_table
+
+    def estimate():
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            return cursor.fetchone()[0]
+    return cache.get_or_set(f'admin:rows:{using}:{table}', estimate, ROW_ESTIMATE_CACHE_SECONDS)
+
+def planned_rows(queryset):
+    """The planner's row estimate for ``queryset``, without running it."""
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']['Plan Rows']
+
+def is_large(model, using='default'):
+    return estimated_rows(model, using) > settings.ADMIN_LARGE_TABLE_ROWS
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist paginator that does not COUNT(*) large tables.
+
+    The whole table is counted from ``reltuples``, a filtered or searched
+    list from the planner's estimate while that is above
+    ADMIN_LARGE_TABLE_ROWS; smaller results are counted exactly, through
+    their indexes. An overestimate leaves the last pages empty.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not is_large(queryset.model, queryset.db):
+            return super().count
+        if not queryset.query.where:
+            return estimated_rows(queryset.model, queryset.db)
+        planned = planned_rows(queryset)
+        return planned if planned > settings.ADMIN_LARGE_TABLE_ROWS else super().count
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Filter on a foreign key picked through the related admin's
+    autocomplete, which needs search_fields, rather than from a list of
+    every related row as RelatedFieldListFilter renders."""
+    template = 'admin/core/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_kwarg_isnull = f'{field_path}__isnull'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        self.lookup_val_isnull = params.get(self.lookup_kwarg_isnull)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.admin_site = model_admin.admin_site
+        self.empty_value_display = model_admin.get_empty_value_display()
+
+    def expected_parameters(self):
+        if self.field.null:
+            return [self.lookup_kwarg, self.lookup_kwarg_isnull]
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # Picking a row submits a form, which carries the other parameters
+        self.hidden_params = [
+            (name, value) for name, value in changelist.params.items() if name not in self.expected_parameters()
+        ]
+        yield {
+            'selected': self.lookup_val is None and self.lookup_val_isnull is None,
+            'query_string': changelist.get_query_string(remove=self.expected_parameters()),
+            'display': _('All'),
+        }
+        if self.field.null:
+            yield {
+                'selected': self.lookup_val_isnull is not None,
+                'query_string': changelist.get_query_string({self.lookup_kwarg_isnull: 'True'}, [self.lookup_kwarg]),
+                'display': self.empty_value_display,
+            }
+
+    def rendered_widget(self):
+        # Only the selected row is loaded; the rest are searched as the user
+        # types
+        widget = self.field.formfield(
+            widget=AutocompleteSelect(self.field, self.admin_site, attrs={'style': 'width: 100%'}),
+        ).widget
+        return widget.render(self.lookup_kwarg, self.lookup_val, attrs={'id': f'id_filter_{self.lookup_kwarg}'})
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist for tables of millions of rows.
+
+    Tables PostgreSQL estimates at more than ADMIN_LARGE_TABLE_ROWS rows are
+    counted from estimates (EstimatedCountPaginator) and searched for fields
+    starting with the search term, which the ``*_prefix_idx`` indexes serve,
+    rather than containing each of its words, which scans the table. The
+    unfiltered total is never counted.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_fields(self, request):
+        search_fields = super().get_search_fields(request)
+        if not is_large(self.model):
+            return search_fields
+        return tuple(field if field[0] in '^=@' else f'^{field}' for field in search_fields)
+
+    def get_search_results(self, request, queryset, search_term):
+        # A prefix is matched as typed rather than word by word, so "acme co"
+        # finds "Acme Corp"
+        if search_term.strip() and is_large(self.model):
+            search_term = '"%s"' % search_term.strip().replace('\\', '\\\\').replace('"', '\\"')
+        return super().get_search_results(request, queryset, search_term)
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, tuple) and issubclass(list_filter[1], AutocompleteFilter):
+                field = get_fields_from_path(self.model, list_filter[0])[-1]
+                media += AutocompleteSelect(field, self.admin_site).media
+                media += forms.Media(js=['core/autocomplete_filter.js'])
+        return media
 
 class UserAdmin(BaseUserAdmin):
     list_display = ('username', 'email', 'role', 'is_staff', 'is_active')
@@ -20,17 +154,25 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
-class JobAdmin(admin.ModelAdmin):
+class JobAdmin(LargeTableAdmin):
     list_display = ('title', 'client_name', 'status', 'priority', 'scheduled_date', 'overdue', 'created_by', 'assigned_to')
-    list_filter = ('status', 'priority', 'overdue')
+    # Only non-null foreign keys are joined by default, and assigned_to may be empty
+    list_select_related = ('created_by', 'assigned_to')
+    list_filter = ('status', 'priority', 'overdue', ('assigned_to', AutocompleteFilter))
     search_fields = ('title', 'client_name')
     ordering = ('-scheduled_date',)
+    autocomplete_fields = ('created_by', 'assigned_to')
 
-class JobTaskAdmin(admin.ModelAdmin):
+class JobTaskAdmin(LargeTableAdmin):
     list_display = ('title', 'job', 'status', 'order', 'completed_at')
-    list_filter = ('status', 'job')
-    search_fields = ('title', 'job__title')
-    ordering = ('job', 'order')
+    list_select_related = ('job',)
+    # Tasks of a job are found through the job filter, not by job title
+    list_filter = ('status', ('job', AutocompleteFilter))
+    search_fields = ('title',)
+    # Ends on the primary key so the admin does not append -pk, which the
+    # job_id index could not serve
+    ordering = ('job', 'order', 'id')
+    autocomplete_fields = ('job',)
     filter_horizontal = ('required_equipment',)
 
 class EquipmentAdmin(admin.ModelAdmin):
@@ -39,7 +181,22 @@ class EquipmentAdmin(admin.ModelAdmin):
     search_fields = ('name', 'serial_number')
     ordering = ('name',)
 
+class ArchivedJobAdmin(LargeTableAdmin):
+    # Read-only: `manage.py archive_jobs --restore` moves a job back to edit it
+    list_display = ('title', 'client_name', 'status', 'priority', 'scheduled_date', 'assigned_to', 'archived_at')
+    list_select_related = ('assigned_to',)
+    list_filter = ('status', 'priority')
+    search_fields = ('title', 'client_name')
+    ordering = ('-scheduled_date',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Job, JobAdmin)
 admin.site.register(JobTask, JobTaskAdmin)
-admin.site.register(Equipment, EquipmentAdmin)
\ No newline at end of file
+admin.site.register(Equipment, EquipmentAdmin)
+admin.site.register(ArchivedJob, ArchivedJobAdmin)
\ No newline at end of file
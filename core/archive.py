@@ -0,0 +1,135 @@
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .dashboard import bump_dashboard_version
+from .models import ArchivedJob, ArchivedJobTask, Job, JobTask
+from .overdue import run_in_chunks
+from .reservations import mark_reservations_changed
+from .workload import job_buckets, mark_workload_changed
+
+
+def _links(task_model):
+    # The M2M table of a task model and its task column
+    field = task_model._meta.get_field('required_equipment')
+    return field.remote_field.through._meta.db_table, field.m2m_column_name()
+
+
+def _plan(source_job, source_task, target_job, target_task, stamps):
+    # (source table, target table, [(target column, source expression)],
+    # condition on the job ids) for jobs, tasks and equipment links, parents
+    # first. ``stamps`` maps job columns to an SQL expression to write
+    # instead.
+    quote = connection.ops.quote_name
+    source_links, source_key = _links(source_task)
+    target_links, target_key = _links(target_task)
+    source_tasks = source_task._meta.db_table
+
+    def columns(model, archived, stamps=None):
+        # The live model's columns the archive tables repeat. Search vectors
+        # are left out: the live tables' triggers rebuild them on insert.
+        stamps = stamps or {}
+        archived_columns = {field.column for field in archived._meta.concrete_fields}
+        names = [field.column for field in model._meta.concrete_fields if field.column in archived_columns]
+        names += [name for name in stamps if name not in names]
+        return [(quote(name), stamps.get(name, quote(name))) for name in names]
+
+    return [
+        (source_job._meta.db_table, target_job._meta.db_table, columns(Job, ArchivedJob, stamps), 'id = ANY(%s)'),
+        (source_tasks, target_task._meta.db_table, columns(JobTask, ArchivedJobTask), 'job_id = ANY(%s)'),
+        (
+            source_links, target_links,
+            [(quote(target_key), quote(source_key)), ('equipment_id', 'equipment_id')],
+            f'{quote(source_key)} IN (SELECT id FROM {source_tasks} WHERE job_id = ANY(%s))',
+        ),
+    ]
+
+
+def _transfer(plan, job_ids):
+    # Copy the rows of job_ids to the target tables, then delete them from
+    # the source ones, children first
+    with connection.cursor() as cursor:
+        for source, target, pairs, condition in plan:
+            cursor.execute(
+                f"INSERT INTO {target} ({', '.join(target for target, _ in pairs)}) "
+                f"SELECT {', '.join(source for _, source in pairs)} FROM {source} WHERE {condition}",
+                [job_ids],
+            )
+        for source, _, _, condition in reversed(plan):
+            cursor.execute(f'DELETE FROM {source} WHERE {condition}', [job_ids])
+
+
+def _changed(jobs, job_ids):
+    # A raw INSERT or DELETE sends no signals
+    user_ids = set(jobs.values_list('assigned_to_id', flat=True))
+    transaction.on_commit(lambda: bump_dashboard_version(*user_ids))
+    mark_workload_changed(job_buckets(jobs))
+    mark_reservations_changed(job_ids)
+
+
+def _archive(job_ids):
+    # The chunk's jobs are locked. Their tasks are locked too, and a job with
+    # a task someone else is writing stays for the next run, as its job
+    # update would wait on this transaction.
+    totals = dict(
+        JobTask.objects.filter(job__in=job_ids).values_list('job_id').annotate(tasks=Count('id')).order_by()
+    )
+    locked = Counter(
+        JobTask.objects.filter(job__in=job_ids).select_for_update(skip_locked=True).values_list('job_id', flat=True)
+    )
+    job_ids = [job_id for job_id in job_ids if locked[job_id] == totals.get(job_id, 0)]
+    if job_ids:
+        _changed(Job.objects.filter(id__in=job_ids), job_ids)
+        _transfer(_plan(Job, JobTask, ArchivedJob, ArchivedJobTask, {'archived_at': 'now()'}), job_ids)
+    return len(job_ids)
+
+
+def archive_completed_jobs(days=None, batch_size=None, time_budget=None):
+    """Move jobs completed over ``days`` ago (ARCHIVE_AFTER_DAYS) to
+    ArchivedJob, with their tasks and equipment links.
+
+    A job counts as completed when it was last written, as completing it
+    writes it. Chunks of ``batch_size`` jobs (ARCHIVE_BATCH_SIZE) move in
+    one transaction each, through run_in_chunks(), so a run stops after
+    ``time_budget`` seconds (ARCHIVE_TIME_BUDGET) and the next one resumes.
+    Returns its stats dict, with ``archived`` jobs.
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    candidates = Job.objects.filter(status='COMPLETED', updated_at__lt=timezone.now() - timedelta(days=days))
+    stats = run_in_chunks(
+        'archive_completed_jobs', candidates, _archive,
+        batch_size or settings.ARCHIVE_BATCH_SIZE,
+        settings.ARCHIVE_TIME_BUDGET if time_budget is None else time_budget,
+    )
+    stats['archived'] = stats.pop('updated')
+    return stats
+
+
+def restore_batch(job_ids):
+    """Move archived ``job_ids`` back to Job, with their tasks and equipment
+    links, in the current transaction. Ids no longer archived are skipped.
+
+    A restored job counts as written now, so it is not archived again for
+    another ARCHIVE_AFTER_DAYS. Returns the number of jobs restored.
+    """
+    batch = list(
+        ArchivedJob.objects.filter(id__in=sorted(set(job_ids))).select_for_update().values_list('id', flat=True)
+    )
+    if batch:
+        _transfer(_plan(ArchivedJob, ArchivedJobTask, Job, JobTask, {'updated_at': 'now()'}), batch)
+        _changed(Job.objects.filter(id__in=batch), batch)
+    return len(batch)
+
+
+def restore_jobs(job_ids):
+    """Restore archived ``job_ids`` with restore_batch(), ARCHIVE_BATCH_SIZE
+    jobs per transaction. Returns the number of jobs restored.
+    """
+    job_ids = sorted(set(job_ids))
+    restored = 0
+    for start in range(0, len(job_ids), settings.ARCHIVE_BATCH_SIZE):
+        with transaction.atomic():
+            restored += restore_batch(job_ids[start:start + settings.ARCHIVE_BATCH_SIZE])
+    return restored
@@ -0,0 +1,117 @@
+from asgiref.sync import sync_to_async
+from django.contrib import auth
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import StatelessJWTAuthentication
+from .dashboard import adashboard_key, aget_dashboard, dashboard_etag
+from .routers import aread_from_replica, replica_reads
+from .serializers import CustomTokenObtainPairSerializer
+from .throttling import LoginIPThrottle, LoginUsernameThrottle
+
+
+def render(data, status=200, headers=None):
+    # Same bytes as the DRF views render
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json', headers=headers)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    """An async Django view with the parts of DRF's APIView the async
+    endpoints use: JWT authentication, role checks, throttles and DRF's
+    error responses.
+
+    Under ASGI these run on the event loop. The ORM and cache calls go
+    through Django's async methods, and only throttle checks and, before
+    Django 5.0, the authentication backends run in threads.
+    """
+    # Roles allowed in; None lets anonymous requests in without authenticating
+    allowed_roles = None
+    throttle_classes = ()
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.drf_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+        try:
+            if self.allowed_roles is not None:
+                request.user = await self.authenticate(request)
+            if self.throttle_classes:
+                await sync_to_async(self.check_throttles)()
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        authenticated = await StatelessJWTAuthentication().aauthenticate(request)
+        if authenticated is None:
+            raise exceptions.NotAuthenticated()
+        user, _ = authenticated
+        if user.role not in self.allowed_roles:
+            raise exceptions.PermissionDenied()
+        return user
+
+    def check_throttles(self):
+        waits = [
+            throttle.wait() for throttle in (cls() for cls in self.throttle_classes)
+            if not throttle.allow_request(self.drf_request, self)
+        ]
+        if waits:
+            raise exceptions.Throttled(max(waits))
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers['WWW-Authenticate'] = StatelessJWTAuthentication().authenticate_header(self.drf_request)
+        if getattr(exc, 'wait', None):
+            headers['Retry-After'] = '%d' % exc.wait
+        detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return render(detail, exc.status_code, headers)
+
+
+class AsyncTechnicianDashboardView(AsyncAPIView):
+    """TechnicianDashboardView, including its ETag, as an async view."""
+    allowed_roles = ('TECHNICIAN',)
+
+    async def get(self, request):
+        key = await adashboard_key(request.user)
+        etag = quote_etag(dashboard_etag(key))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            with replica_reads():
+                await aread_from_replica(request.user)
+                response = render(await aget_dashboard(request.user, key))
+        if response.status_code in (200, 304):
+            response.headers['ETag'] = etag
+        return response
+
+
+# Django 5.0 added aauthenticate(); before it the backends run in the
+# thread sync ORM calls share
+aauthenticate = getattr(auth, 'aauthenticate', None) or sync_to_async(auth.authenticate)
+
+
+class AsyncTokenObtainPairView(AsyncAPIView):
+    """CustomTokenObtainPairView, including its throttles, as an async view."""
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
+
+    async def post(self, request):
+        serializer = CustomTokenObtainPairSerializer()
+        try:
+            credentials = serializer.to_internal_value(self.drf_request.data)
+        except exceptions.ValidationError as exc:
+            return render(exc.detail, exc.status_code)
+        # Through AUTHENTICATION_BACKENDS, as simplejwt's serializer does, so
+        # inactive users are refused and failures send user_login_failed
+        user = await aauthenticate(request, username=credentials['username'], password=credentials['password'])
+        if not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            await sync_to_async(LoginUsernameThrottle().record_failure)(self.drf_request)
+            raise exceptions.AuthenticationFailed(serializer.error_messages['no_active_account'], 'no_active_account')
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        return render({'refresh': str(refresh), 'access': str(refresh.access_token)})
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+from .profiling import section
+
+TOKEN_VERSION_CLAIM = 'ver'
+CACHE_PREFIX = 'auth:token-version'
+
+
+class ClaimsUser(TokenUser):
+    """A user built from the access token alone; ``role`` is a token claim."""
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+
+def _token_version_key(user_id):
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def current_token_version(user_id):
+    """Return the token version tokens of ``user_id`` must carry, or None for
+    missing and inactive users. Cached, so a steady stream of requests costs
+    one cache read each; core.signals drops the entry when the user changes.
+    """
+    key = _token_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+        # -1 caches "no such active user" too
+        cache.set(key, -1 if version is None else version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return None if version == -1 else version
+
+
+async def acurrent_token_version(user_id):
+    """current_token_version() through the async cache and ORM."""
+    key = _token_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = await User.objects.filter(pk=user_id, is_active=True).values_list(
+            'token_version', flat=True
+        ).afirst()
+        await cache.aset(key, -1 if version is None else version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return None if version == -1 else version
+
+
+def forget_token_version(user_id):
+    cache.delete(_token_version_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication that revokes tokens, and with JWT_STATELESS_AUTH
+    does so without loading the user row.
+
+    A token is rejected once its ``ver`` claim no longer matches the user's
+    ``token_version``, which is bumped when the user's role, password or
+    active flag changes. With JWT_STATELESS_AUTH, ``request.user`` is a
+    ClaimsUser carrying the token's id and role, which is all
+    core.permissions needs, and the version comes from the cache. Otherwise,
+    and for tokens without a role claim, the user row is loaded and compared.
+    Tokens issued without a version claim are only checked for an active user.
+    """
+
+    def authenticate(self, request):
+        with section('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if not settings.JWT_STATELESS_AUTH or 'role' not in validated_token:
+            user = super().get_user(validated_token)
+            version = user.token_version if TOKEN_VERSION_CLAIM in validated_token else 0
+        else:
+            user = ClaimsUser(validated_token)
+            version = current_token_version(user.id)
+        return self.check_version(user, validated_token, version)
+
+    def check_version(self, user, validated_token, version):
+        if version is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != version:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views, which pass a plain HttpRequest."""
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if not settings.JWT_STATELESS_AUTH or 'role' not in validated_token:
+            lookup = {api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM]}
+            try:
+                user = await self.user_model.objects.aget(**lookup)
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed('User not found', code='user_not_found')
+            if not user.is_active:
+                raise AuthenticationFailed('User is inactive', code='user_inactive')
+            version = user.token_version if TOKEN_VERSION_CLAIM in validated_token else 0
+        else:
+            user = ClaimsUser(validated_token)
+            version = await acurrent_token_version(user.id)
+        return self.check_version(user, validated_token, version)
@@ -0,0 +1,476 @@
+import itertools
+import statistics
+import threading
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.db.models import Exists, OuterRef
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .archive import archive_completed_jobs, restore_jobs
+from .models import ArchivedJob, User, Job, JobTask, Equipment, OutboxEvent
+from .outbox import MemorySink, job_status_changed, publish_events, record_events
+from .pagination import KeysetPagination
+from .scheduling import plan_schedule
+from .search import _unranked, search_terms
+from .serializers import CustomTokenObtainPairSerializer
+from .tasks import flag_overdue_jobs
+from .workload import live_workload
+
+# Events drained per run of the outbox_publish scenarios; events per second
+# are OUTBOX_EVENTS / p50
+OUTBOX_EVENTS = 5000
+
+# name -> factory(ctx) returning ``run`` or ``(run, reset)``; ``reset`` runs
+# untimed before every iteration
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(factory):
+        SCENARIOS[name] = factory
+        return factory
+    return register
+
+
+class BenchmarkContext:
+    def __init__(self, options):
+        self.options = options
+        self.cleanups = []
+
+    def add_cleanup(self, cleanup):
+        """Run ``cleanup`` once the current scenario has finished."""
+        self.cleanups.append(cleanup)
+
+    def close(self):
+        while self.cleanups:
+            self.cleanups.pop()()
+
+    def client(self, username=None):
+        """An API client, authenticated with a real JWT for ``username``."""
+        client = APIClient()
+        if username:
+            user = User.objects.get(username=username)
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+
+def check(response):
+    status_code = getattr(response, 'status_code', 200)
+    if status_code >= 400:
+        raise RuntimeError(f'Request failed with {status_code}: {getattr(response, "content", b"")[:200]!r}')
+    if getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_scenario(factory, ctx, iterations, warmup):
+    try:
+        built = factory(ctx)
+        run, reset = built if isinstance(built, tuple) else (built, None)
+        for _ in range(warmup):
+            if reset:
+                reset()
+            check(run())
+
+        timings, queries = [], []
+        for _ in range(iterations):
+            if reset:
+                reset()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                check(run())
+                timings.append(time.perf_counter() - started)
+            queries.append(len(captured.captured_queries))
+    finally:
+        ctx.close()
+
+    total = sum(timings)
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'mean_ms': round(statistics.mean(timings) * 1000, 3),
+        'throughput_per_s': round(iterations / total, 2) if total else None,
+        'queries': max(queries),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return the regressions of ``results`` against ``baseline``: p95 slower
+    by more than ``threshold`` (a fraction), or more queries per request.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {previous['p95_ms']}ms")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} queries vs baseline {previous['queries']}")
+    return regressions
+
+
+def client_ips():
+    # A new address per login keeps legitimate users clear of the login
+    # throttle's per-IP buckets
+    for i in itertools.count():
+        yield f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'
+
+
+def start_flood(ctx):
+    """Post failing logins from ``flood_ips`` addresses, ``flood_rate`` per
+    second spread over ``flood_threads`` threads, until the scenario ends.
+
+    Like credential stuffing, the flood tries many usernames once each
+    rather than one account, and it leaves tech1 alone. It returns after
+    ``flood_warmup`` attempts, so the throttle's initial bursts are spent
+    before anything is timed.
+    """
+    threads = ctx.options.get('flood_threads', 4)
+    ips = ctx.options.get('flood_ips', 2)
+    interval = threads / ctx.options.get('flood_rate', 100)
+    usernames = [name for name in User.objects.values_list('username', flat=True) if name != 'tech1']
+    usernames += [f'leaked{i}' for i in range(1000)]
+    attempts = itertools.count(1)
+    warmed_up, stop = threading.Event(), threading.Event()
+
+    def flood(offset):
+        client = APIClient()
+        try:
+            for i in itertools.count(offset, threads):
+                started = time.perf_counter()
+                client.post(
+                    '/api/login/', {'username': usernames[i % len(usernames)], 'password': 'leaked-password'},
+                    REMOTE_ADDR=f'203.0.113.{i % ips}',
+                )
+                if next(attempts) >= ctx.options.get('flood_warmup', 100):
+                    warmed_up.set()
+                if stop.wait(max(0, interval - (time.perf_counter() - started))):
+                    break
+        finally:
+            # Each thread has its own connection, which would keep the
+            # benchmark database from being dropped
+            connection.close()
+
+    workers = [threading.Thread(target=flood, args=(n,), daemon=True) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    def stop_flood():
+        stop.set()
+        for worker in workers:
+            worker.join()
+    ctx.add_cleanup(stop_flood)
+    warmed_up.wait()
+
+
+@scenario('login')
+def login(ctx):
+    client = ctx.client()
+    ips = client_ips()
+    return lambda: client.post('/api/login/', {'username': 'tech1', 'password': 'tech1123'}, REMOTE_ADDR=next(ips))
+
+
+@scenario('login_under_flood')
+def login_under_flood(ctx):
+    start_flood(ctx)
+    return login(ctx)
+
+
+@scenario('login_under_flood_unthrottled')
+def login_under_flood_unthrottled(ctx):
+    # The same flood with the login throttle off, for comparison
+    unthrottled = override_settings(LOGIN_THROTTLE_IP_RATE='', LOGIN_THROTTLE_USERNAME_RATE='')
+    unthrottled.enable()
+    ctx.add_cleanup(unthrottled.disable)
+    return login_under_flood(ctx)
+
+
+@scenario('dashboard')
+def dashboard(ctx):
+    client = ctx.client('tech1')
+    return lambda: client.get('/api/technician-dashboard/')
+
+
+@scenario('dashboard_uncached')
+def dashboard_uncached(ctx):
+    client = ctx.client('tech1')
+    return lambda: client.get('/api/technician-dashboard/'), cache.clear
+
+
+@scenario('dashboard_not_modified')
+def dashboard_not_modified(ctx):
+    client = ctx.client('tech1')
+    etag = client.get('/api/technician-dashboard/')['ETag']
+    return lambda: client.get('/api/technician-dashboard/', HTTP_IF_NONE_MATCH=etag)
+
+
+def dashboard_requests(ctx, max_age, health_checks):
+    # The cached dashboard, a request whose one query is the user lookup, with
+    # the connection handling a server does around each request; the test
+    # client skips it and keeps one connection open throughout
+    settings_dict = connection.settings_dict
+    saved = {key: settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    settings_dict.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks)
+    # Reconnect, so the connection picks the settings up
+    connection.close()
+
+    def restore():
+        settings_dict.update(saved)
+        connection.close()
+    ctx.add_cleanup(restore)
+    client = ctx.client('tech1')
+
+    def run():
+        close_old_connections()
+        response = client.get('/api/technician-dashboard/')
+        close_old_connections()
+        return response
+    return run
+
+
+@scenario('dashboard_connect_per_request')
+def dashboard_connect_per_request(ctx):
+    # CONN_MAX_AGE = 0: a new connection for every request
+    return dashboard_requests(ctx, 0, False)
+
+
+@scenario('dashboard_persistent_connection')
+def dashboard_persistent_connection(ctx):
+    return dashboard_requests(ctx, 600, False)
+
+
+@scenario('dashboard_health_checked_connection')
+def dashboard_health_checked_connection(ctx):
+    # The default: persistent, and pinged once per request before reuse
+    return dashboard_requests(ctx, 600, True)
+
+
+@scenario('flag_overdue_jobs')
+def flag_overdue(ctx):
+    def reset():
+        Job.objects.filter(overdue=True).update(overdue=False)
+    return flag_overdue_jobs, reset
+
+
+@scenario('job_list')
+def job_list(ctx):
+    client = ctx.client('admin1')
+    return lambda: client.get('/api/jobs/', {'page_size': 50})
+
+
+@scenario('job_list_deep_page')
+def job_list_deep_page(ctx):
+    # A cursor from the middle of the table costs the same as the first page
+    client = ctx.client('admin1')
+    jobs = Job.objects.order_by('scheduled_date', 'id').values_list('scheduled_date', 'id')
+    cursor = KeysetPagination().encode_cursor(jobs[Job.objects.count() // 2])
+    return lambda: client.get('/api/jobs/', {'page_size': 50, 'cursor': cursor})
+
+
+@scenario('workload')
+def workload(ctx):
+    client = ctx.client('admin1')
+    today = timezone.localdate()
+    params = {'start': today - timedelta(days=10), 'end': today + timedelta(days=10), 'group_by': 'technician,date,status'}
+    return lambda: client.get('/api/workload/', params)
+
+
+@scenario('workload_live')
+def workload_live(ctx):
+    # The same days aggregated from the live tables, as the rollup replaces
+    midnight = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    jobs = Job.objects.filter(
+        scheduled_date__gte=midnight - timedelta(days=10), scheduled_date__lt=midnight + timedelta(days=11),
+    )
+    return lambda: list(live_workload(jobs))
+
+
+@scenario('equipment_available')
+def equipment_available(ctx):
+    client = ctx.client('admin1')
+    today = timezone.localdate()
+    params = {'start': today, 'end': today + timedelta(days=1), 'type': 'TOOL'}
+    return lambda: client.get('/api/equipment/available/', params)
+
+
+@scenario('equipment_available_live')
+def equipment_available_live(ctx):
+    # The same page from the live tables, as the slot index replaces
+    midnight = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    taken = JobTask.required_equipment.through.objects.filter(
+        equipment=OuterRef('pk'),
+        jobtask__job__scheduled_date__gte=midnight, jobtask__job__scheduled_date__lt=midnight + timedelta(days=2),
+    ).exclude(jobtask__status='COMPLETED')
+    equipment = Equipment.objects.filter(~Exists(taken), is_active=True, type='TOOL').order_by('id')
+    return lambda: list(equipment.values('id', 'name', 'type', 'serial_number')[:100])
+
+
+@scenario('equipment_conflicts')
+def equipment_conflicts(ctx):
+    client = ctx.client('admin1')
+    today = timezone.localdate()
+    return lambda: client.get('/api/equipment/conflicts/', {'start': today, 'end': today})
+
+
+@scenario('equipment_check')
+def equipment_check(ctx):
+    # 1000 planned bookings over the next week, checked in one request
+    client = ctx.client('admin1')
+    today = timezone.localdate()
+    serials = list(Equipment.objects.order_by('id').values_list('serial_number', flat=True)[:1000])
+    items = [
+        {'equipment': serial, 'date': (today + timedelta(days=i % 7)).isoformat()} for i, serial in enumerate(serials)
+    ]
+    return lambda: client.post('/api/equipment/conflicts/', {'items': items}, format='json')
+
+
+@scenario('assign_jobs_plan')
+def assign_jobs_plan(ctx):
+    # Rebalancing plan over every seeded day, which holds a third of the jobs
+    # as pending; nothing is written
+    today = timezone.localdate()
+    return lambda: plan_schedule(today - timedelta(days=10), today + timedelta(days=10), rebalance=True)
+
+
+@scenario('live_tables')
+def live_tables(ctx):
+    # The job admin changelist, a count and a page of the jobs table, and a
+    # count of the tasks table
+    client = APIClient()
+    client.force_login(User.objects.get(username='admin1'))
+
+    def run():
+        JobTask.objects.count()
+        return client.get('/admin/core/job/')
+    return run
+
+
+def compact():
+    # Rewrite the live tables without their dead rows, as VACUUM FULL or
+    # pg_repack would
+    with connection.cursor() as cursor:
+        for model in (Job, JobTask, JobTask.required_equipment.through):
+            cursor.execute(f'VACUUM FULL ANALYZE {model._meta.db_table}')
+
+
+@scenario('live_tables_archived')
+def live_tables_archived(ctx):
+    # live_tables once every completed job is archived; moved back afterwards
+    archive_completed_jobs(days=0, time_budget=float('inf'))
+    compact()
+
+    def restore():
+        restore_jobs(ArchivedJob.objects.values_list('id', flat=True))
+        compact()
+    ctx.add_cleanup(restore)
+    return live_tables(ctx)
+
+
+@scenario('admin_changelists')
+def admin_changelists(ctx):
+    # The job changelist, a job search and a job's tasks in the task
+    # changelist, on row estimates as autovacuum would have made them
+    with connection.cursor() as cursor:
+        for model in (Job, JobTask):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+    client = APIClient()
+    client.force_login(User.objects.get(username='admin1'))
+    job_id = Job.objects.order_by('-id').values_list('id', flat=True).first()
+
+    def run():
+        check(client.get('/admin/core/job/'))
+        check(client.get('/admin/core/job/', {'q': 'Client 12'}))
+        return client.get('/admin/core/jobtask/', {'job__id__exact': job_id})
+    return run
+
+
+@scenario('search')
+def search(ctx):
+    # A client's jobs, and a job number among one technician's pending jobs,
+    # on statistics as autovacuum would have gathered them
+    with connection.cursor() as cursor:
+        for model in (Job, JobTask):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+    client = ctx.client('admin1')
+    technician = User.objects.filter(role='TECHNICIAN').order_by('id').values_list('id', flat=True).first()
+
+    def run():
+        check(client.get('/api/search/', {'q': 'Client 1234'}))
+        return client.get('/api/search/', {'q': '12', 'status': 'PENDING', 'assigned_to': technician})
+    return run
+
+
+@scenario('search_unindexed')
+def search_unindexed(ctx):
+    # search's first query as substring matches, which is what the admin's
+    # search and the SQLite fallback run
+    return lambda: _unranked(search_terms('Client 1234'), Job.objects.all(), 20, 0)
+
+
+def outbox_publish_run(ctx, batch_size):
+    # Drains OUTBOX_EVENTS job status events into a MemorySink; the outbox
+    # is emptied before and after the scenario
+    job_ids = list(Job.objects.order_by('id').values_list('id', flat=True)[:OUTBOX_EVENTS])
+    OutboxEvent.objects.all().delete()
+    ctx.add_cleanup(lambda: OutboxEvent.objects.all().delete())
+
+    def reset():
+        record_events([
+            job_status_changed(job_id, 'COMPLETED', 'IN_PROGRESS')
+            for job_id in itertools.islice(itertools.cycle(job_ids), OUTBOX_EVENTS)
+        ])
+
+    def run():
+        stats = publish_events(batch_size, time_budget=float('inf'), sink=MemorySink())
+        if stats['published'] != OUTBOX_EVENTS:
+            raise RuntimeError(f"Published {stats['published']} of {OUTBOX_EVENTS} events")
+        return stats
+    return run, reset
+
+
+@scenario('outbox_publish')
+def outbox_publish(ctx):
+    return outbox_publish_run(ctx, None)
+
+
+@scenario('outbox_publish_batch_50')
+def outbox_publish_batch_50(ctx):
+    return outbox_publish_run(ctx, 50)
+
+
+@scenario('task_transitions')
+def task_transitions(ctx):
+    # An admin moving 50 tasks, and so their jobs, to another status in one
+    # request, with an outbox event for each change
+    task_ids = list(JobTask.objects.order_by('id').values_list('id', flat=True)[:50])
+    client = ctx.client('admin1')
+    statuses = itertools.cycle(['IN_PROGRESS', 'COMPLETED', 'PENDING'])
+    ctx.add_cleanup(lambda: OutboxEvent.objects.all().delete())
+
+    def run():
+        status = next(statuses)
+        return client.post(
+            '/api/tasks/transitions/', {'transitions': [{'id': task_id, 'status': status} for task_id in task_ids]},
+            format='json',
+        )
+    return run
+
+
+@scenario('task_list')
+def task_list(ctx):
+    client = ctx.client('admin1')
+    return lambda: client.get('/api/tasks/', {'page_size': 50, 'status': 'IN_PROGRESS'})
@@ -0,0 +1,51 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Answer GET/HEAD with 304 Not Modified when the client's
+    If-None-Match / If-Modified-Since still match.
+
+    Views implement ``get_validators(request)`` returning ``(etag,
+    last_modified)``; it runs after authentication and permission checks and
+    before the handler, so an unchanged resource is never built.
+    """
+
+    def get_validators(self, request):
+        return None, None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        etag, last_modified = self.get_validators(request)
+        self.etag = quote_etag(etag) if etag else None
+        self.last_modified = last_modified
+        response = get_conditional_response(
+            request._request,
+            etag=self.etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+        if getattr(self, 'etag', None) and not response.has_header('ETag'):
+            response.headers['ETag'] = self.etag
+        if getattr(self, 'last_modified', None) and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(self.last_modified.timestamp())
+        return response
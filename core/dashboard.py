@@ -0,0 +1,214 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import TruncDate
+from .events import ALL, publish_dashboard_change
+from .models import JobTask
+from .profiling import section
+from .routers import pin_to_primary
+
+DASHBOARD_TASK_STATUSES = ('UPCOMING', 'IN_PROGRESS')
+DASHBOARD_ORDERING = ('job__scheduled_date', 'job_id', 'order', 'id')
+
+CACHE_PREFIX = 'dashboard'
+EQUIPMENT_VERSION_KEY = f'{CACHE_PREFIX}:version:equipment'
+HITS_KEY = f'{CACHE_PREFIX}:stats:hits'
+MISSES_KEY = f'{CACHE_PREFIX}:stats:misses'
+
+
+def dashboard_tasks(user):
+    # Upcoming and in-progress tasks for the technician's jobs
+    return JobTask.objects.filter(
+        Q(job__assigned_to=user.pk) & Q(status__in=DASHBOARD_TASK_STATUSES)
+    )
+
+
+def _dashboard_rows(user):
+    return dashboard_tasks(user).annotate(
+        date=TruncDate('job__scheduled_date')
+    ).order_by(*DASHBOARD_ORDERING).values_list(
+        'id', 'job__title', 'description', 'status', 'date'
+    )
+
+
+def _equipment_rows(user):
+    through = JobTask.required_equipment.through
+    return through.objects.filter(
+        jobtask__job__assigned_to=user.pk,
+        jobtask__status__in=DASHBOARD_TASK_STATUSES,
+    ).order_by('jobtask_id', 'equipment_id').values_list(
+        'jobtask_id', 'equipment_id', 'equipment__name', 'equipment__type', 'equipment__is_active'
+    )
+
+
+def _group_dashboard(rows, equipment_rows):
+    equipment_by_task = {}
+    for task_id, eq_id, name, eq_type, is_active in equipment_rows:
+        equipment_by_task.setdefault(task_id, []).append(
+            {'id': eq_id, 'name': name, 'type': eq_type, 'is_active': is_active}
+        )
+
+    data = []
+    current_date = None
+    for task_id, job_title, description, task_status, date in rows:
+        date_str = date.strftime('%Y-%m-%d')
+        if date_str != current_date:
+            current_date = date_str
+            tasks = []
+            data.append({'date': date_str, 'tasks': tasks})
+        tasks.append({
+            'id': task_id,
+            'job_title': job_title,
+            'description': description,
+            'equipment': equipment_by_task.get(task_id, []),
+            'status': task_status,
+        })
+    return data
+
+
+def build_dashboard(user):
+    """Build the technician dashboard payload from plain dicts.
+
+    Two queries: one for the task columns the dashboard shows, one for the
+    equipment of those tasks through the M2M table. Rows come back ordered by
+    scheduled date, so grouping by day is a single pass, which request
+    profiles count as serializing.
+    """
+    equipment_rows = list(_equipment_rows(user))
+    rows = list(_dashboard_rows(user))
+    with section('serialize'):
+        return _group_dashboard(rows, equipment_rows)
+
+
+async def abuild_dashboard(user):
+    """build_dashboard() through the async ORM."""
+    # Iterating the queryset fetches it in one call. aiterator() would stream
+    # through a server-side cursor, and on Django 4.2 runs values_list()
+    # queries in the event loop thread
+    equipment_rows = [row async for row in _equipment_rows(user)]
+    rows = [row async for row in _dashboard_rows(user)]
+    with section('serialize'):
+        return _group_dashboard(rows, equipment_rows)
+
+
+def _new_version():
+    # Versions start from a clock value so a counter that was evicted from the
+    # cache never restarts at a number an older payload was stored under.
+    return time.time_ns()
+
+
+def _version_key(user_id):
+    return f'{CACHE_PREFIX}:version:user:{user_id}'
+
+
+def _get_version(key):
+    return cache.get_or_set(key, _new_version, None)
+
+
+async def _aget_version(key):
+    return await cache.aget_or_set(key, _new_version, None)
+
+
+def _bump_version(key):
+    cache.add(key, _new_version(), None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def bump_dashboard_version(*user_ids):
+    for user_id in set(user_ids):
+        if user_id is not None:
+            _bump_version(_version_key(user_id))
+    # Until replicas have the write, a rebuild there would be cached under
+    # the new version
+    pin_to_primary(*user_ids)
+    publish_dashboard_change(*user_ids)
+
+
+def bump_equipment_version():
+    # Equipment rows are shared by every technician's dashboard
+    _bump_version(EQUIPMENT_VERSION_KEY)
+    pin_to_primary(ALL)
+    publish_dashboard_change(ALL)
+
+
+def _incr_stat(key):
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+async def _aincr_stat(key):
+    if await cache.aadd(key, 1, None):
+        return
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, None)
+
+
+def dashboard_key(user):
+    """The cache key of ``user``'s dashboard as of the current versions."""
+    return '{}:{}:{}:{}'.format(
+        CACHE_PREFIX, user.pk,
+        _get_version(_version_key(user.pk)),
+        _get_version(EQUIPMENT_VERSION_KEY),
+    )
+
+
+async def adashboard_key(user):
+    return '{}:{}:{}:{}'.format(
+        CACHE_PREFIX, user.pk,
+        await _aget_version(_version_key(user.pk)),
+        await _aget_version(EQUIPMENT_VERSION_KEY),
+    )
+
+
+def dashboard_etag(key):
+    # The ETag names the cache entry the payload is served from, so a 304
+    # needs no query and a payload is never paired with a newer ETag. Every
+    # write that changes a dashboard bumps a version, and with it the ETag.
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def get_dashboard(user, key=None):
+    """Return the dashboard payload for ``user``, served from the cache when
+    neither the technician's jobs nor any equipment changed since it was built.
+
+    ``key``, from dashboard_key(), pins the versions the caller's ETag was
+    computed from.
+    """
+    key = key or dashboard_key(user)
+    data = cache.get(key)
+    if data is not None:
+        _incr_stat(HITS_KEY)
+        return data
+    _incr_stat(MISSES_KEY)
+    data = build_dashboard(user)
+    cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_dashboard(user, key=None):
+    """get_dashboard() through the async cache and ORM."""
+    key = key or await adashboard_key(user)
+    data = await cache.aget(key)
+    if data is not None:
+        await _aincr_stat(HITS_KEY)
+        return data
+    await _aincr_stat(MISSES_KEY)
+    data = await abuild_dashboard(user)
+    await cache.aset(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def dashboard_cache_stats():
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': stats.get(HITS_KEY, 0), 'misses': stats.get(MISSES_KEY, 0)}
@@ -0,0 +1,49 @@
+from django.db import connection, transaction
+
+# Advisory lock namespaces, one per kind of key locked
+WORKLOAD_LOCKS = 1
+RESERVATION_JOB_LOCKS = 2
+RESERVATION_SLOT_LOCKS = 3
+
+
+def on_commit_batched(name, apply, items):
+    """Call ``apply(items)`` once the current transaction commits, with the
+    items of every call made under ``name`` during the transaction, so a
+    transaction writing many rows applies each item once. Outside a
+    transaction ``apply`` runs right away.
+    """
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        apply(set(items))
+        return
+    # run_on_commit is replaced when the transaction ends or a savepoint
+    # rolls back, which may discard a callback registered earlier; a pending
+    # set is only added to while the list it was registered in is current
+    pending_by_name = conn.__dict__.setdefault('_batched_on_commit', {})
+    pending = pending_by_name.get(name)
+    if pending is None or pending[0] is not conn.run_on_commit:
+        pending = pending_by_name[name] = (conn.run_on_commit, set())
+
+        def flush():
+            if pending_by_name.get(name) is pending:
+                del pending_by_name[name]
+            apply(pending[1])
+
+        transaction.on_commit(flush)
+    pending[1].update(items)
+
+
+def day_key(object_id, day):
+    # An object id below 2**36 and a date, as one lock key
+    return (object_id << 20) | day.toordinal()
+
+
+def lock_keys(namespace, keys):
+    """Take transaction-scoped advisory locks on ``keys``, ints below 2**56.
+
+    Keys are locked in one order, so transactions locking overlapping keys
+    queue up rather than deadlock.
+    """
+    keys = sorted({(namespace << 56) | key for key in keys})
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(key) FROM unnest(%s::bigint[]) AS key', [keys])
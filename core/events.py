@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Published when a change can touch every technician's dashboard, such as
+# an equipment edit
+ALL = 'all'
+REDIS_CHANNEL_PREFIX = 'jobops:dashboard'
+
+
+class Subscription:
+    """A listener for changes to one technician's dashboard.
+
+    Changes carry no payload and are coalesced: however many arrive while
+    the listener is busy, ``changed`` is set once and the listener re-reads
+    the dashboard. That keeps an idle listener at a fixed, small size.
+    """
+    __slots__ = ('user_id', 'loop', 'changed', 'closed')
+
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.changed = asyncio.Event()
+        self.closed = False
+
+    def _set(self):
+        self.changed.set()
+
+    def notify(self):
+        # Called from any thread; the event belongs to the listener's loop
+        try:
+            self.loop.call_soon_threadsafe(self._set)
+        except RuntimeError:
+            pass  # The loop has closed
+
+    def close(self):
+        self.closed = True
+        self.changed.set()
+
+
+class Broker:
+    """The listeners of this process, by technician id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._subscriptions.get(subscription.user_id)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscriptions[subscription.user_id]
+
+    def deliver(self, user_ids):
+        with self._lock:
+            if ALL in user_ids:
+                targets = [s for listeners in self._subscriptions.values() for s in listeners]
+            else:
+                targets = [s for user_id in user_ids for s in self._subscriptions.get(user_id, ())]
+        for subscription in targets:
+            subscription.notify()
+
+    def count(self):
+        with self._lock:
+            return sum(len(listeners) for listeners in self._subscriptions.values())
+
+
+broker = Broker()
+
+
+class MemoryBackend:
+    """Delivers changes to the listeners of the process that made them."""
+
+    def publish(self, user_ids):
+        broker.deliver(user_ids)
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """Publishes changes on a Redis channel per technician, so listeners in
+    every process hear writes made in any of them, Celery workers included.
+
+    Each process runs one pattern subscription, started with its first
+    listener, and fans messages out to its own listeners.
+    """
+
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self.listener = None
+
+    def publish(self, user_ids):
+        import redis
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.publish(f'{REDIS_CHANNEL_PREFIX}:{user_id}', b'')
+                pipe.execute()
+        except redis.RedisError:
+            # Streams then only catch up at their next reconnect; the write
+            # itself has committed and must not fail
+            logger.exception('Could not publish dashboard changes for %s', user_ids)
+
+    def start(self):
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.get_running_loop().create_task(self.listen())
+
+    async def listen(self):
+        import redis.asyncio
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{REDIS_CHANNEL_PREFIX}:*')
+                    # Changes may have been missed while disconnected
+                    broker.deliver([ALL])
+                    async for message in pubsub.listen():
+                        if message['type'] == 'pmessage':
+                            user_id = message['channel'].decode().rsplit(':', 1)[1]
+                            broker.deliver([user_id if user_id == ALL else int(user_id)])
+            except redis.RedisError:
+                logger.exception('Lost the dashboard events subscription, reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                await client.close()
+
+
+_backends = {}
+
+
+def get_backend():
+    name = settings.DASHBOARD_EVENTS_BACKEND
+    if name not in _backends:
+        if name == 'redis':
+            _backends[name] = RedisBackend(settings.DASHBOARD_EVENTS_REDIS_URL)
+        elif name == 'memory':
+            _backends[name] = MemoryBackend()
+        else:
+            raise ValueError(f'Unknown DASHBOARD_EVENTS_BACKEND {name!r}')
+    return _backends[name]
+
+
+def publish_dashboard_change(*user_ids):
+    """Wake the listeners of ``user_ids``, or of everyone for ``ALL``."""
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if user_ids:
+        get_backend().publish(user_ids)
+
+
+def subscribe(user_id):
+    """Listen for changes to ``user_id``'s dashboard; call from the loop the
+    listener runs on, and unsubscribe() when done.
+    """
+    get_backend().start()
+    return broker.subscribe(user_id)
+
+
+def unsubscribe(subscription):
+    broker.unsubscribe(subscription)
@@ -0,0 +1,106 @@
+import csv
+from datetime import date, datetime
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .filters import JobFilter, JobTaskFilter, EquipmentFilter
+from .models import Job, JobTask, Equipment
+
+# dataset: (queryset, filterset, [(column, field)])
+DATASETS = {
+    'jobs': (Job.objects.all(), JobFilter, [
+        ('id', 'id'), ('external_id', 'external_id'), ('title', 'title'), ('description', 'description'),
+        ('client_name', 'client_name'), ('status', 'status'), ('priority', 'priority'),
+        ('scheduled_date', 'scheduled_date'), ('overdue', 'overdue'),
+        ('created_by', 'created_by__username'), ('assigned_to', 'assigned_to__username'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+    'tasks': (JobTask.objects.all(), JobTaskFilter, [
+        ('id', 'id'), ('job_id', 'job_id'), ('job_title', 'job__title'), ('title', 'title'),
+        ('description', 'description'), ('status', 'status'), ('order', 'order'),
+        ('completed_at', 'completed_at'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+    'equipment': (Equipment.objects.all(), EquipmentFilter, [
+        ('id', 'id'), ('name', 'name'), ('type', 'type'), ('serial_number', 'serial_number'),
+        ('is_active', 'is_active'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+    'task_equipment': (JobTask.required_equipment.through.objects.all(), None, [
+        ('task_id', 'jobtask_id'), ('equipment_id', 'equipment_id'), ('serial_number', 'equipment__serial_number'),
+    ]),
+}
+OUTPUT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    # File-like object whose write() hands the line back to csv.writer's caller
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def export_queryset(dataset, params=None):
+    """Return ``(queryset, columns)`` for ``dataset`` filtered by ``params``,
+    or raise ValueError with the filter errors.
+    """
+    queryset, filterset_class, columns = DATASETS[dataset]
+    if filterset_class is not None and params:
+        filterset = filterset_class(params, queryset=queryset)
+        if not filterset.is_valid():
+            raise ValueError(filterset.errors)
+        queryset = filterset.qs
+    return queryset, columns
+
+
+def _lines(rows, names, output):
+    if output == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+    else:
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def export_rows(queryset, columns, output, chunk_size=None):
+    """Yield the export as text, one block of ``chunk_size`` lines at a time.
+
+    Rows come from ``values_list().iterator()`` (a server-side cursor on
+    PostgreSQL), so memory stays flat however many rows are exported.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    names = [name for name, _ in columns]
+    rows = queryset.order_by('pk').values_list(*[field for _, field in columns]).iterator(chunk_size=chunk_size)
+    block = []
+    for line in _lines(rows, names, output):
+        block.append(line)
+        if len(block) >= chunk_size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+async def aexport_rows(queryset, columns, output, chunk_size=None):
+    """Async iterator over :func:`export_rows`, for responses served by ASGI.
+
+    Django 4.2's ASGI handler reads a sync streaming iterator into a list
+    before sending any of it. Each block is instead pulled through
+    ``sync_to_async``, whose thread-sensitive mode keeps the server-side
+    cursor on one connection.
+    """
+    blocks = export_rows(queryset, columns, output, chunk_size)
+    try:
+        while (block := await sync_to_async(next)(blocks, None)) is not None:
+            yield block
+    finally:
+        await sync_to_async(blocks.close)()
@@ -0,0 +1,37 @@
+import django_filters
+from .models import ArchivedJob, Job, JobTask, Equipment
+
+
+class JobFilter(django_filters.FilterSet):
+    assigned_to = django_filters.NumberFilter(field_name='assigned_to')
+    scheduled_from = django_filters.IsoDateTimeFilter(field_name='scheduled_date', lookup_expr='gte')
+    scheduled_to = django_filters.IsoDateTimeFilter(field_name='scheduled_date', lookup_expr='lt')
+
+    class Meta:
+        model = Job
+        fields = ['status', 'priority', 'overdue']
+
+
+class ArchivedJobFilter(JobFilter):
+    class Meta(JobFilter.Meta):
+        model = ArchivedJob
+
+
+class JobTaskFilter(django_filters.FilterSet):
+    job = django_filters.NumberFilter(field_name='job')
+    job_status = django_filters.ChoiceFilter(field_name='job__status', choices=Job.STATUS_CHOICES)
+    priority = django_filters.ChoiceFilter(field_name='job__priority', choices=Job.PRIORITY_CHOICES)
+    overdue = django_filters.BooleanFilter(field_name='job__overdue')
+    assigned_to = django_filters.NumberFilter(field_name='job__assigned_to')
+    scheduled_from = django_filters.IsoDateTimeFilter(field_name='job__scheduled_date', lookup_expr='gte')
+    scheduled_to = django_filters.IsoDateTimeFilter(field_name='job__scheduled_date', lookup_expr='lt')
+
+    class Meta:
+        model = JobTask
+        fields = ['status']
+
+
+class EquipmentFilter(django_filters.FilterSet):
+    class Meta:
+        model = Equipment
+        fields = ['type', 'is_active']
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 at PASSWORD_HASH_ITERATIONS iterations.
+
+    It keeps Django's ``pbkdf2_sha256`` algorithm name, so it verifies the
+    hashes Django's own hasher wrote. A stored hash with a different
+    iteration count is rehashed on the user's next successful login, so the
+    cost can be raised or lowered without a password reset.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
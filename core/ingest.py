@@ -0,0 +1,176 @@
+import logging
+from django.conf import settings
+from django.db import DatabaseError, router, transaction
+from django.db.models.deletion import Collector
+from rest_framework.exceptions import ValidationError
+from .archive import restore_batch
+from .dashboard import bump_dashboard_version
+from .models import ArchivedJob, User, Job, JobTask, Equipment
+from .outbox import job_status_changed, record_events, task_status_changed
+from .reservations import mark_reservations_changed
+from .serializers import BulkJobSerializer
+from .workload import mark_workload_changed, workload_date
+
+logger = logging.getLogger(__name__)
+
+JOB_FIELDS = ['title', 'description', 'client_name', 'status', 'priority', 'scheduled_date']
+
+
+def ingest_jobs(items, created_by, chunk_size=None):
+    """Create or update jobs with their tasks from a list of payload dicts.
+
+    Every item is validated before anything is written, and assignee
+    usernames, equipment serial numbers and existing ``external_id``s are
+    each resolved with one query for the whole batch. Items are then written
+    in chunks, one transaction per chunk, so a failing chunk does not undo
+    the others. An upsert replaces the job's tasks, and one of an archived
+    job restores it first. New jobs and tasks, and changed job statuses, get
+    outbox events in their chunk's transaction.
+
+    Returns ``(results, errors)``: one entry per written item, and one per
+    rejected item, both keyed by the item's index in ``items``.
+    """
+    chunk_size = chunk_size or settings.BULK_INGEST_CHUNK_SIZE
+    errors = {}
+    valid = []
+    seen_external_ids = set()
+    # One serializer instance for every item, as ListSerializer does, so the
+    # field set is built once rather than deep-copied per item
+    validator = BulkJobSerializer()
+    for index, item in enumerate(items):
+        try:
+            data = validator.run_validation(item)
+        except ValidationError as exc:
+            errors[index] = exc.detail
+            continue
+        external_id = data.get('external_id')
+        if external_id and external_id in seen_external_ids:
+            errors[index] = {'external_id': ['Duplicate external_id in this batch.']}
+            continue
+        seen_external_ids.add(external_id)
+        valid.append((index, data))
+
+    usernames = {data.get('assigned_to') for _, data in valid} - {None}
+    serials = {serial for _, data in valid for task in data['tasks'] for serial in task['equipment']}
+    assignees = dict(
+        User.objects.filter(username__in=usernames, role='TECHNICIAN').values_list('username', 'id')
+    )
+    equipment = dict(Equipment.objects.filter(serial_number__in=serials).values_list('serial_number', 'id'))
+    existing, archived = {}, {}
+    # A job sent again after it was archived is moved back, in its chunk's
+    # transaction, and updated there
+    for model in (ArchivedJob, Job):
+        for external_id, job_id, assigned_to_id, scheduled_date, status in model.objects.filter(
+            external_id__in=seen_external_ids - {None}
+        ).values_list('external_id', 'id', 'assigned_to_id', 'scheduled_date', 'status'):
+            existing[external_id] = (job_id, assigned_to_id, scheduled_date, status)
+            if model is ArchivedJob:
+                archived[external_id] = job_id
+            else:
+                archived.pop(external_id, None)
+
+    ready = []
+    for index, data in valid:
+        item_errors = {}
+        if data.get('assigned_to') is not None and data['assigned_to'] not in assignees:
+            item_errors['assigned_to'] = [f"Unknown technician '{data['assigned_to']}'."]
+        unknown = sorted({s for task in data['tasks'] for s in task['equipment']} - equipment.keys())
+        if unknown:
+            item_errors['tasks'] = [f"Unknown equipment serial numbers: {', '.join(unknown)}."]
+        if item_errors:
+            errors[index] = item_errors
+        else:
+            ready.append((index, data))
+
+    results = []
+    for start in range(0, len(ready), chunk_size):
+        chunk = ready[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                written, user_ids, buckets = _write_chunk(chunk, created_by, assignees, equipment, existing, archived)
+                transaction.on_commit(lambda user_ids=user_ids: bump_dashboard_version(*user_ids))
+                mark_workload_changed(buckets)
+                mark_reservations_changed([result['id'] for result in written])
+        except DatabaseError:
+            # The database's message names tables and constraints; it is
+            # logged, and clients get a generic error
+            logger.exception('Could not save bulk ingest chunk of %d jobs', len(chunk))
+            for index, _ in chunk:
+                errors[index] = {'non_field_errors': ['Could not be saved.']}
+        else:
+            results += written
+
+    return results, [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+
+
+def _write_chunk(chunk, created_by, assignees, equipment, existing, archived):
+    restore_batch([archived[data['external_id']] for _, data in chunk if data.get('external_id') in archived])
+    new_jobs, updated_jobs = [], []
+    user_ids, buckets = set(), set()
+    for index, data in chunk:
+        job = Job(
+            external_id=data.get('external_id'),
+            assigned_to_id=assignees.get(data.get('assigned_to')),
+            **{field: data[field] for field in JOB_FIELDS},
+        )
+        job.created_by_id = created_by.pk
+        if job.external_id in existing:
+            _, previous_assignee, previous_date, _ = existing[job.external_id]
+            # Without an assignee the update keeps the current one, so a CRM
+            # resync does not undo the scheduler's assignments
+            if job.assigned_to_id is None:
+                job.assigned_to_id = previous_assignee
+            user_ids.add(previous_assignee)
+            buckets.add((previous_assignee, workload_date(previous_date)))
+            updated_jobs.append(job)
+        else:
+            new_jobs.append(job)
+        user_ids.add(job.assigned_to_id)
+        buckets.add((job.assigned_to_id, workload_date(job.scheduled_date)))
+
+    Job.objects.bulk_create(new_jobs)
+    if updated_jobs:
+        # INSERT ... ON CONFLICT (external_id) DO UPDATE in one statement;
+        # created_by and created_at keep their original values
+        Job.objects.bulk_create(
+            updated_jobs, update_conflicts=True, unique_fields=['external_id'],
+            update_fields=JOB_FIELDS + ['assigned_to', 'updated_at'],
+        )
+        for job in updated_jobs:
+            job.id = existing[job.external_id][0]
+        # Upserts replace the task list. Collecting loaded tasks, rather than
+        # calling queryset.delete() which drops select_related, lets the
+        # delete signals read each task's job without a query per task.
+        collector = Collector(using=router.db_for_write(JobTask))
+        collector.collect(list(JobTask.objects.filter(job__in=updated_jobs).select_related('job')))
+        collector.delete()
+
+    jobs = iter(new_jobs)
+    updated = iter(updated_jobs)
+    tasks, task_equipment, written = [], [], []
+    for index, data in chunk:
+        created = data.get('external_id') not in existing
+        job = next(jobs) if created else next(updated)
+        for position, task in enumerate(data['tasks'], start=1):
+            tasks.append(JobTask(
+                job=job, title=task['title'], description=task['description'],
+                status=task['status'], order=task.get('order', position),
+            ))
+            task_equipment.append(task['equipment'])
+        written.append({'index': index, 'id': job.id, 'external_id': job.external_id, 'created': created})
+
+    JobTask.objects.bulk_create(tasks)
+    events = [job_status_changed(job.id, job.status) for job in new_jobs]
+    events += [
+        job_status_changed(job.id, job.status, existing[job.external_id][3])
+        for job in updated_jobs if job.status != existing[job.external_id][3]
+    ]
+    events += [task_status_changed(task.id, task.job_id, task.status) for task in tasks]
+    record_events(events)
+    through = JobTask.required_equipment.through
+    through.objects.bulk_create([
+        through(jobtask_id=task.id, equipment_id=equipment[serial])
+        for task, serials in zip(tasks, task_equipment)
+        for serial in dict.fromkeys(serials)
+    ])
+    return written, user_ids, buckets
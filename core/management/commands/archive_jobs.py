@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from core.archive import archive_completed_jobs, restore_jobs
+
+
+class Command(BaseCommand):
+    help = 'Moves completed jobs with their tasks to the archive tables, or back with --restore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive jobs completed over this many days ago (default ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, help='Jobs moved per transaction (default ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--time-budget', type=float, help='Seconds before the run stops (default ARCHIVE_TIME_BUDGET)')
+        parser.add_argument('--restore', type=int, nargs='+', metavar='JOB_ID', help='Move these archived jobs back instead')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            restored = restore_jobs(options['restore'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} jobs.'))
+            return
+        stats = archive_completed_jobs(options['days'], options['batch_size'], options['time_budget'])
+        self.stdout.write(
+            f"Archived {stats['archived']} of {stats['scanned']} completed jobs in {stats['chunks']} chunks, "
+            f"{stats['elapsed']}s"
+        )
+        if not stats['complete']:
+            self.stdout.write(self.style.WARNING('Stopped at the time budget; the next run resumes from here.'))
@@ -0,0 +1,35 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from core.scheduling import apply_schedule, plan_schedule
+
+
+class Command(BaseCommand):
+    help = 'Assigns pending jobs to technicians by priority, daily capacity and equipment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to plan (YYYY-MM-DD, default today)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to plan (YYYY-MM-DD)')
+        parser.add_argument('--rebalance', action='store_true', help='Also move jobs that already have a technician')
+        parser.add_argument('--dry-run', action='store_true', help='Report the plan without writing it')
+
+    def handle(self, *args, **options):
+        changes, report = plan_schedule(options['start'], options['end'], options['rebalance'])
+        if options['verbosity'] > 1:
+            for job_id, old, new, day in changes:
+                self.stdout.write(f"job {job_id} {day}: {old or 'unassigned'} -> {new}")
+        self.stdout.write(
+            f"{report['start']}..{report['end']}: {report['jobs']} jobs, {report['technicians']} technicians; "
+            f"{report['assigned']} to assign, {report['unchanged']} unchanged, {report['unplaced']} without room, "
+            f"{report['moves']} local search moves, at most {report['max_daily_load']} jobs per technician day, "
+            f"planned in {report['elapsed']}s"
+        )
+        if report['unplaced']:
+            self.stdout.write(self.style.WARNING(
+                f"No technician has room for jobs {', '.join(map(str, report['unplaced_jobs']))}"
+                + (' and more' if report['unplaced'] > len(report['unplaced_jobs']) else '')
+            ))
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Dry run; nothing written.'))
+            return
+        written = apply_schedule(changes)
+        self.stdout.write(self.style.SUCCESS(f'Assigned {written} jobs.'))
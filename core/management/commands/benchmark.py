@@ -0,0 +1,89 @@
+import json
+import platform
+from io import StringIO
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from core.benchmarks import SCENARIOS, BenchmarkContext, run_scenario, compare
+
+
+class Command(BaseCommand):
+    help = 'Seeds a throwaway database and measures API latency, throughput and query counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+        parser.add_argument('--jobs', type=int, default=1000, help='Jobs seeded through generate_dummy_data')
+        parser.add_argument('--technicians', type=int, default=10)
+        parser.add_argument('--equipment', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results')
+        parser.add_argument('--baseline', help='Results file to compare against')
+        parser.add_argument('--flood-rate', type=int, default=100, help='Failing logins per second in the flood scenarios')
+        parser.add_argument('--flood-threads', type=int, default=4)
+        parser.add_argument('--flood-ips', type=int, default=2, help='Client addresses the flood comes from')
+        parser.add_argument('--flood-warmup', type=int, default=100, help='Flood attempts before timing starts')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p95 slowdown, as a fraction')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the benchmark database between runs')
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+
+        # Same throwaway database the test runner uses, so real data is untouched
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not options['keepdb'] or not django.apps.apps.get_model('core', 'Job').objects.exists():
+                self.stdout.write(f"Seeding {options['jobs']} jobs...")
+                call_command(
+                    'generate_dummy_data', jobs=options['jobs'], technicians=options['technicians'],
+                    equipment=options['equipment'], seed=options['seed'], stdout=StringIO(),
+                )
+            ctx = BenchmarkContext(options)
+            results = {}
+            for name in names:
+                results[name] = run_scenario(SCENARIOS[name], ctx, options['iterations'], options['warmup'])
+                result = results[name]
+                self.stdout.write(
+                    f"{name:<36} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+                    f"{result['throughput_per_s']:>8.1f}/s  {result['queries']} queries"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'jobs': options['jobs'],
+                'technicians': options['technicians'],
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'flood_rate': options['flood_rate'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import time
+import urllib.parse
+import urllib.request
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks import percentile
+
+
+async def fetch(url, headers):
+    """GET ``url`` over a new HTTP/1.1 connection and return the status."""
+    parts = urllib.parse.urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        target = f'{parts.path}?{parts.query}' if parts.query else parts.path
+        request = [f'GET {target} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close']
+        request += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(request) + '\r\n\r\n').encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def load(url, headers, concurrency, duration):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds."""
+    timings, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await fetch(url, headers)
+            except (OSError, ValueError, IndexError):
+                status = None
+            if status is None or status >= 400:
+                errors += 1
+            else:
+                timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'errors': errors,
+        'throughput_per_s': round(len(timings) / elapsed, 2),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3) if timings else None,
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3) if timings else None,
+    }
+
+
+def login(base_url, username, password):
+    body = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+    with urllib.request.urlopen(f'{base_url}/api/login/', body) as response:
+        return json.load(response)['access']
+
+
+class Command(BaseCommand):
+    help = 'Measures throughput and latency of running servers at rising concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='+',
+            help='name=base URL of each server to compare, e.g. wsgi=http://127.0.0.1:8000',
+        )
+        parser.add_argument('--path', default='/api/technician-dashboard/')
+        parser.add_argument('--username', default='tech1')
+        parser.add_argument('--password', default='tech1123')
+        parser.add_argument('--concurrency', default='1,10,50,100,200', help='Comma-separated levels')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per level')
+        parser.add_argument('--output', default='concurrency-results.json')
+
+    def handle(self, *args, **options):
+        targets = {}
+        for target in options['targets']:
+            name, sep, base_url = target.partition('=')
+            if not sep:
+                raise CommandError(f'Expected name=url, got {target!r}')
+            targets[name] = base_url.rstrip('/')
+        levels = [int(level) for level in options['concurrency'].split(',')]
+
+        results = {}
+        for name, base_url in targets.items():
+            # Logging in once per server also checks it is up
+            try:
+                token = login(base_url, options['username'], options['password'])
+            except OSError as exc:
+                raise CommandError(f'Could not log in to {name} at {base_url}: {exc}')
+            headers = {'Authorization': f'Bearer {token}'}
+            results[name] = []
+            for level in levels:
+                result = asyncio.run(load(f"{base_url}{options['path']}", headers, level, options['duration']))
+                results[name].append(result)
+                self.stdout.write(
+                    f"{name:<8} c={level:<5} {result['throughput_per_s']:>9.1f}/s  "
+                    f"p50 {result['p50_ms'] or 0:>9.2f}ms  p95 {result['p95_ms'] or 0:>9.2f}ms  "
+                    f"{result['errors']} errors"
+                )
+
+        with open(options['output'], 'w') as f:
+            json.dump({'path': options['path'], 'duration': options['duration'], 'results': results}, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
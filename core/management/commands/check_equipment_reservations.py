@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.reservations import diff_reservations, rebuild_reservations
+
+
+class Command(BaseCommand):
+    help = 'Compares equipment reservations and slots with the open tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild reservations and slots if any differ')
+
+    def handle(self, *args, **options):
+        differences = diff_reservations()
+        for key, stored, live in differences:
+            if len(key) == 3:
+                job_id, equipment_id, day = key
+                state = 'stored but not needed' if stored else 'needed but not stored'
+                self.stdout.write(f'job {job_id} equipment {equipment_id} {day}: {state}')
+            else:
+                equipment_id, day = key
+                self.stdout.write(f'equipment {equipment_id} {day}: slot {stored or 0} jobs; live {live or 0} jobs')
+        if not differences:
+            self.stdout.write(self.style.SUCCESS('Equipment reservations match the tasks.'))
+            return
+        if options['fix']:
+            written = rebuild_reservations()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} reservations.'))
+            return
+        raise CommandError(f'{len(differences)} equipment reservations or slots differ from the tasks.')
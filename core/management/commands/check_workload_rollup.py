@@ -0,0 +1,34 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core.workload import COUNTS, diff_workload, refresh_workload
+
+
+def describe(counts):
+    if counts is None:
+        return 'missing'
+    return ', '.join(f'{name} {value}' for name, value in zip(COUNTS, counts))
+
+
+class Command(BaseCommand):
+    help = 'Compares the workload rollup with a live aggregate of the jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to check (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to check (YYYY-MM-DD)')
+        parser.add_argument('--fix', action='store_true', help='Refresh the days that differ')
+
+    def handle(self, *args, **options):
+        differences = diff_workload(options['start'], options['end'])
+        for (technician_id, day, status, priority), stored, live in differences:
+            self.stdout.write(
+                f'technician {technician_id} {day} {status}/{priority}: '
+                f'rollup {describe(stored)}; live {describe(live)}'
+            )
+        if not differences:
+            self.stdout.write(self.style.SUCCESS('The workload rollup matches the jobs.'))
+            return
+        if options['fix']:
+            refreshed = refresh_workload({(technician_id, day) for (technician_id, day, _, _), _, _ in differences})
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} technician days.'))
+            return
+        raise CommandError(f'{len(differences)} workload rollup rows differ from the jobs.')
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.dashboard import dashboard_tasks, DASHBOARD_ORDERING
+from core.models import User, Job, JobTask
+
+
+def overdue_jobs_query(technician):
+    return Job.objects.filter(
+        scheduled_date__lt=timezone.now(),
+        status__in=['PENDING', 'IN_PROGRESS'],
+        overdue=False
+    ).values('id')
+
+
+def dashboard_query(technician):
+    return dashboard_tasks(technician).order_by(*DASHBOARD_ORDERING).values('id', 'job__title')
+
+
+def open_tasks_query(technician):
+    job_id = Job.objects.filter(assigned_to=technician).values_list('id', flat=True).first() or 0
+    return JobTask.objects.filter(job_id=job_id).exclude(status='COMPLETED').order_by('order').values('id')
+
+
+def job_search_query(technician):
+    # The job admin's search on a large table, by prefix
+    return Job.objects.filter(Q(title__istartswith='Job 1') | Q(client_name__istartswith='Job 1')).values('id')
+
+
+def task_search_query(technician):
+    return JobTask.objects.filter(title__istartswith='Task 1').values('id')
+
+
+# (name, queryset builder, index the plan is expected to use)
+HOT_QUERIES = [
+    ('flag_overdue_jobs', overdue_jobs_query, 'job_open_not_overdue_idx'),
+    ('technician_dashboard', dashboard_query, 'job_assignee_sched_idx'),
+    ('open_tasks_per_job', open_tasks_query, 'jobtask_open_per_job_idx'),
+    ('admin_job_search', job_search_query, 'job_title_prefix_idx'),
+    ('admin_task_search', task_search_query, 'jobtask_title_prefix_idx'),
+]
+
+
+def check_query_plans(technician, analyze=False, force_index=False):
+    """EXPLAIN each hot query and report whether its index shows up in the plan.
+
+    ``force_index`` disables sequential scans for the check (PostgreSQL only),
+    which tells whether the planner *can* use an index on a small database
+    where a scan would be cheaper anyway.
+    """
+    results = []
+    with transaction.atomic():
+        if force_index and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+        for name, build_query, index in HOT_QUERIES:
+            plan = build_query(technician).explain(**options)
+            results.append({'name': name, 'index': index, 'used': index in plan, 'plan': plan})
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the hot queries and checks they use their indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--technician', help='Username whose dashboard query is explained')
+        parser.add_argument('--analyze', action='store_true', help='Use EXPLAIN ANALYZE (PostgreSQL)')
+        parser.add_argument('--force-index', action='store_true', help='Disable sequential scans while checking (PostgreSQL)')
+
+    def handle(self, *args, **options):
+        technicians = User.objects.filter(role='TECHNICIAN')
+        if options['technician']:
+            technicians = technicians.filter(username=options['technician'])
+        technician = technicians.order_by('id').first()
+        if technician is None:
+            raise CommandError('No technician found to explain the dashboard query for.')
+
+        results = check_query_plans(technician, analyze=options['analyze'], force_index=options['force_index'])
+        for result in results:
+            if options['verbosity'] > 1:
+                self.stdout.write(result['plan'])
+            if result['used']:
+                self.stdout.write(self.style.SUCCESS(f"{result['name']}: uses {result['index']}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{result['name']}: does not use {result['index']}"))
+
+        missing = [result['name'] for result in results if not result['used']]
+        if missing:
+            raise CommandError(f"Queries not using their index: {', '.join(missing)}")
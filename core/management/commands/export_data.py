@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.export import DATASETS, OUTPUT_FORMATS, export_queryset, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams jobs, tasks or equipment as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--output', choices=list(OUTPUT_FORMATS), default='csv', help='Output format')
+        parser.add_argument('--file', help='Write to this file instead of stdout')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='FIELD=VALUE',
+            help='Filter as on the export API, e.g. --filter status=PENDING (repeatable)',
+        )
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per cursor round trip')
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            field, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Expected FIELD=VALUE, got {item!r}')
+            params[field] = value
+        try:
+            queryset, columns = export_queryset(options['dataset'], params)
+        except ValueError as exc:
+            raise CommandError(f'Invalid filters: {exc.args[0].as_text()}')
+
+        blocks = export_rows(queryset, columns, options['output'], options['chunk_size'])
+        if options['file']:
+            with open(options['file'], 'w', newline='') as out:
+                for block in blocks:
+                    out.write(block)
+        else:
+            for block in blocks:
+                self.stdout.write(block, ending='')
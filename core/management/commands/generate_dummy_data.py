@@ -1,100 +1,262 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from core.models import User, Equipment, Job, JobTask
+import csv
+import io
 import random
 from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from core.dashboard import bump_dashboard_version, bump_equipment_version
+from core.models import User, Equipment, Job, JobTask
+from core.reservations import mark_reservations_changed
+from core.workload import mark_workload_changed, workload_date
+
+EQUIPMENT_DATA = [
+    {'name': 'Drill', 'type': 'TOOL', 'serial_number': 'DR123'},
+    {'name': 'Hammer', 'type': 'TOOL', 'serial_number': 'HM456'},
+    {'name': 'Wrench', 'type': 'TOOL', 'serial_number': 'WR789'},
+    {'name': 'Crane', 'type': 'MACHINE', 'serial_number': 'CR101'},
+    {'name': 'Truck', 'type': 'VEHICLE', 'serial_number': 'TR202'},
+]
+EQUIPMENT_TYPES = ['TOOL', 'MACHINE', 'VEHICLE']
+JOB_STATUSES = ['PENDING', 'IN_PROGRESS', 'COMPLETED']
+TASK_STATUSES = ['PENDING', 'IN_PROGRESS', 'COMPLETED']
+PRIORITIES = ['LOW', 'MEDIUM', 'HIGH']
+
+
+def parse_range(value):
+    low, _, high = value.partition('-')
+    try:
+        low = int(low)
+        high = int(high) if high else low
+    except ValueError:
+        raise CommandError(f'Expected N or MIN-MAX, got {value!r}')
+    if low < 0 or high < low:
+        raise CommandError(f'Invalid range {value!r}')
+    return low, high
+
+
+def generate_jobs(rng, first, count, base_date, technicians, sales_agents, equipment, tasks_per_job, unassigned=0):
+    """Yield ``(job, tasks)`` rows as plain dicts, each task carrying the
+    indexes of its equipment. Output depends only on the generator state,
+    so a seed reproduces the same data set on either load path. A fraction
+    ``unassigned`` of the pending jobs are left for core.scheduling.
+    """
+    min_tasks, max_tasks = tasks_per_job
+    max_equipment = min(3, len(equipment))
+    for i in range(first, first + count):
+        job = {
+            'title': f'Job {i+1}',
+            'description': f'Description for Job {i+1}',
+            'client_name': f'Client {i+1}',
+            'created_by_id': sales_agents[rng.randrange(len(sales_agents))],
+            'assigned_to_id': technicians[rng.randrange(len(technicians))],
+            'status': rng.choice(JOB_STATUSES),
+            'priority': rng.choice(PRIORITIES),
+            # Past and future for overdue testing
+            'scheduled_date': base_date + timedelta(days=rng.randint(-10, 10), minutes=rng.randrange(24 * 60)),
+        }
+        if unassigned and job['status'] == 'PENDING' and rng.random() < unassigned:
+            job['assigned_to_id'] = None
+        tasks = []
+        for j in range(rng.randint(min_tasks, max_tasks)):
+            tasks.append({
+                'title': f'Task {j+1} for Job {i+1}',
+                'description': f'Description for Task {j+1}',
+                'status': rng.choice(TASK_STATUSES),
+                'order': j + 1,
+                'equipment': rng.sample(range(len(equipment)), rng.randint(1, max_equipment)) if max_equipment else [],
+            })
+        yield job, tasks
+
 
 class Command(BaseCommand):
     help = 'Generates dummy data for testing JobOps flows'
 
     def add_arguments(self, parser):
         parser.add_argument('--jobs', type=int, default=10, help='Number of jobs to create')
+        parser.add_argument('--technicians', type=int, default=2, help='Number of technicians (tech1..techN)')
+        parser.add_argument('--equipment', type=int, default=len(EQUIPMENT_DATA), help='Number of equipment items')
+        parser.add_argument('--tasks-per-job', default='2-5', help='Tasks per job, as N or MIN-MAX')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Jobs inserted per batch')
+        parser.add_argument('--copy', action='store_true', help='Load rows with PostgreSQL COPY instead of bulk_create')
+        parser.add_argument(
+            '--unassigned', type=float, default=0,
+            help='Fraction of pending jobs left without a technician, for assign_jobs',
+        )
 
     def handle(self, *args, **options):
         num_jobs = options['jobs']
+        batch_size = options['batch_size']
+        tasks_per_job = parse_range(options['tasks_per_job'])
+        if options['technicians'] < 1 or options['equipment'] < 0 or batch_size < 1:
+            raise CommandError('--technicians and --batch-size must be positive and --equipment not negative.')
+        if not 0 <= options['unassigned'] <= 1:
+            raise CommandError('--unassigned must be between 0 and 1.')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs a PostgreSQL database.')
+        self.verbosity = options['verbosity']
+        rng = random.Random(options['seed'])
         self.stdout.write(self.style.SUCCESS('Generating dummy data...'))
 
-        # Create users
+        self.create_admin()
+        technicians = self.create_users('tech', 'TECHNICIAN', options['technicians'])
+        sales_agents = self.create_users('sales', 'SALES_AGENT', 2)
+        equipment = self.create_equipment(options['equipment'])
+
+        # Midnight keeps seeded runs on the same day identical
+        base_date = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        load_batch = self.copy_batch if options['copy'] else self.insert_batch
+        for first in range(0, num_jobs, batch_size):
+            rows = list(generate_jobs(
+                rng, first, min(batch_size, num_jobs - first), base_date,
+                technicians, sales_agents, equipment, tasks_per_job, options['unassigned'],
+            ))
+            with transaction.atomic():
+                job_ids = load_batch(rows, equipment)
+                mark_workload_changed({(job['assigned_to_id'], workload_date(job['scheduled_date'])) for job, _ in rows})
+                mark_reservations_changed(job_ids)
+            self.stdout.write(f'Inserted {first + len(rows)}/{num_jobs} jobs')
+
+        # bulk_create and COPY skip the signals that keep the dashboard cache
+        # fresh; the workload rollup and reservations were refreshed per batch
+        bump_dashboard_version(*technicians)
+        bump_equipment_version()
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated {num_jobs} jobs with tasks.'))
+
+    def log_row(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def create_admin(self):
         if not User.objects.filter(username='admin1').exists():
             admin = User.objects.create_superuser(
                 username='admin1', email='admin1@example.com', password='admin123', role='ADMIN'
             )
             self.stdout.write(self.style.SUCCESS(f'Created admin: {admin.username}'))
-        else:
-            admin = User.objects.get(username='admin1')
-
-        technicians = []
-        for i in range(1, 3):
-            username = f'tech{i}'
-            if not User.objects.filter(username=username).exists():
-                tech = User.objects.create_user(
-                    username=username, email=f'{username}@example.com',
-                    password=f'tech{i}123', role='TECHNICIAN'
-                )
-                technicians.append(tech)
-                self.stdout.write(self.style.SUCCESS(f'Created technician: {username}'))
-            else:
-                technicians.append(User.objects.get(username=username))
-
-        sales_agents = []
-        for i in range(1, 3):
-            username = f'sales{i}'
-            if not User.objects.filter(username=username).exists():
-                sales = User.objects.create_user(
-                    username=username, email=f'{username}@example.com',
-                    password=f'sales{i}123', role='SALES_AGENT'
-                )
-                sales_agents.append(sales)
-                self.stdout.write(self.style.SUCCESS(f'Created sales agent: {username}'))
+
+    def create_users(self, prefix, role, count):
+        """Create ``{prefix}1``..``{prefix}{count}`` and return their ids in order.
+
+        The first two keep their documented ``{prefix}{i}123`` passwords; any
+        further users share one ``{prefix}123`` hash so large runs do not pay
+        for thousands of password hashes.
+        """
+        usernames = [f'{prefix}{i}' for i in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        shared_password = None
+        new_users = []
+        for i, username in enumerate(usernames, start=1):
+            if username in existing:
+                continue
+            if i <= 2:
+                password = make_password(f'{prefix}{i}123')
             else:
-                sales_agents.append(User.objects.get(username=username))
-
-        # Create equipment
-        equipment_data = [
-            {'name': 'Drill', 'type': 'TOOL', 'serial_number': 'DR123'},
-            {'name': 'Hammer', 'type': 'TOOL', 'serial_number': 'HM456'},
-            {'name': 'Wrench', 'type': 'TOOL', 'serial_number': 'WR789'},
-            {'name': 'Crane', 'type': 'MACHINE', 'serial_number': 'CR101'},
-            {'name': 'Truck', 'type': 'VEHICLE', 'serial_number': 'TR202'},
+                shared_password = shared_password or make_password(f'{prefix}123')
+                password = shared_password
+            new_users.append(User(username=username, email=f'{username}@example.com', password=password, role=role))
+        for batch_start in range(0, len(new_users), 1000):
+            User.objects.bulk_create(new_users[batch_start:batch_start + 1000])
+        for user in new_users:
+            self.log_row(f'Created {role.lower().replace("_", " ")}: {user.username}')
+        if new_users:
+            self.stdout.write(self.style.SUCCESS(f'Created {len(new_users)} {role.lower()} users'))
+
+        ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        return [ids[username] for username in usernames]
+
+    def create_equipment(self, count):
+        equipment_data = EQUIPMENT_DATA[:count] + [
+            {'name': f'Equipment {i}', 'type': EQUIPMENT_TYPES[i % len(EQUIPMENT_TYPES)], 'serial_number': f'EQ{i:06d}'}
+            for i in range(len(EQUIPMENT_DATA) + 1, count + 1)
         ]
-        equipment = []
-        for eq in equipment_data:
-            if not Equipment.objects.filter(serial_number=eq['serial_number']).exists():
-                eq_obj = Equipment.objects.create(**eq, is_active=True)
-                equipment.append(eq_obj)
-                self.stdout.write(self.style.SUCCESS(f'Created equipment: {eq_obj.name}'))
-            else:
-                equipment.append(Equipment.objects.get(serial_number=eq['serial_number']))
+        serials = [eq['serial_number'] for eq in equipment_data]
+        created = Equipment.objects.bulk_create(
+            [Equipment(**eq, is_active=True) for eq in equipment_data],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        for eq in created:
+            self.log_row(f'Created equipment: {eq.name}')
+        ids = dict(Equipment.objects.filter(serial_number__in=serials).values_list('serial_number', 'id'))
+        return [ids[serial] for serial in serials]
+
+    def insert_batch(self, rows, equipment):
+        jobs = Job.objects.bulk_create([Job(**job) for job, _ in rows])
+        tasks = []
+        for job, (_, job_tasks) in zip(jobs, rows):
+            self.log_row(f'Created job: {job.title}')
+            for task in job_tasks:
+                tasks.append(JobTask(job=job, **{k: v for k, v in task.items() if k != 'equipment'}))
+        JobTask.objects.bulk_create(tasks)
 
-        # Create jobs
-        job_statuses = ['PENDING', 'IN_PROGRESS', 'COMPLETED']
-        priorities = ['LOW', 'MEDIUM', 'HIGH']
+        through = JobTask.required_equipment.through
+        task_rows = [task for _, job_tasks in rows for task in job_tasks]
+        links = []
+        for task, row in zip(tasks, task_rows):
+            self.log_row(f'Created task: {task.title}')
+            links.extend(through(jobtask_id=task.id, equipment_id=equipment[k]) for k in row['equipment'])
+        through.objects.bulk_create(links)
+        return [job.id for job in jobs]
+
+    def copy_batch(self, rows, equipment):
+        # Ids are reserved up front so tasks and equipment links can reference
+        # them in the same COPY stream
         now = timezone.now()
-        for i in range(num_jobs):
-            scheduled_date = now + timedelta(days=random.randint(-10, 10))  # Past and future for overdue testing
-            job = Job.objects.create(
-                title=f'Job {i+1}',
-                description=f'Description for Job {i+1}',
-                client_name=f'Client {i+1}',
-                created_by=random.choice(sales_agents),
-                assigned_to=random.choice(technicians),
-                status=random.choice(job_statuses),
-                priority=random.choice(priorities),
-                scheduled_date=scheduled_date
-            )
-            self.stdout.write(self.style.SUCCESS(f'Created job: {job.title}'))
-
-            # Create tasks for each job
-            num_tasks = random.randint(2, 5)
-            for j in range(num_tasks):
-                task = JobTask.objects.create(
-                    job=job,
-                    title=f'Task {j+1} for Job {i+1}',
-                    description=f'Description for Task {j+1}',
-                    status=random.choice(['PENDING', 'IN_PROGRESS', 'COMPLETED']),
-                    order=j+1
-                )
-                task.required_equipment.set(random.sample(equipment, random.randint(1, 3)))
-                self.stdout.write(self.style.SUCCESS(f'Created task: {task.title}'))
-
-        self.stdout.write(self.style.SUCCESS(f'Successfully generated {num_jobs} jobs with tasks.'))
\ No newline at end of file
+        through = JobTask.required_equipment.through
+        with connection.cursor() as cursor:
+            job_ids = self.next_ids(cursor, Job, len(rows))
+            task_ids = iter(self.next_ids(cursor, JobTask, sum(len(tasks) for _, tasks in rows)))
+            link_ids = iter(self.next_ids(
+                cursor, through, sum(len(task['equipment']) for _, tasks in rows for task in tasks),
+            ))
+            job_buffer, task_buffer, link_buffer = io.StringIO(), io.StringIO(), io.StringIO()
+            job_csv, task_csv, link_csv = csv.writer(job_buffer), csv.writer(task_buffer), csv.writer(link_buffer)
+            for job_id, (job, tasks) in zip(job_ids, rows):
+                job_csv.writerow([
+                    job_id, job['title'], job['description'], job['client_name'], job['created_by_id'],
+                    job['assigned_to_id'], job['status'], job['priority'], job['scheduled_date'].isoformat(),
+                    'f', now.isoformat(), now.isoformat(),
+                ])
+                self.log_row(f"Created job: {job['title']}")
+                for task in tasks:
+                    task_id = next(task_ids)
+                    task_csv.writerow([
+                        task_id, job_id, task['title'], task['description'], task['status'], task['order'],
+                        None, now.isoformat(), now.isoformat(),
+                    ])
+                    self.log_row(f"Created task: {task['title']}")
+                    for k in task['equipment']:
+                        link_csv.writerow([next(link_ids), task_id, equipment[k]])
+
+            self.copy(cursor, Job, job_buffer, [
+                'id', 'title', 'description', 'client_name', 'created_by_id', 'assigned_to_id',
+                'status', 'priority', 'scheduled_date', 'overdue', 'created_at', 'updated_at',
+            ])
+            self.copy(cursor, JobTask, task_buffer, [
+                'id', 'job_id', 'title', 'description', 'status', 'order',
+                'completed_at', 'created_at', 'updated_at',
+            ])
+            self.copy(cursor, through, link_buffer, ['id', 'jobtask_id', 'equipment_id'])
+        return job_ids
+
+    def next_ids(self, cursor, model, count):
+        """Draw ``count`` ids from the table's sequence.
+
+        Every id comes from its own ``nextval``, so writers inserting at the
+        same time can never be handed one of them; the ids need not be
+        contiguous.
+        """
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [model._meta.db_table, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def copy(self, cursor, model, buffer, columns):
+        buffer.seek(0)
+        column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} ({column_list}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
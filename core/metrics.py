@@ -0,0 +1,64 @@
+from .dashboard import dashboard_cache_stats
+from .events import broker
+from .profiling import snapshot
+
+# Per-view request profile totals: (stats key, metric suffix, help text)
+REQUEST_METRICS = [
+    ('requests', 'requests_total', 'Profiled requests.'),
+    ('total_ms', 'duration_ms_total', 'Total time spent in profiled requests.'),
+    ('sql_ms', 'sql_duration_ms_total', 'Time spent running SQL.'),
+    ('queries', 'sql_queries_total', 'SQL queries run.'),
+    ('duplicate_queries', 'sql_duplicate_queries_total', 'Queries repeating an earlier query of the same request.'),
+    ('auth_ms', 'auth_duration_ms_total', 'Time spent authenticating tokens.'),
+    ('view_ms', 'view_duration_ms_total', 'Time spent in views, serializers included.'),
+    ('serialize_ms', 'serialize_duration_ms_total', 'Time spent building response payloads, within views.'),
+    ('render_ms', 'render_duration_ms_total', 'Time spent rendering responses.'),
+]
+
+
+def _counter(name, help_text, value):
+    return [
+        f'# HELP {name} {help_text}',
+        f'# TYPE {name} counter',
+        f'{name} {value}',
+    ]
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _request_metrics():
+    stats, duplicates = snapshot()
+    lines = []
+    for key, suffix, help_text in REQUEST_METRICS:
+        name = f'jobops_request_{suffix}'
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view in sorted(stats):
+            value = stats[view].get(key, 0)
+            lines.append(f'{name}{{view="{_label(view)}"}} {round(value, 3)}')
+
+    name = 'jobops_request_duplicate_query_total'
+    lines += [
+        f'# HELP {name} Most repeated queries per view, by SQL signature.',
+        f'# TYPE {name} counter',
+    ]
+    for view in sorted(duplicates):
+        for sql, count in duplicates[view]:
+            lines.append(f'{name}{{view="{_label(view)}",sql="{_label(sql[:200])}"}} {count}')
+    return lines
+
+
+def render_metrics():
+    # Prometheus text exposition format
+    stats = dashboard_cache_stats()
+    lines = []
+    lines += _counter('jobops_dashboard_cache_hits_total', 'Dashboard payloads served from the cache.', stats['hits'])
+    lines += _counter('jobops_dashboard_cache_misses_total', 'Dashboard payloads rebuilt from the database.', stats['misses'])
+    lines += [
+        '# HELP jobops_dashboard_event_streams Open dashboard event streams in this process.',
+        '# TYPE jobops_dashboard_event_streams gauge',
+        f'jobops_dashboard_event_streams {broker.count()}',
+    ]
+    lines += _request_metrics()
+    return '\n'.join(lines) + '\n'
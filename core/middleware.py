@@ -0,0 +1,103 @@
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from . import profiling
+from .routers import pin_to_primary
+
+
+class RequestProfilingMiddleware:
+    """Profile a sample of requests: SQL count and time, duplicated queries,
+    token authentication, view, serializer and rendering time, and total
+    time.
+
+    Each sampled response gets a ``Server-Timing`` header and its numbers are
+    added to the per-view totals served by ``/api/metrics/``. With
+    ``REQUEST_PROFILING_SAMPLE_RATE`` at 0 the middleware removes itself at
+    startup, so it costs nothing when off.
+
+    SQL is timed through the connections' execute wrappers, the view from
+    process_view() until it returns, and rendering by wrapping the response's
+    own render(), so nothing outside the sampled request is patched.
+    Serializers and the dashboard builder add their own ``serialize``
+    section.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.record_query))
+            stack.enter_context(profiling.activate(profile))
+            response = self.get_response(request)
+        profile.end_view()
+        total_ms = (time.perf_counter() - profile.started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        profiling.record(match.view_name if match else 'unresolved', profile, total_ms)
+        response['Server-Timing'] = self.server_timing(profile, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = profiling.current_profile()
+        if profile is not None:
+            profile.start_view()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        profile = profiling.current_profile()
+        if profile is not None:
+            profile.end_view()
+            render = response.render
+
+            def timed_render():
+                # Back to the class's render(), so the response pickles as usual
+                del response.render
+                with profiling.section('render'):
+                    return render()
+            response.render = timed_render
+        return response
+
+    def server_timing(self, profile, total_ms):
+        duplicates = sum(count - 1 for count in profile.duplicates().values())
+        return ', '.join([
+            f'sql;dur={profile.sql_ms:.1f};desc="{profile.query_count} queries, {duplicates} duplicate"',
+            f'auth;dur={profile.sections["auth"]:.1f}',
+            f'view;dur={profile.sections["view"]:.1f}',
+            f'serialize;dur={profile.sections["serialize"]:.1f}',
+            f'render;dur={profile.sections["render"]:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+
+class ReplicaPinMiddleware:
+    """Pin users to the primary database for DATABASE_REPLICA_PIN_SECONDS
+    after any request of theirs that may write, so their next reads see the
+    write even when a replica lags behind. Removed at startup when no
+    DATABASE_REPLICAS are configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF sets request.user once a token authenticates
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['assigned_to', 'scheduled_date'], name='job_assignee_sched_idx'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='assigned_to',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('overdue', False), ('status__in', ['PENDING', 'IN_PROGRESS'])), fields=['scheduled_date'], name='job_open_not_overdue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobtask',
+            index=models.Index(condition=models.Q(('status', 'COMPLETED'), _negated=True), fields=['job', 'order'], name='jobtask_open_per_job_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkloadRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed')], max_length=20)),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High')], max_length=20)),
+                ('jobs', models.PositiveIntegerField(default=0)),
+                ('overdue_jobs', models.PositiveIntegerField(default=0)),
+                ('open_tasks', models.PositiveIntegerField(default=0)),
+                ('technician', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='workload', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='workload_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='workloadrollup',
+            constraint=models.UniqueConstraint(fields=('technician', 'date', 'status', 'priority'), name='workload_rollup_key'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_workload_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EquipmentSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('jobs', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['type', 'id'], name='equipment_type_idx'),
+        ),
+        migrations.AddField(
+            model_name='equipmentslot',
+            name='equipment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='core.equipment'),
+        ),
+        migrations.AddField(
+            model_name='equipmentreservation',
+            name='equipment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.equipment'),
+        ),
+        migrations.AddField(
+            model_name='equipmentreservation',
+            name='job',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.job'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentslot',
+            index=models.Index(condition=models.Q(('jobs__gt', 1)), fields=['date', 'equipment'], name='equipment_conflict_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentslot',
+            constraint=models.UniqueConstraint(fields=('equipment', 'date'), name='equipment_slot_key'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentreservation',
+            index=models.Index(fields=['equipment', 'date'], name='reservation_slot_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentreservation',
+            constraint=models.UniqueConstraint(fields=('job', 'equipment'), name='reservation_job_equipment_key'),
+        ),
+    ]
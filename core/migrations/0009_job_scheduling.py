@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-18 08:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_equipment_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='daily_capacity',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='assigned_to',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('status', 'PENDING')), fields=['scheduled_date'], name='job_unassigned_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:00
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+PREFIX_INDEXES = [
+    ('archivedjob', models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='archivedjob_title_prefix_idx')),
+    ('archivedjob', models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('client_name'), name='text_pattern_ops'), name='archivedjob_client_prefix_idx')),
+    ('job', models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='job_title_prefix_idx')),
+    ('job', models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('client_name'), name='text_pattern_ops'), name='job_client_prefix_idx')),
+    ('jobtask', models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='jobtask_title_prefix_idx')),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # text_pattern_ops is PostgreSQL's; other databases (SQLite in tests)
+    # search unindexed
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in PREFIX_INDEXES:
+        schema_editor.add_index(apps.get_model('core', model_name), index)
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in PREFIX_INDEXES:
+        schema_editor.remove_index(apps.get_model('core', model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_job_archive'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index) for model_name, index in PREFIX_INDEXES
+            ],
+            database_operations=[migrations.RunPython(create_prefix_indexes, drop_prefix_indexes)],
+        ),
+    ]
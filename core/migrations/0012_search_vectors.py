@@ -0,0 +1,95 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Search vectors for core.search, in its SEARCH_CONFIG. A BEFORE trigger
+# rebuilds a row's vector on insert, COPY included, and whenever its text
+# columns are in an UPDATE's SET list, so every write path keeps it current.
+TRIGGERS = """
+CREATE FUNCTION core_job_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(NEW.client_name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER core_job_search_vector
+    BEFORE INSERT OR UPDATE OF title, client_name, description, search_vector ON core_job
+    FOR EACH ROW EXECUTE FUNCTION core_job_search_vector();
+
+CREATE FUNCTION core_jobtask_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER core_jobtask_search_vector
+    BEFORE INSERT OR UPDATE OF title, description, search_vector ON core_jobtask
+    FOR EACH ROW EXECUTE FUNCTION core_jobtask_search_vector();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER core_job_search_vector ON core_job;
+DROP FUNCTION core_job_search_vector();
+DROP TRIGGER core_jobtask_search_vector ON core_jobtask;
+DROP FUNCTION core_jobtask_search_vector();
+"""
+
+SEARCH_INDEXES = [
+    ('job', django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='job_search_idx')),
+    ('jobtask', django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='jobtask_search_idx')),
+]
+
+
+def create_search_vectors(apps, schema_editor):
+    # Other databases (SQLite in tests) have no tsvector; core.search falls
+    # back to substring matches there
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(TRIGGERS)
+    # Existing rows go through the triggers; the indexes are built after,
+    # in one pass
+    schema_editor.execute('UPDATE core_job SET search_vector = NULL')
+    schema_editor.execute('UPDATE core_jobtask SET search_vector = NULL')
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('core', model_name), index)
+
+
+def drop_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('core', model_name), index)
+    schema_editor.execute(DROP_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_admin_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobtask',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index) for model_name, index in SEARCH_INDEXES
+            ],
+            database_operations=[migrations.RunPython(create_search_vectors, drop_search_vectors)],
+        ),
+    ]
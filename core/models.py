@@ -1,5 +1,17 @@
-from django.db import models
+import uuid
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+
+
+def prefix_index(field, name):
+    # Serves the admin's prefix search on large tables, UPPER(field) LIKE
+    # 'TERM%', whatever the database's collation. Only created on
+    # PostgreSQL (see 0011_admin_prefix_indexes).
+    return models.Index(OpClass(Upper(field), name='text_pattern_ops'), name=name)
+
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -8,6 +20,11 @@ class User(AbstractUser):
         ('SALES_AGENT', 'SalesAgent'),
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='TECHNICIAN')
+    # Copied into issued JWTs; bumping it revokes every token issued before
+    token_version = models.PositiveIntegerField(default=0)
+    # Jobs per day core.scheduling may give a technician; empty for
+    # SCHEDULER_DAILY_CAPACITY
+    daily_capacity = models.PositiveSmallIntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -25,15 +42,58 @@ class Job(models.Model):
     )
     title = models.CharField(max_length=200)
     description = models.TextField()
+    # Key of the job in the CRM it was imported from, used for bulk upserts
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     client_name = models.CharField(max_length=200)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_jobs')
-    assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assigned_jobs')
+    # Indexed through job_assignee_sched_idx, which leads with assigned_to.
+    # Empty until a dispatcher or core.scheduling assigns the job.
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='assigned_jobs', db_index=False, null=True, blank=True,
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='MEDIUM')
     scheduled_date = models.DateTimeField()
     overdue = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Title and client name (weight A) and description (C) for core.search,
+    # written by a trigger on every insert and text update (migration
+    # 0012_search_vectors), however the row is written
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Technician dashboard: a technician's jobs in schedule order
+            models.Index(fields=['assigned_to', 'scheduled_date'], name='job_assignee_sched_idx'),
+            # Keyset pagination of the job list
+            models.Index(fields=['scheduled_date', 'id'], name='job_sched_id_idx'),
+            # flag_overdue_jobs: open jobs not yet flagged, by schedule
+            models.Index(
+                fields=['scheduled_date'], name='job_open_not_overdue_idx',
+                condition=models.Q(status__in=['PENDING', 'IN_PROGRESS'], overdue=False),
+            ),
+            # clear_overdue_jobs: jobs currently flagged overdue, by schedule
+            models.Index(fields=['scheduled_date'], name='job_overdue_idx', condition=models.Q(overdue=True)),
+            # core.scheduling: pending jobs nobody is assigned to, by schedule
+            models.Index(
+                fields=['scheduled_date'], name='job_unassigned_idx',
+                condition=models.Q(status='PENDING', assigned_to__isnull=True),
+            ),
+            # core.archive: completed jobs still in this table, by schedule
+            models.Index(fields=['scheduled_date', 'id'], name='job_completed_idx', condition=models.Q(status='COMPLETED')),
+            # core.admin.JobAdmin: search by title or client name
+            prefix_index('title', 'job_title_prefix_idx'),
+            prefix_index('client_name', 'job_client_prefix_idx'),
+            # core.search
+            GinIndex(fields=['search_vector'], name='job_search_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The outbox event of a status change, written on post_save
+        # (core.signals), commits or rolls back with the row
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} ({self.client_name})"
@@ -53,9 +113,27 @@ class JobTask(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Title (weight B) and description (C), kept like Job.search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Open tasks per job, in task order
+            models.Index(
+                fields=['job', 'order'], name='jobtask_open_per_job_idx',
+                condition=~models.Q(status='COMPLETED'),
+            ),
+            # core.admin.JobTaskAdmin: search by title
+            prefix_index('title', 'jobtask_title_prefix_idx'),
+            # core.search
+            GinIndex(fields=['search_vector'], name='jobtask_search_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # As Job.save()
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} (Job: {self.job.title})"
@@ -68,5 +146,162 @@ class Equipment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Free equipment of a type, in id order
+            models.Index(fields=['type', 'id'], name='equipment_type_idx', condition=models.Q(is_active=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.serial_number})"
+
+class Checkpoint(models.Model):
+    # Resume position of a long-running batch job, keyed by job name
+    name = models.CharField(max_length=100, unique=True)
+    position = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+class WorkloadRollup(models.Model):
+    # Jobs per technician, day, status and priority, kept by core.workload
+    technician = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workload', db_index=False)
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Job.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Job.PRIORITY_CHOICES)
+    jobs = models.PositiveIntegerField(default=0)
+    overdue_jobs = models.PositiveIntegerField(default=0)
+    open_tasks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves a technician's rows by date
+            models.UniqueConstraint(fields=['technician', 'date', 'status', 'priority'], name='workload_rollup_key'),
+        ]
+        indexes = [
+            # Every technician's rows for a date range
+            models.Index(fields=['date'], name='workload_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.technician_id} {self.date} {self.status}/{self.priority}: {self.jobs}"
+
+
+class EquipmentReservation(models.Model):
+    # A job needing an equipment item on its scheduled day, for an open
+    # task; kept by core.reservations. A deleted job's rows stay until the
+    # refresh after the delete, which recounts their slots.
+    job = models.ForeignKey(Job, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='reservations', db_index=False)
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'equipment'], name='reservation_job_equipment_key'),
+        ]
+        indexes = [
+            # The jobs holding an equipment item on a day
+            models.Index(fields=['equipment', 'date'], name='reservation_slot_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_id} {self.date}: job {self.job_id}"
+
+
+class EquipmentSlot(models.Model):
+    # How many jobs need an equipment item on a day; only days with at least
+    # one are stored. Kept by core.reservations.
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='slots', db_index=False)
+    date = models.DateField()
+    jobs = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also serves "is this item taken on these days"
+            models.UniqueConstraint(fields=['equipment', 'date'], name='equipment_slot_key'),
+        ]
+        indexes = [
+            # Double bookings by day, without reading the others
+            models.Index(fields=['date', 'equipment'], name='equipment_conflict_idx', condition=models.Q(jobs__gt=1)),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_id} {self.date}: {self.jobs} jobs"
+
+
+class ArchivedJob(models.Model):
+    # A completed job moved out of Job by core.archive, with its id and
+    # columns as they were, so it can be moved back unchanged
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    client_name = models.CharField(max_length=200)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+', db_index=False, null=True, blank=True,
+    )
+    status = models.CharField(max_length=20, choices=Job.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Job.PRIORITY_CHOICES)
+    scheduled_date = models.DateTimeField()
+    overdue = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the archived job list
+            models.Index(fields=['scheduled_date', 'id'], name='archivedjob_sched_id_idx'),
+            # A technician's archived jobs in schedule order
+            models.Index(fields=['assigned_to', 'scheduled_date'], name='archivedjob_assignee_sched_idx'),
+            # core.admin.ArchivedJobAdmin: search by title or client name
+            prefix_index('title', 'archivedjob_title_prefix_idx'),
+            prefix_index('client_name', 'archivedjob_client_prefix_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.client_name})"
+
+
+class ArchivedJobTask(models.Model):
+    # A task of an ArchivedJob, moved with it
+    id = models.BigIntegerField(primary_key=True)
+    job = models.ForeignKey(ArchivedJob, on_delete=models.CASCADE, related_name='tasks')
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    status = models.CharField(max_length=20, choices=JobTask.STATUS_CHOICES)
+    order = models.PositiveIntegerField(default=1)
+    required_equipment = models.ManyToManyField(Equipment, related_name='+')
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['order']
+
+    def __str__(self):
+        return f"{self.title} (Job: {self.job_id})"
+
+
+class OutboxEvent(models.Model):
+    # A job or task status change not yet published, written in the
+    # transaction making the change and deleted once core.outbox has
+    # published it. Consumers may see an event more than once, always with
+    # the same dedup_key.
+    JOB_STATUS_CHANGED = 'job.status_changed'
+    TASK_STATUS_CHANGED = 'task.status_changed'
+    EVENT_TYPES = (
+        (JOB_STATUS_CHANGED, 'Job status changed'),
+        (TASK_STATUS_CHANGED, 'Task status changed'),
+    )
+    event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
+    # The job's or task's id
+    object_id = models.BigIntegerField()
+    payload = models.JSONField()
+    dedup_key = models.UUIDField(default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return f"{self.name} ({self.serial_number})"
\ No newline at end of file
+        return f"{self.event_type} {self.object_id}"
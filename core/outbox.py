@@ -0,0 +1,155 @@
+import json
+import logging
+import time
+import urllib.request
+from django.conf import settings
+from django.db import transaction
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def job_status_changed(job_id, status, previous=None):
+    # ``previous`` is None for a new job
+    return OutboxEvent(
+        event_type=OutboxEvent.JOB_STATUS_CHANGED, object_id=job_id,
+        payload={'job': job_id, 'status': status, 'previous_status': previous},
+    )
+
+
+def task_status_changed(task_id, job_id, status, previous=None):
+    return OutboxEvent(
+        event_type=OutboxEvent.TASK_STATUS_CHANGED, object_id=task_id,
+        payload={'task': task_id, 'job': job_id, 'status': status, 'previous_status': previous},
+    )
+
+
+def record_events(events):
+    """Write ``events`` to the outbox, in the current transaction, so they
+    are published only if the changes they describe commit."""
+    if events:
+        OutboxEvent.objects.bulk_create(events)
+
+
+def _message(row):
+    return {
+        'id': row['id'],
+        'dedup_key': str(row['dedup_key']),
+        'type': row['event_type'],
+        'occurred_at': row['created_at'].isoformat(),
+        'data': row['payload'],
+    }
+
+
+class MemorySink:
+    """Keeps published messages in ``messages``, for tests and development."""
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, messages):
+        self.messages.extend(messages)
+
+
+class RedisStreamSink:
+    """Appends each message to a Redis stream, trimmed to about ``maxlen``
+    entries. Entries carry the message's ``dedup_key`` and ``type`` as
+    fields of their own, and the whole message as JSON in ``event``.
+    """
+
+    def __init__(self, url, stream, maxlen):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+
+    def publish(self, messages):
+        with self.client.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.xadd(
+                    self.stream,
+                    {'dedup_key': message['dedup_key'], 'type': message['type'], 'event': json.dumps(message)},
+                    maxlen=self.maxlen, approximate=True,
+                )
+            pipe.execute()
+
+
+class WebhookSink:
+    """POSTs each batch as ``{"events": [...]}``; any response but a 2xx
+    fails the batch."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+
+    def publish(self, messages):
+        request = urllib.request.Request(
+            self.url, data=json.dumps({'events': messages}).encode(), method='POST',
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise OSError(f'Webhook answered {response.status}')
+
+
+_sinks = {}
+
+
+def get_sink():
+    name = settings.OUTBOX_SINK
+    if name not in _sinks:
+        if name == 'redis':
+            _sinks[name] = RedisStreamSink(
+                settings.OUTBOX_REDIS_URL, settings.OUTBOX_REDIS_STREAM, settings.OUTBOX_REDIS_MAXLEN,
+            )
+        elif name == 'webhook':
+            _sinks[name] = WebhookSink(settings.OUTBOX_WEBHOOK_URL, settings.OUTBOX_WEBHOOK_TIMEOUT)
+        elif name == 'memory':
+            _sinks[name] = MemorySink()
+        else:
+            raise ValueError(f'Unknown OUTBOX_SINK {name!r}')
+    return _sinks[name]
+
+
+def publish_events(batch_size=None, time_budget=None, sink=None):
+    """Publish the outbox to ``sink`` (OUTBOX_SINK), oldest first, in
+    batches of ``batch_size`` events (OUTBOX_BATCH_SIZE).
+
+    Each batch is locked with SKIP LOCKED, published, and deleted in one
+    transaction, so concurrent runs publish different batches. A batch whose
+    transaction does not commit after the sink took it is published again
+    by a later run, with the same dedup keys. A failing sink stops the run
+    and leaves its batch for the next one. Stops once the outbox is empty or
+    after ``time_budget`` seconds (OUTBOX_TIME_BUDGET); returns a stats dict.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    time_budget = time_budget if time_budget is not None else settings.OUTBOX_TIME_BUDGET
+    sink = sink or get_sink()
+    started = time.monotonic()
+    stats = {'published': 0, 'batches': 0, 'complete': False}
+
+    while True:
+        rows = []
+        try:
+            with transaction.atomic():
+                rows = list(
+                    OutboxEvent.objects.order_by('id').select_for_update(skip_locked=True)
+                    .values('id', 'dedup_key', 'event_type', 'created_at', 'payload')[:batch_size]
+                )
+                if rows:
+                    sink.publish([_message(row) for row in rows])
+                    OutboxEvent.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        except Exception:
+            # The batch stays in the outbox for the next run
+            logger.exception('Could not publish %d outbox events', len(rows))
+            break
+        if not rows:
+            stats['complete'] = True
+            break
+        stats['published'] += len(rows)
+        stats['batches'] += 1
+        if time.monotonic() - started >= time_budget:
+            break
+
+    stats['elapsed'] = round(time.monotonic() - started, 3)
+    return stats
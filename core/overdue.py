@@ -0,0 +1,98 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Job, Checkpoint
+from .workload import job_buckets, mark_workload_changed
+
+OPEN_STATUSES = ['PENDING', 'IN_PROGRESS']
+
+
+def _load_position(name):
+    checkpoint = Checkpoint.objects.filter(name=name).first()
+    if checkpoint is None or not checkpoint.position:
+        return None
+    return parse_datetime(checkpoint.position['scheduled_date']), checkpoint.position['id']
+
+
+def _save_position(name, scheduled_date, job_id):
+    Checkpoint.objects.update_or_create(
+        name=name, defaults={'position': {'scheduled_date': scheduled_date.isoformat(), 'id': job_id}},
+    )
+
+
+def run_in_chunks(name, candidates, apply, batch_size=None, time_budget=None):
+    """Walk ``candidates`` in (scheduled_date, id) keyset order, one short
+    transaction per chunk, calling ``apply(ids)`` to update each chunk.
+
+    Rows locked by other transactions are skipped rather than waited on. The
+    position after every chunk is stored in a Checkpoint, so a run that hits
+    ``time_budget`` seconds or is killed resumes where it stopped; a run that
+    reaches the end clears it. Returns a stats dict.
+    """
+    batch_size = batch_size or settings.OVERDUE_BATCH_SIZE
+    time_budget = time_budget if time_budget is not None else settings.OVERDUE_TIME_BUDGET
+    started = time.monotonic()
+    stats = {'scanned': 0, 'updated': 0, 'chunks': 0, 'resumed': False, 'complete': False}
+
+    position = _load_position(name)
+    stats['resumed'] = position is not None
+    while True:
+        chunk = candidates
+        if position is not None:
+            scheduled_date, job_id = position
+            chunk = chunk.filter(
+                Q(scheduled_date__gt=scheduled_date) | Q(scheduled_date=scheduled_date, id__gt=job_id),
+                scheduled_date__gte=scheduled_date,
+            )
+        with transaction.atomic():
+            rows = list(
+                chunk.order_by('scheduled_date', 'id')
+                .select_for_update(skip_locked=True)
+                .values_list('scheduled_date', 'id')[:batch_size]
+            )
+            if rows:
+                stats['updated'] += apply([job_id for _, job_id in rows])
+                position = rows[-1]
+                _save_position(name, *position)
+        if not rows:
+            Checkpoint.objects.filter(name=name).delete()
+            stats['complete'] = True
+            break
+        stats['scanned'] += len(rows)
+        stats['chunks'] += 1
+        if time.monotonic() - started >= time_budget:
+            break
+
+    stats['elapsed'] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def flag_overdue(batch_size=None, time_budget=None):
+    now = timezone.now()
+    candidates = Job.objects.filter(scheduled_date__lt=now, status__in=OPEN_STATUSES, overdue=False)
+
+    def apply(ids):
+        # Re-checked so a job completed since the chunk was read stays untouched
+        mark_workload_changed(job_buckets(Job.objects.filter(id__in=ids)))
+        return candidates.filter(id__in=ids).update(overdue=True)
+
+    stats = run_in_chunks('flag_overdue_jobs', candidates, apply, batch_size, time_budget)
+    stats['flagged'] = stats.pop('updated')
+    return stats
+
+
+def clear_overdue(batch_size=None, time_budget=None):
+    now = timezone.now()
+    candidates = Job.objects.filter(overdue=True)
+    stale = Q(status='COMPLETED') | Q(scheduled_date__gte=now)
+
+    def apply(ids):
+        mark_workload_changed(job_buckets(Job.objects.filter(id__in=ids)))
+        return candidates.filter(stale, id__in=ids).update(overdue=False)
+
+    stats = run_in_chunks('clear_overdue_jobs', candidates, apply, batch_size, time_budget)
+    stats['cleared'] = stats.pop('updated')
+    return stats
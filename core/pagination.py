@@ -0,0 +1,92 @@
+from base64 import b64decode, b64encode
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a ``(datetime field, id)`` key.
+
+    Every page is ``WHERE key > cursor ORDER BY key LIMIT n``, so deep pages
+    cost the same as the first one and no ``COUNT(*)`` is run. Unlike DRF's
+    CursorPagination, ties on the datetime are broken by id rather than by
+    an offset. Views can set ``keyset_ordering`` to page on another field.
+    """
+    ordering = ('scheduled_date', 'id')
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.page_size = self.get_page_size(request)
+        date_field, id_field = self.ordering
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            after_date, after_id = position
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__gt': after_date}) | Q(**{date_field: after_date, f'{id_field}__gt': after_id}),
+                **{f'{date_field}__gte': after_date},
+            )
+        rows = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+
+        self.next_position = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_position = (self._value(rows[-1], date_field), self._value(rows[-1], id_field))
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def _value(self, row, field):
+        for attr in field.split('__'):
+            row = getattr(row, attr)
+        return row
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            date_str, _, id_str = b64decode(encoded.encode('ascii')).decode('ascii').partition('|')
+            after_date, after_id = parse_datetime(date_str), int(id_str)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if after_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return after_date, after_id
+
+    def encode_cursor(self, position):
+        after_date, after_id = position
+        return b64encode(f'{after_date.isoformat()}|{after_id}'.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TOP_DUPLICATES = 5
+_current = ContextVar('request_profile', default=None)
+_lock = threading.Lock()
+_stats = {}
+_duplicates = {}
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sections = Counter()
+        self.queries = Counter()
+        self.sql_ms = 0.0
+        self.view_started = None
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - started) * 1000
+            # ``sql`` still has its placeholders, so it is the query's signature
+            self.queries[sql] += 1
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+
+    def end_view(self):
+        # Called once the view returns; later calls change nothing
+        if self.view_started is not None:
+            self.sections['view'] += (time.perf_counter() - self.view_started) * 1000
+            self.view_started = None
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.queries.items() if count > 1}
+
+
+def current_profile():
+    return _current.get()
+
+
+@contextmanager
+def activate(profile):
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def section(name):
+    """Add the time spent in the block to ``name`` on the active profile."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.sections[name] += (time.perf_counter() - started) * 1000
+
+
+def record(view, profile, total_ms):
+    duplicates = profile.duplicates()
+    with _lock:
+        stats = _stats.setdefault(view, Counter())
+        stats['requests'] += 1
+        stats['total_ms'] += total_ms
+        stats['sql_ms'] += profile.sql_ms
+        stats['queries'] += profile.query_count
+        stats['duplicate_queries'] += sum(count - 1 for count in duplicates.values())
+        stats['auth_ms'] += profile.sections['auth']
+        stats['view_ms'] += profile.sections['view']
+        stats['serialize_ms'] += profile.sections['serialize']
+        stats['render_ms'] += profile.sections['render']
+        if duplicates:
+            seen = _duplicates.setdefault(view, Counter())
+            seen.update({sql: count - 1 for sql, count in duplicates.items()})
+            if len(seen) > 10 * TOP_DUPLICATES:
+                _duplicates[view] = Counter(dict(seen.most_common(TOP_DUPLICATES)))
+
+
+def snapshot():
+    with _lock:
+        return (
+            {view: dict(stats) for view, stats in _stats.items()},
+            {view: seen.most_common(TOP_DUPLICATES) for view, seen in _duplicates.items()},
+        )
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _duplicates.clear()
@@ -0,0 +1,213 @@
+from itertools import islice
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, Exists, OuterRef
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import TruncDate
+from rest_framework.exceptions import ValidationError
+from .deferred import RESERVATION_JOB_LOCKS, RESERVATION_SLOT_LOCKS, day_key, lock_keys, on_commit_batched
+from .models import Equipment, EquipmentReservation, EquipmentSlot, JobTask
+from .serializers import EquipmentCheckSerializer
+
+# Jobs recomputed per transaction, and rows inserted per statement by a rebuild
+REFRESH_BATCH_SIZE = 500
+REBUILD_BATCH_SIZE = 5000
+
+
+def live_reservations(links):
+    """``(job id, equipment id, date)`` for the open tasks among ``links``,
+    a queryset of task equipment links, straight from the live tables.
+    """
+    return links.exclude(jobtask__status='COMPLETED').annotate(
+        date=TruncDate('jobtask__job__scheduled_date')
+    ).values_list('jobtask__job_id', 'equipment_id', 'date').order_by().distinct()
+
+
+def _in_slots(queryset, slots):
+    # One join against the (equipment id, date) pairs, where an OR per pair
+    # costs the planner more than the scan once there are thousands of them
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    equipment_ids, days = zip(*slots)
+    return queryset.filter(RawSQL(
+        f'({table}.equipment_id, {table}.date) IN (SELECT * FROM unnest(%s::bigint[], %s::date[]))',
+        (list(equipment_ids), list(days)), output_field=BooleanField(),
+    ))
+
+
+def _recount(slots):
+    # Locked first, so of two transactions changing jobs in the same slot
+    # the second counts after the first has committed
+    lock_keys(RESERVATION_SLOT_LOCKS, [day_key(equipment_id, day) for equipment_id, day in slots])
+    counts = _in_slots(EquipmentReservation.objects.all(), slots).values('equipment_id', 'date').annotate(
+        jobs=Count('job_id')
+    ).order_by()
+    _in_slots(EquipmentSlot.objects.all(), slots).delete()
+    EquipmentSlot.objects.bulk_create([EquipmentSlot(**row) for row in counts])
+
+
+def refresh_reservations(job_ids):
+    """Recompute the reservations of ``job_ids`` from their open tasks, and
+    the slots those jobs left or took. Returns the number of jobs refreshed.
+    """
+    through = JobTask.required_equipment.through
+    job_ids = sorted({job_id for job_id in job_ids if job_id is not None})
+    for start in range(0, len(job_ids), REFRESH_BATCH_SIZE):
+        batch = job_ids[start:start + REFRESH_BATCH_SIZE]
+        with transaction.atomic():
+            lock_keys(RESERVATION_JOB_LOCKS, batch)
+            reserved = EquipmentReservation.objects.filter(job__in=batch)
+            slots = set(reserved.values_list('equipment_id', 'date'))
+            rows = [
+                EquipmentReservation(job_id=job_id, equipment_id=equipment_id, date=day)
+                for job_id, equipment_id, day in live_reservations(through.objects.filter(jobtask__job__in=batch))
+            ]
+            reserved.delete()
+            EquipmentReservation.objects.bulk_create(rows)
+            slots.update((row.equipment_id, row.date) for row in rows)
+            if slots:
+                _recount(slots)
+    return len(job_ids)
+
+
+def mark_reservations_changed(job_ids):
+    """Refresh the reservations of ``job_ids`` once the current transaction
+    commits, together with every other job it marks; outside a transaction,
+    right away.
+    """
+    on_commit_batched('reservations', refresh_reservations, job_ids)
+
+
+def rebuild_reservations():
+    """Rebuild reservations and slots from the live tables.
+
+    Both tables are locked against other writers meanwhile, so refreshes
+    queued behind the locks recompute their jobs afterwards. Returns the
+    number of reservations written.
+    """
+    through = JobTask.required_equipment.through
+    written = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for model in (EquipmentReservation, EquipmentSlot):
+                cursor.execute(f'LOCK TABLE {model._meta.db_table} IN EXCLUSIVE MODE')
+        EquipmentReservation.objects.all().delete()
+        EquipmentSlot.objects.all().delete()
+        rows = live_reservations(through.objects.all()).iterator(chunk_size=REBUILD_BATCH_SIZE)
+        while batch := list(islice(rows, REBUILD_BATCH_SIZE)):
+            EquipmentReservation.objects.bulk_create([
+                EquipmentReservation(job_id=job_id, equipment_id=equipment_id, date=day)
+                for job_id, equipment_id, day in batch
+            ])
+            written += len(batch)
+        counts = EquipmentReservation.objects.values('equipment_id', 'date').annotate(jobs=Count('job_id')).order_by()
+        slots = counts.iterator(chunk_size=REBUILD_BATCH_SIZE)
+        while batch := list(islice(slots, REBUILD_BATCH_SIZE)):
+            EquipmentSlot.objects.bulk_create([EquipmentSlot(**row) for row in batch])
+    return written
+
+
+def diff_reservations():
+    """Compare reservations and slots with the live tables. Returns a list of
+    ``(key, stored, live)`` for every ``(job id, equipment id, date)``
+    reservation held on one side only, as 1 or None, followed by every
+    ``(equipment id, date)`` slot whose job counts differ.
+    """
+    through = JobTask.required_equipment.through
+    live = set(live_reservations(through.objects.all()))
+    stored = set(EquipmentReservation.objects.values_list('job_id', 'equipment_id', 'date'))
+    live_slots = {}
+    for _, equipment_id, day in live:
+        live_slots[equipment_id, day] = live_slots.get((equipment_id, day), 0) + 1
+    slots = {(equipment_id, day): jobs for equipment_id, day, jobs in EquipmentSlot.objects.values_list(
+        'equipment_id', 'date', 'jobs'
+    )}
+    return [
+        (key, 1 if key in stored else None, 1 if key in live else None) for key in sorted(live ^ stored)
+    ] + [
+        (key, slots.get(key), live_slots.get(key))
+        for key in sorted(live_slots.keys() | slots.keys())
+        if slots.get(key) != live_slots.get(key)
+    ]
+
+
+def free_equipment(start, end, equipment_type=None, after=None, limit=100):
+    """Active equipment no open job needs on any day from ``start`` to
+    ``end``, in id order from after id ``after``.
+
+    Each candidate costs one probe of the slot index, and the scan stops at
+    ``limit`` free items, however many tasks there are.
+    """
+    taken = EquipmentSlot.objects.filter(equipment=OuterRef('pk'), date__gte=start, date__lte=end)
+    equipment = Equipment.objects.filter(~Exists(taken), is_active=True)
+    if equipment_type:
+        equipment = equipment.filter(type=equipment_type)
+    if after:
+        equipment = equipment.filter(id__gt=after)
+    return list(equipment.order_by('id').values('id', 'name', 'type', 'serial_number')[:limit])
+
+
+def _jobs_by_slot(slots):
+    jobs = {}
+    if slots:
+        reservations = _in_slots(EquipmentReservation.objects.all(), slots).order_by('job_id')
+        for equipment_id, day, job_id in reservations.values_list('equipment_id', 'date', 'job_id'):
+            jobs.setdefault((equipment_id, day), []).append(job_id)
+    return jobs
+
+
+def equipment_conflicts(start, end, equipment_type=None, limit=100):
+    """Equipment needed by more than one job on a day from ``start`` to
+    ``end``, with the jobs, by day. Reads only the double-booked slots.
+    """
+    slots = EquipmentSlot.objects.filter(jobs__gt=1, date__gte=start, date__lte=end)
+    if equipment_type:
+        slots = slots.filter(equipment__type=equipment_type)
+    slots = list(slots.order_by('date', 'equipment_id').values_list(
+        'equipment_id', 'equipment__serial_number', 'date'
+    )[:limit])
+    jobs = _jobs_by_slot([(equipment_id, day) for equipment_id, _, day in slots])
+    return [
+        {'equipment': equipment_id, 'serial_number': serial, 'date': day, 'jobs': jobs.get((equipment_id, day), [])}
+        for equipment_id, serial, day in slots
+    ]
+
+
+def check_reservations(items):
+    """Look up the jobs already holding each ``{'equipment', 'date', 'job'}``
+    item, where ``equipment`` is a serial number and the optional ``job`` is
+    left out of its own conflicts, as when rescheduling it.
+
+    Two queries for the whole batch. Items of the batch that book the same
+    equipment on the same day are reported against each other too. Returns
+    ``(results, errors)`` keyed by the item's index, like core.ingest.
+    """
+    errors, checked = {}, {}
+    validator = EquipmentCheckSerializer()
+    for index, item in enumerate(items):
+        try:
+            checked[index] = validator.run_validation(item)
+        except ValidationError as exc:
+            errors[index] = exc.detail
+    serials = {item['equipment'] for item in checked.values()}
+    equipment = dict(Equipment.objects.filter(serial_number__in=serials).values_list('serial_number', 'id'))
+    by_slot = {}
+    for index, item in checked.items():
+        if item['equipment'] not in equipment:
+            errors[index] = {'equipment': [f"Unknown equipment '{item['equipment']}'."]}
+            continue
+        by_slot.setdefault((equipment[item['equipment']], item['date']), []).append(index)
+
+    jobs = _jobs_by_slot(list(by_slot))
+    results = []
+    for slot, indexes in by_slot.items():
+        for index in indexes:
+            job_id = checked[index].get('job')
+            results.append({
+                'index': index,
+                'jobs': [other for other in jobs.get(slot, []) if other != job_id],
+                'items': [
+                    other for other in indexes
+                    if other != index and (job_id is None or checked[other].get('job') != job_id)
+                ],
+            })
+    results.sort(key=lambda result: result['index'])
+    return results, [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
@@ -0,0 +1,101 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+from .events import ALL
+
+CACHE_PREFIX = 'replica:pin'
+
+# The replica the current request reads from, None for the primary
+_replica = ContextVar('replica', default=None)
+
+
+def _pin_key(user_id):
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def pin_to_primary(*user_ids):
+    """Read ``user_ids``' requests, or everyone's for ``ALL``, from the
+    primary for the next DATABASE_REPLICA_PIN_SECONDS, so they see what was
+    just written there before the replicas catch up.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set_many(
+            {_pin_key(user_id): 1 for user_id in user_ids if user_id is not None},
+            settings.DATABASE_REPLICA_PIN_SECONDS,
+        )
+
+
+def pinned(user):
+    return bool(cache.get_many([_pin_key(user.pk), _pin_key(ALL)]))
+
+
+async def apinned(user):
+    return bool(await cache.aget_many([_pin_key(user.pk), _pin_key(ALL)]))
+
+
+def _choose(is_pinned):
+    return None if is_pinned else random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def replica_reads():
+    """Scope for read_from_replica(): reads after it leaves go to the
+    primary again."""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def read_from_replica(user):
+    """Send the reads of the rest of the replica_reads() block to a replica,
+    unless ``user`` is pinned to the primary or there are no replicas."""
+    if settings.DATABASE_REPLICAS:
+        _replica.set(_choose(pinned(user)))
+
+
+async def aread_from_replica(user):
+    if settings.DATABASE_REPLICAS:
+        _replica.set(_choose(await apinned(user)))
+
+
+class ReplicaReadMixin:
+    """Serve GET and HEAD from a replica. Authentication and permission
+    checks still read the primary; the handler's reads, up to the response
+    being returned, go to the replica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            read_from_replica(request.user)
+
+
+class ReplicaRouter:
+    """Route reads made under read_from_replica() to its replica, and every
+    other query to the primary.
+
+    Replicas hold the same rows as the primary, so relations across aliases
+    are allowed; migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
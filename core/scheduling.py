@@ -0,0 +1,276 @@
+import bisect
+import heapq
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .dashboard import bump_dashboard_version
+from .models import EquipmentReservation, Job, User, WorkloadRollup
+from .workload import mark_workload_changed
+
+# Higher priorities are placed first, so they get the capacity when it runs out
+PRIORITY_RANK = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
+# Assignments written per UPDATE
+APPLY_BATCH_SIZE = 5000
+# Job ids listed in a report's ``unplaced``
+REPORT_UNPLACED = 100
+
+
+def schedule_window(start=None, end=None):
+    """``start`` and ``end`` as dates, SCHEDULER_HORIZON_DAYS from today when
+    left out."""
+    start = start or timezone.localdate()
+    return start, end or start + timedelta(days=settings.SCHEDULER_HORIZON_DAYS - 1)
+
+
+def _load(start, end, rebalance):
+    # Everything the plan reads: pending jobs to place, capacities, the load
+    # already on each technician day and who holds which equipment when
+    window = Job.objects.filter(
+        scheduled_date__gte=timezone.make_aware(datetime.combine(start, datetime.min.time())),
+        scheduled_date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time())),
+        status='PENDING',
+    )
+    if not rebalance:
+        window = window.filter(assigned_to__isnull=True)
+    jobs = {
+        job_id: (assignee, PRIORITY_RANK[priority], scheduled_date, day, client)
+        for job_id, assignee, priority, scheduled_date, day, client in window.annotate(
+            day=TruncDate('scheduled_date')
+        ).order_by().values_list('id', 'assigned_to_id', 'priority', 'scheduled_date', 'day', 'client_name')
+    }
+    capacities = {
+        technician_id: settings.SCHEDULER_DAILY_CAPACITY if capacity is None else capacity
+        for technician_id, capacity in User.objects.filter(role='TECHNICIAN', is_active=True).values_list(
+            'id', 'daily_capacity',
+        )
+    }
+
+    # The rollup counts every job of a technician day; the jobs being placed
+    # are taken back out
+    load = Counter()
+    rows = WorkloadRollup.objects.filter(date__gte=start, date__lte=end).values('technician_id', 'date').annotate(
+        jobs=Sum('jobs')
+    ).order_by()
+    for row in rows:
+        load[row['technician_id'], row['date']] += row['jobs']
+    for assignee, _, _, day, _ in jobs.values():
+        if assignee is not None:
+            load[assignee, day] -= 1
+
+    # Equipment the jobs need, then who else holds that equipment on its days
+    equipment, holders = {}, defaultdict(Counter)
+    reservations = EquipmentReservation.objects.filter(date__gte=start, date__lte=end)
+    needed = reservations.filter(job__in=window).values_list('job_id', 'equipment_id')
+    for job_id, equipment_id in needed.iterator(chunk_size=APPLY_BATCH_SIZE):
+        equipment.setdefault(job_id, set()).add(equipment_id)
+    if equipment:
+        held = reservations.filter(
+            equipment__in={equipment_id for needs in equipment.values() for equipment_id in needs},
+            job__assigned_to__isnull=False,
+        ).exclude(job__in=window).values_list('date', 'equipment_id', 'job__assigned_to_id')
+        for day, equipment_id, assignee in held.iterator(chunk_size=APPLY_BATCH_SIZE):
+            holders[day, equipment_id][assignee] += 1
+    return jobs, capacities, load, equipment, holders
+
+
+def _batches(jobs):
+    # A client's jobs on a day are one visit, kept with one technician
+    batches = {}
+    for job_id, (_, rank, scheduled_date, day, client) in jobs.items():
+        batches.setdefault((day, client), []).append((rank, scheduled_date, job_id))
+    for (day, _), batch in batches.items():
+        batch.sort()
+        yield day, [job_id for _, _, job_id in batch]
+
+
+def plan_schedule(start=None, end=None, rebalance=False):
+    """Plan technician assignments for the pending jobs scheduled from
+    ``start`` to ``end``: the unassigned ones, or with ``rebalance`` every
+    pending one.
+
+    Jobs keep their day; a technician gets at most their daily capacity of
+    jobs on a day, counting the jobs they already have. A client's jobs on a
+    day are placed together. Visits are taken from a priority queue,
+    highest priority and earliest first, and each stays with its current
+    technician, or goes to the technician already carrying most of its
+    equipment that day, or to the one with the most room left, as long as
+    they have room. A local search then moves the visits not following their
+    equipment from the fullest technicians of each day to the emptiest ones.
+
+    Returns ``(changes, report)``: ``(job id, old technician, new
+    technician, day)`` for every job whose technician changes, and a dict of
+    stats.
+    """
+    started = time.monotonic()
+    start, end = schedule_window(start, end)
+    jobs, capacities, load, equipment, holders = _load(start, end, rebalance)
+
+    def room(technician_id, day):
+        return capacities[technician_id] - load[technician_id, day]
+
+    # Per day, a max-heap of room; entries go stale as load changes and are
+    # refreshed when popped
+    free = {}
+
+    def emptiest(day):
+        heap = free.get(day)
+        if heap is None:
+            heap = free[day] = [(-room(technician_id, day), technician_id) for technician_id in capacities]
+            heapq.heapify(heap)
+        while heap:
+            negative_room, technician_id = heap[0]
+            current = room(technician_id, day)
+            if -negative_room == current:
+                return technician_id if current > 0 else None
+            heapq.heapreplace(heap, (-current, technician_id))
+        return None
+
+    def place(day, batch, technician_id):
+        # Heap entries now overstating this technician's room are refreshed
+        # by emptiest() when they come up
+        load[technician_id, day] += len(batch)
+        for job_id in batch:
+            assigned[job_id] = technician_id
+            for equipment_id in equipment.get(job_id, ()):
+                holders[day, equipment_id][technician_id] += 1
+
+    queue = [(jobs[batch[0]][1], jobs[batch[0]][2], batch[0], day, batch) for day, batch in _batches(jobs)]
+    heapq.heapify(queue)
+    assigned, movable, unplaced = {}, {}, []
+    while queue:
+        rank, scheduled_date, first, day, batch = heapq.heappop(queue)
+        current = jobs[first][0]
+        technician_id = current if current in capacities and room(current, day) > 0 else None
+        follows_equipment = False
+        if technician_id is None:
+            carried = Counter()
+            for job_id in batch:
+                for equipment_id in equipment.get(job_id, ()):
+                    if (day, equipment_id) in holders:
+                        carried.update(holders[day, equipment_id])
+            technician_id = next(
+                (
+                    technician_id for technician_id, _ in carried.most_common()
+                    if technician_id in capacities and room(technician_id, day) > 0
+                ),
+                None,
+            )
+            # Visits not following their equipment may be moved by the local search
+            follows_equipment = technician_id is not None
+        if technician_id is None:
+            technician_id = emptiest(day)
+        if technician_id is None:
+            unplaced.extend(batch)
+            continue
+        # A visit larger than the room left is split, the rest queued again
+        fits = min(len(batch), room(technician_id, day))
+        if fits < len(batch):
+            rest = batch[fits:]
+            heapq.heappush(queue, (rank, scheduled_date, rest[0], day, rest))
+        place(day, batch[:fits], technician_id)
+        if not follows_equipment:
+            movable.setdefault((day, technician_id), []).append(batch[:fits])
+
+    moves = _balance(movable, capacities, load, assigned)
+    changes = [
+        (job_id, jobs[job_id][0], technician_id, jobs[job_id][3])
+        for job_id, technician_id in sorted(assigned.items())
+        if technician_id != jobs[job_id][0]
+    ]
+    days = {}
+    for (technician_id, day), count in load.items():
+        if technician_id in capacities and start <= day <= end:
+            days.setdefault(day, []).append(count)
+    report = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'jobs': len(jobs),
+        'technicians': len(capacities),
+        'assigned': len(changes),
+        'unchanged': len(assigned) - len(changes),
+        'unplaced': len(unplaced),
+        'unplaced_jobs': sorted(unplaced)[:REPORT_UNPLACED],
+        'moves': moves,
+        'max_daily_load': max((max(counts) for counts in days.values()), default=0),
+        'elapsed': round(time.monotonic() - started, 3),
+    }
+    return changes, report
+
+
+def _balance(movable, capacities, load, assigned):
+    # Local search: per day, move a visit from the technician with the least
+    # room to the one with the most while that narrows the gap between them.
+    # A technician with nothing left to move drops out of the day.
+    moves = 0
+    for day in {day for day, _ in movable}:
+        rooms = sorted((capacities[technician_id] - load[technician_id, day], technician_id) for technician_id in capacities)
+        while len(rooms) > 1:
+            (low_room, low), (high_room, high) = rooms[0], rooms[-1]
+            visits = movable.get((day, low), [])
+            visit = min(
+                (visit for visit in visits if len(visit) < high_room - low_room and len(visit) <= high_room),
+                key=len, default=None,
+            )
+            if visit is None:
+                if high_room - low_room < 2:
+                    break
+                rooms.pop(0)
+                continue
+            visits.remove(visit)
+            movable.setdefault((day, high), []).append(visit)
+            for job_id in visit:
+                assigned[job_id] = high
+            load[low, day] -= len(visit)
+            load[high, day] += len(visit)
+            moves += 1
+            del rooms[0], rooms[-1]
+            bisect.insort(rooms, (low_room + len(visit), low))
+            bisect.insort(rooms, (high_room - len(visit), high))
+    return moves
+
+
+def apply_schedule(changes):
+    """Write ``changes`` from plan_schedule(), ``APPLY_BATCH_SIZE`` jobs per
+    statement and transaction.
+
+    A job is only moved if it is still pending and still has the technician
+    the plan saw, so edits made since the plan win. Returns the number of
+    jobs written.
+    """
+    table = Job._meta.db_table
+    written = 0
+    for start in range(0, len(changes), APPLY_BATCH_SIZE):
+        batch = changes[start:start + APPLY_BATCH_SIZE]
+        planned = {job_id: (old, new, day) for job_id, old, new, day in batch}
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET assigned_to_id = plan.new, updated_at = %s '
+                    f'FROM unnest(%s::bigint[], %s::bigint[], %s::bigint[]) AS plan(id, old, new) '
+                    f"WHERE {table}.id = plan.id AND {table}.status = 'PENDING' "
+                    f'AND {table}.assigned_to_id IS NOT DISTINCT FROM plan.old '
+                    f'RETURNING {table}.id',
+                    [timezone.now(), *(list(column) for column in zip(*(change[:3] for change in batch)))],
+                )
+                moved = [planned[job_id] for job_id, in cursor.fetchall()]
+            # A raw UPDATE sends no signals
+            user_ids = {technician_id for old, new, _ in moved for technician_id in (old, new)}
+            transaction.on_commit(lambda user_ids=user_ids: bump_dashboard_version(*user_ids))
+            mark_workload_changed({(technician_id, day) for old, new, day in moved for technician_id in (old, new)})
+        written += len(moved)
+    return written
+
+
+def schedule_jobs(start=None, end=None, rebalance=False, dry_run=False):
+    """Plan assignments with plan_schedule() and, unless ``dry_run``, write
+    them. Returns the plan's report with ``written``, the jobs written.
+    """
+    changes, report = plan_schedule(start, end, rebalance)
+    report['dry_run'] = dry_run
+    report['written'] = 0 if dry_run else apply_schedule(changes)
+    return report
@@ -0,0 +1,102 @@
+import re
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from .models import Job, JobTask
+
+# Text search configuration of the search vectors, which the triggers of
+# migration 0012_search_vectors hard-code too. 'simple' neither stems nor
+# drops stop words, so client names, numbers and codes match as typed.
+SEARCH_CONFIG = 'simple'
+
+# Columns of a result, as the job list names them
+RESULT_FIELDS = ('id', 'title', 'client_name', 'status', 'priority', 'scheduled_date', 'assigned_to')
+
+
+def has_full_text_search(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def search_terms(text):
+    # The words of ``text``; anything else could be tsquery syntax
+    return re.findall(r'\w+', text.lower())
+
+
+def search_query(terms):
+    # Every term, as a prefix: "acm corp" finds "Acme Corporation"
+    return SearchQuery(' & '.join(f"'{term}':*" for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def _ranked(query, jobs, limit, offset):
+    # (job id, rank) of a page of the jobs matching on their own text or a
+    # task's, best first. Each side ranks at most SEARCH_MAX_CANDIDATES
+    # matches, as found in its GIN index.
+    candidates = settings.SEARCH_MAX_CANDIDATES
+    job_hits = jobs.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+    tasks = JobTask.objects.filter(search_vector=query)
+    if jobs.query.where:
+        tasks = tasks.filter(job__in=jobs.values('id'))
+    task_hits = tasks.annotate(rank=SearchRank(F('search_vector'), query))
+    job_sql, job_params = job_hits.order_by().values_list('id', 'rank')[:candidates].query.sql_with_params()
+    task_sql, task_params = task_hits.order_by().values_list('job_id', 'rank')[:candidates].query.sql_with_params()
+    with connections[jobs.db].cursor() as cursor:
+        cursor.execute(
+            f'SELECT id, MAX(rank) AS rank FROM (({job_sql}) UNION ALL ({task_sql})) AS hits (id, rank) '
+            f'GROUP BY id ORDER BY rank DESC, id LIMIT %s OFFSET %s',
+            [*job_params, *task_params, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def _containing(terms, *fields):
+    # Every term somewhere in ``fields``
+    matches = Q()
+    for term in terms:
+        matches &= reduce(or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+    return matches
+
+
+def _unranked(terms, jobs, limit, offset):
+    # _ranked() for databases without full-text search (SQLite in tests):
+    # substring matches, which scan the tables, latest scheduled first
+    tasks = JobTask.objects.filter(_containing(terms, 'title', 'description'))
+    matches = jobs.filter(
+        _containing(terms, 'title', 'client_name', 'description') | Q(id__in=tasks.values('job_id')),
+    )
+    page = matches.order_by('-scheduled_date', 'id').values_list('id', flat=True)[offset:offset + limit]
+    return [(job_id, 0.0) for job_id in page]
+
+
+def search_jobs(text, jobs=None, limit=20, offset=0):
+    """Jobs whose title, client name or description, or one of whose tasks'
+    title or description, has a word starting with each word of ``text``.
+
+    ``jobs`` narrows the search down, e.g. to a JobFilter's queryset.
+    Results are ranked, title and client name matches first, and carry the
+    matching tasks. On PostgreSQL the search vectors' GIN indexes serve it;
+    elsewhere it falls back to unranked substring matches.
+    """
+    jobs = Job.objects.all() if jobs is None else jobs
+    terms = search_terms(text)
+    if not terms:
+        return []
+    if has_full_text_search(jobs.db):
+        query = search_query(terms)
+        ranked, task_matches = _ranked(query, jobs, limit, offset), Q(search_vector=query)
+    else:
+        ranked, task_matches = _unranked(terms, jobs, limit, offset), _containing(terms, 'title', 'description')
+
+    job_ids = [job_id for job_id, _ in ranked]
+    rows = {row['id']: row for row in Job.objects.using(jobs.db).filter(id__in=job_ids).values(*RESULT_FIELDS)}
+    tasks = {}
+    matched = JobTask.objects.using(jobs.db).filter(task_matches, job__in=job_ids).order_by('job_id', 'order', 'id')
+    for task in matched.values('id', 'job_id', 'title', 'status'):
+        tasks.setdefault(task.pop('job_id'), []).append(task)
+    # A job deleted since it was ranked is left out
+    return [
+        {**rows[job_id], 'rank': round(rank, 4), 'tasks': tasks.get(job_id, [])}
+        for job_id, rank in ranked if job_id in rows
+    ]
@@ -1,6 +1,12 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import User, Job, JobTask, Equipment
+from .authentication import TOKEN_VERSION_CLAIM
+from .models import ArchivedJob, ArchivedJobTask, User, Job, JobTask, Equipment
+from .profiling import section
+from .workload import GROUPS
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,6 +23,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         token = super().get_token(user)
         token['role'] = user.role
+        token[TOKEN_VERSION_CLAIM] = user.token_version
         return token
 
 class EquipmentSerializer(serializers.ModelSerializer):
@@ -34,4 +41,155 @@ class JobTaskSerializer(serializers.ModelSerializer):
 
 class TechnicianDashboardSerializer(serializers.Serializer):
     date = serializers.DateField()
-    tasks = JobTaskSerializer(many=True)
\ No newline at end of file
+    tasks = JobTaskSerializer(many=True)
+
+class JobTaskSummarySerializer(serializers.ModelSerializer):
+    equipment = EquipmentSerializer(source='required_equipment', many=True, read_only=True)
+
+    class Meta:
+        model = JobTask
+        fields = ['id', 'title', 'description', 'status', 'order', 'completed_at', 'equipment']
+
+
+class ProfiledDataMixin:
+    # Building ``.data`` counts as the request profile's serialize section.
+    # Nested serializers are reached through to_representation(), not
+    # ``.data``, so only the outermost one is timed.
+    @property
+    def data(self):
+        with section('serialize'):
+            return super().data
+
+
+class ProfiledListSerializer(ProfiledDataMixin, serializers.ListSerializer):
+    pass
+
+
+class JobSerializer(ProfiledDataMixin, serializers.ModelSerializer):
+    tasks = JobTaskSummarySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Job
+        list_serializer_class = ProfiledListSerializer
+        fields = [
+            'id', 'title', 'description', 'client_name', 'status', 'priority', 'scheduled_date',
+            'overdue', 'created_by', 'assigned_to', 'created_at', 'updated_at', 'tasks',
+        ]
+
+
+class ArchivedJobTaskSerializer(JobTaskSummarySerializer):
+    class Meta(JobTaskSummarySerializer.Meta):
+        model = ArchivedJobTask
+
+
+class ArchivedJobSerializer(JobSerializer):
+    tasks = ArchivedJobTaskSerializer(many=True, read_only=True)
+
+    class Meta(JobSerializer.Meta):
+        model = ArchivedJob
+        fields = [*JobSerializer.Meta.fields, 'archived_at']
+
+
+class JobTaskListSerializer(ProfiledDataMixin, serializers.ModelSerializer):
+    job_title = serializers.CharField(source='job.title', read_only=True)
+    scheduled_date = serializers.DateTimeField(source='job.scheduled_date', read_only=True)
+    equipment = EquipmentSerializer(source='required_equipment', many=True, read_only=True)
+
+    class Meta:
+        model = JobTask
+        list_serializer_class = ProfiledListSerializer
+        fields = [
+            'id', 'job', 'job_title', 'scheduled_date', 'title', 'description', 'status',
+            'order', 'completed_at', 'equipment',
+        ]
+
+
+class BulkJobTaskSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default='')
+    status = serializers.ChoiceField(choices=JobTask.STATUS_CHOICES, default='PENDING')
+    order = serializers.IntegerField(min_value=0, required=False)
+    equipment = serializers.ListField(child=serializers.CharField(max_length=100), default=list)
+
+
+class BulkJobSerializer(serializers.Serializer):
+    # References are plain strings here; core.ingest resolves them for the
+    # whole batch at once instead of one query per item
+    external_id = serializers.CharField(max_length=100, required=False, allow_null=True)
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default='')
+    client_name = serializers.CharField(max_length=200)
+    # Left out or null for a new job core.scheduling is to assign
+    assigned_to = serializers.CharField(max_length=150, required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Job.STATUS_CHOICES, default='PENDING')
+    priority = serializers.ChoiceField(choices=Job.PRIORITY_CHOICES, default='MEDIUM')
+    scheduled_date = serializers.DateTimeField()
+    tasks = BulkJobTaskSerializer(many=True, default=list)
+
+
+class TaskTransitionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=JobTask.STATUS_CHOICES)
+
+
+class WorkloadQuerySerializer(serializers.Serializer):
+    # Query parameters of GET /api/workload/; a week from today by default
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    technician = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Job.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Job.PRIORITY_CHOICES, required=False)
+    group_by = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_group_by(self, value):
+        names = [name for name in value.split(',') if name]
+        unknown = [name for name in names if name not in GROUPS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields {', '.join(unknown)}; expected some of {', '.join(GROUPS)}."
+            )
+        return list(dict.fromkeys(names))
+
+    def validate(self, data):
+        start = data.get('start') or timezone.localdate()
+        end = data.get('end') or start + timedelta(days=6)
+        if end < start:
+            raise serializers.ValidationError({'end': ['Must not be before start.']})
+        if (end - start).days >= settings.WORKLOAD_MAX_DAYS:
+            raise serializers.ValidationError({'end': [f'At most {settings.WORKLOAD_MAX_DAYS} days per request.']})
+        data.update(start=start, end=end)
+        data.setdefault('group_by', list(GROUPS))
+        return data
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    # Query parameters of GET /api/search/, besides the job list's filters
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=20)
+    offset = serializers.IntegerField(required=False, min_value=0, default=0)
+
+
+class EquipmentQuerySerializer(serializers.Serializer):
+    # Query parameters of the equipment availability and conflict lists; a
+    # week from today by default
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    type = serializers.CharField(required=False)
+    after = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000, default=100)
+
+    def validate(self, data):
+        start = data.get('start') or timezone.localdate()
+        end = data.get('end') or start + timedelta(days=6)
+        if end < start:
+            raise serializers.ValidationError({'end': ['Must not be before start.']})
+        if (end - start).days >= settings.EQUIPMENT_MAX_DAYS:
+            raise serializers.ValidationError({'end': [f'At most {settings.EQUIPMENT_MAX_DAYS} days per request.']})
+        data.update(start=start, end=end)
+        return data
+
+
+class EquipmentCheckSerializer(serializers.Serializer):
+    equipment = serializers.CharField(max_length=100)
+    date = serializers.DateField()
+    job = serializers.IntegerField(required=False)
@@ -0,0 +1,158 @@
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .authentication import forget_token_version
+from .dashboard import bump_dashboard_version, bump_equipment_version
+from .models import User, Job, JobTask, Equipment
+from .outbox import job_status_changed, record_events, task_status_changed
+from .reservations import mark_reservations_changed
+from .workload import mark_workload_changed, workload_date
+
+# Dashboard cache invalidation, and workload rollup and equipment
+# reservation refreshes. Versions are bumped once the transaction commits,
+# so a request racing the write cannot cache pre-commit rows under the new
+# version. Queryset.update() and bulk_create() do not send these signals;
+# code using them calls bump_dashboard_version(), mark_workload_changed()
+# and mark_reservations_changed() itself.
+
+
+@receiver(post_init, sender=Job)
+def remember_job_assignee(sender, instance, **kwargs):
+    instance._loaded_assigned_to_id = instance.__dict__.get('assigned_to_id')
+    instance._loaded_scheduled_date = instance.__dict__.get('scheduled_date')
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_init, sender=JobTask)
+def remember_task_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+def _status_changed(instance, created):
+    # A deferred status was not loaded, so it cannot have been changed
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    changed = created or previous not in (None, instance.status)
+    instance._loaded_status = instance.status
+    return changed, previous
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_job_dashboard(sender, instance, signal, **kwargs):
+    user_ids = [instance.assigned_to_id, getattr(instance, '_loaded_assigned_to_id', None)]
+    buckets = [(instance.assigned_to_id, workload_date(instance.scheduled_date))]
+    if getattr(instance, '_loaded_scheduled_date', None) is not None:
+        buckets.append((user_ids[1], workload_date(instance._loaded_scheduled_date)))
+    # Reservations hold the job's day; a new job has no tasks yet
+    if signal is post_delete or buckets[-1][1] != buckets[0][1]:
+        mark_reservations_changed([instance.pk])
+    instance._loaded_assigned_to_id = instance.assigned_to_id
+    instance._loaded_scheduled_date = instance.scheduled_date
+    transaction.on_commit(lambda: bump_dashboard_version(*user_ids))
+    mark_workload_changed(buckets)
+
+
+def _task_job(task):
+    # The task's job's assignee and scheduled date
+    if JobTask.job.is_cached(task):
+        return task.job.assigned_to_id, task.job.scheduled_date
+    return Job.objects.filter(pk=task.job_id).values_list('assigned_to_id', 'scheduled_date').first() or (None, None)
+
+
+@receiver(post_save, sender=JobTask)
+@receiver(post_delete, sender=JobTask)
+def invalidate_task_dashboard(sender, instance, **kwargs):
+    user_id, scheduled_date = _task_job(instance)
+    transaction.on_commit(lambda: bump_dashboard_version(user_id))
+    if scheduled_date is not None:
+        mark_workload_changed([(user_id, workload_date(scheduled_date))])
+    mark_reservations_changed([instance.job_id])
+
+
+# Outbox events, written in the transaction saving the row (Job.save() and
+# JobTask.save() are atomic). Queryset.update() and bulk_create() callers
+# record their own through core.outbox.record_events().
+
+
+@receiver(post_save, sender=Job)
+def record_job_status(sender, instance, created, **kwargs):
+    changed, previous = _status_changed(instance, created)
+    if changed:
+        record_events([job_status_changed(instance.pk, instance.status, previous)])
+
+
+@receiver(post_save, sender=JobTask)
+def record_task_status(sender, instance, created, **kwargs):
+    changed, previous = _status_changed(instance, created)
+    if changed:
+        record_events([task_status_changed(instance.pk, instance.job_id, instance.status, previous)])
+
+
+@receiver(m2m_changed, sender=JobTask.required_equipment.through)
+def invalidate_task_equipment(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if reverse and action == 'pre_clear':
+        # The tasks losing the equipment are only known before the clear
+        mark_reservations_changed(set(sender.objects.filter(equipment=instance).values_list('jobtask__job_id', flat=True)))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Changed from the Equipment side, possibly touching many technicians
+        transaction.on_commit(bump_equipment_version)
+        if pk_set:
+            mark_reservations_changed(set(JobTask.objects.filter(pk__in=pk_set).values_list('job_id', flat=True)))
+    else:
+        user_id, _ = _task_job(instance)
+        transaction.on_commit(lambda: bump_dashboard_version(user_id))
+        mark_reservations_changed([instance.job_id])
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+def invalidate_equipment(sender, instance, **kwargs):
+    transaction.on_commit(bump_equipment_version)
+
+
+# JWT revocation. Tokens carry the role and the user's token_version, so
+# changing the role, deactivating the user or setting a new password bumps
+# the version and every token issued before stops working.
+
+
+def _claims(user):
+    return user.__dict__.get('role'), user.__dict__.get('is_active')
+
+
+@receiver(post_init, sender=User)
+def remember_user_claims(sender, instance, **kwargs):
+    instance._loaded_claims = _claims(instance)
+
+
+@receiver(pre_save, sender=User)
+def bump_token_version(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    changed = any(
+        before is not None and before != after
+        for before, after in zip(instance._loaded_claims, _claims(instance))
+    )
+    # set_password() keeps the raw password until save; rehashing an
+    # unchanged password on login clears it first and does not revoke
+    if changed or getattr(instance, '_password', None) is not None:
+        instance.token_version += 1
+        instance._token_version_bumped = True
+
+
+@receiver(post_save, sender=User)
+def save_token_version(sender, instance, update_fields=None, **kwargs):
+    if getattr(instance, '_token_version_bumped', False):
+        del instance._token_version_bumped
+        if update_fields is not None and 'token_version' not in update_fields:
+            User.objects.filter(pk=instance.pk).update(token_version=instance.token_version)
+    instance._loaded_claims = _claims(instance)
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_token_version(user_id))
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_token_version(user_id))
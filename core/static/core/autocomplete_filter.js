@@ -0,0 +1,12 @@
+'use strict';
+// Applies an AutocompleteFilter as soon as a row is picked or cleared
+{
+    const $ = django.jQuery;
+    $(function() {
+        $('form.autocomplete-filter select').on('change', function() {
+            // A cleared filter is left out of the query string
+            this.disabled = !this.value;
+            this.form.submit();
+        });
+    });
+}
@@ -0,0 +1,193 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import StatelessJWTAuthentication
+from .dashboard import CACHE_PREFIX, dashboard_key, get_dashboard
+from .models import User
+from . import events
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_EVENTS_PATH = '/api/events/dashboard/'
+
+
+def with_fresh_connections(func):
+    """Close obsolete and broken database connections around ``func``.
+
+    Streams run outside Django's handler, whose request_started and
+    request_finished signals do this for views; without it a connection
+    ignores CONN_MAX_AGE and CONN_HEALTH_CHECKS, and one broken by a
+    database restart is never replaced.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+def dashboard_delta(old, new):
+    """The tasks added or changed, with their day, and the ids of the tasks
+    removed between two dashboard payloads.
+    """
+    def by_id(payload):
+        return {task['id']: (day['date'], task) for day in payload for task in day['tasks']}
+
+    before, after = by_id(old), by_id(new)
+    return {
+        'upsert': [
+            {'date': date, 'task': task}
+            for task_id, (date, task) in after.items() if before.get(task_id) != (date, task)
+        ],
+        'remove': sorted(task_id for task_id in before if task_id not in after),
+    }
+
+
+@with_fresh_connections
+def dashboard_update(user_id, previous_key):
+    """Return ``(key, event, data)`` to send after a change, or ``(key, None,
+    None)`` when ``user``'s dashboard did not change since ``previous_key``.
+
+    The previous payload is read back from the cache under its key, so a
+    stream keeps no copy of it; once evicted, the client gets a snapshot.
+    """
+    user = User(pk=user_id)
+    key = dashboard_key(user)
+    if key == previous_key:
+        return key, None, None
+    new = get_dashboard(user, key)
+    old = cache.get(previous_key) if previous_key else None
+    if old is None:
+        return key, 'snapshot', new
+    delta = dashboard_delta(old, new)
+    if not delta['upsert'] and not delta['remove']:
+        return key, None, None
+    return key, 'delta', delta
+
+
+@with_fresh_connections
+def authenticate(header):
+    auth = StatelessJWTAuthentication()
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        raise AuthenticationFailed('Authentication credentials were not provided.', code='not_authenticated')
+    token = auth.get_validated_token(raw_token)
+    return auth.get_user(token), token
+
+
+def encode_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def send_json(send, status, data, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(data).encode()})
+
+
+async def push_update(send, user_id, key):
+    key, event, data = await sync_to_async(dashboard_update)(user_id, key)
+    if event:
+        await send({'type': 'http.response.body', 'body': encode_event(event, data, key), 'more_body': True})
+    return key
+
+
+async def dashboard_events(scope, receive, send):
+    """ASGI app streaming a technician's dashboard as Server-Sent Events.
+
+    The client gets a ``snapshot`` event with the full dashboard payload,
+    then a ``delta`` event per change: ``upsert`` lists the tasks added or
+    changed with their day, ``remove`` the ids of tasks that left. Every
+    event id is the dashboard's cache key; a client reconnecting with it in
+    ``Last-Event-ID`` gets a delta instead of a new snapshot.
+
+    Writes wake the stream through core.events and the stream re-reads the
+    dashboard through its cache, so any number of changes arriving at once
+    cost one read. The stream ends when the access token expires, and the
+    client reconnects with a fresh one.
+    """
+    if scope['method'] != 'GET':
+        return await send_json(send, 405, {'detail': f"Method \"{scope['method']}\" not allowed."})
+    headers = dict(scope['headers'])
+    try:
+        user, token = await sync_to_async(authenticate)(headers.get(b'authorization'))
+    except AuthenticationFailed as exc:
+        return await send_json(send, 401, {'detail': str(exc.detail)}, [(b'www-authenticate', b'Bearer realm="api"')])
+    except DatabaseError:
+        logger.exception('Could not authenticate a dashboard stream')
+        return await send_json(send, 503, {'detail': 'Service unavailable, try again later.'})
+    if user.role != 'TECHNICIAN':
+        return await send_json(send, 403, {'detail': 'You do not have permission to perform this action.'})
+
+    # An idle stream holds the user id and its key, not the user, the token
+    # or the payload it sent
+    user_id = user.pk
+    deadline = asyncio.get_running_loop().time() + token['exp'] - time.time()
+    del user, token
+
+    # Subscribed before the first read, so a write in between is not missed
+    subscription = events.subscribe(user_id)
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Stops nginx from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        key = headers.get(b'last-event-id', b'').decode('latin-1')
+        if not key.startswith(f'{CACHE_PREFIX}:{user_id}:'):
+            key = None
+        pending = True
+        while not subscription.closed:
+            if pending:
+                try:
+                    key = await push_update(send, user_id, key)
+                    pending = False
+                except DatabaseError:
+                    # Tried again on the next change or keepalive, by when
+                    # the broken connection has been replaced
+                    logger.exception('Could not read the dashboard of user %s', user_id)
+            timeout = min(settings.DASHBOARD_EVENTS_KEEPALIVE, deadline - asyncio.get_running_loop().time())
+            if timeout <= 0:
+                break
+            try:
+                await asyncio.wait_for(subscription.changed.wait(), timeout)
+                subscription.changed.clear()
+                pending = True
+            except asyncio.TimeoutError:
+                # A comment line keeps proxies from closing an idle stream
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+        if not subscription.closed:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        events.unsubscribe(subscription)
@@ -1,14 +1,47 @@
+from datetime import date
 from celery import shared_task
-from django.utils import timezone
-from .models import Job
-
-@shared_task
-def flag_overdue_jobs():
-    now = timezone.now()
-    overdue_jobs = Job.objects.filter(
-        scheduled_date__lt=now,
-        status__in=['PENDING', 'IN_PROGRESS'],
-        overdue=False
-    )
-    count = overdue_jobs.update(overdue=True)
-    return f"Flagged {count} jobs as overdue."
\ No newline at end of file
+from . import archive
+from .outbox import publish_events
+from .overdue import flag_overdue, clear_overdue
+from .reservations import rebuild_reservations
+from .scheduling import schedule_jobs
+from .workload import rebuild_workload
+
+@shared_task
+def flag_overdue_jobs(batch_size=None, time_budget=None):
+    # Flags open jobs whose scheduled date has passed, in checkpointed chunks
+    return flag_overdue(batch_size=batch_size, time_budget=time_budget)
+
+@shared_task
+def clear_overdue_jobs(batch_size=None, time_budget=None):
+    # Clears the flag on overdue jobs that were completed or rescheduled
+    return clear_overdue(batch_size=batch_size, time_budget=time_budget)
+
+@shared_task
+def rebuild_workload_rollup(start=None, end=None):
+    # Rebuilds the workload rollup from the live tables, for ISO dates start..end or every day
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    return rebuild_workload(start, end)
+
+@shared_task
+def rebuild_equipment_reservations():
+    # Rebuilds equipment reservations and slots from the live tables
+    return rebuild_reservations()
+
+@shared_task
+def assign_jobs(start=None, end=None, rebalance=False, dry_run=False):
+    # Assigns pending jobs of ISO dates start..end to technicians; see core.scheduling
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    return schedule_jobs(start, end, rebalance=rebalance, dry_run=dry_run)
+
+@shared_task
+def archive_completed_jobs(days=None, batch_size=None, time_budget=None):
+    # Moves jobs completed over days ago, with their tasks, to the archive tables
+    return archive.archive_completed_jobs(days=days, batch_size=batch_size, time_budget=time_budget)
+
+@shared_task
+def publish_outbox_events(batch_size=None, time_budget=None):
+    # Publishes job and task status changes from the outbox to OUTBOX_SINK, in batches
+    return publish_events(batch_size=batch_size, time_budget=time_budget)
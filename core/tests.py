@@ -1,5 +1,56 @@
-from django.test import TestCase
-from core.models import User
+import asyncio
+import csv
+import gc
+import json
+import re
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime, time, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections, router, transaction
+from django.db.models import F, Max, Prefetch
+from django.db.models.functions import TruncDate
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+from core.async_views import AsyncTechnicianDashboardView, AsyncTokenObtainPairView
+from core.benchmarks import SCENARIOS, BenchmarkContext, compare, run_scenario
+from core.dashboard import (
+    DASHBOARD_ORDERING, build_dashboard, dashboard_tasks, get_dashboard, dashboard_cache_stats, bump_dashboard_version,
+)
+from core.management.commands.explain_hot_queries import check_query_plans
+from core import events
+from core.models import (
+    User, Job, JobTask, Equipment, Checkpoint, WorkloadRollup, EquipmentReservation, EquipmentSlot, ArchivedJob,
+    ArchivedJobTask, OutboxEvent,
+)
+from core import profiling
+from core.serializers import CustomTokenObtainPairSerializer, TechnicianDashboardSerializer
+from core.streams import DASHBOARD_EVENTS_PATH, dashboard_events
+from core.archive import restore_jobs
+from core.outbox import MemorySink, RedisStreamSink, WebhookSink, publish_events
+from core.transitions import transition_tasks
+from core.views import ExportView
+from core.reservations import diff_reservations
+from core.scheduling import apply_schedule, plan_schedule
+from core.search import search_jobs
+from core.tasks import (
+    flag_overdue_jobs, clear_overdue_jobs, rebuild_workload_rollup, rebuild_equipment_reservations, assign_jobs,
+    archive_completed_jobs, publish_outbox_events,
+)
+from core.throttling import TokenBucket
+from core.workload import diff_workload, job_buckets, refresh_workload
 
 
 class UserModelTest(TestCase):
@@ -17,4 +68,2183 @@ class UserModelTest(TestCase):
         self.assertEqual(admin.email, 'testadmin@example.com')
         self.assertEqual(admin.role, 'ADMIN')
         self.assertTrue(admin.check_password('test12345'))
-        self.assertTrue(admin.is_active)
\ No newline at end of file
+        self.assertTrue(admin.is_active)
+
+class DashboardDataMixin:
+    def setUp(self):
+        cache.clear()
+        self.tech = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+        self.other = other = User.objects.create_user(username='other', password='other12345', role='TECHNICIAN')
+        sales = User.objects.create_user(username='sales', password='sales12345', role='SALES_AGENT')
+        self.drill = drill = Equipment.objects.create(name='Drill', type='TOOL', serial_number='DR123')
+        crane = Equipment.objects.create(name='Crane', type='MACHINE', serial_number='CR101', is_active=False)
+
+        now = timezone.now()
+        for i, assignee in enumerate([self.tech, self.tech, self.tech, other]):
+            job = Job.objects.create(
+                title=f'Job {i}', description='', client_name=f'Client {i}',
+                created_by=sales, assigned_to=assignee,
+                scheduled_date=now + timedelta(days=i // 2, hours=i),
+            )
+            for j, task_status in enumerate(['UPCOMING', 'IN_PROGRESS', 'COMPLETED', 'PENDING']):
+                task = JobTask.objects.create(
+                    job=job, title=f'Task {j}', description=f'Task {j} of job {i}',
+                    status=task_status, order=j + 1,
+                )
+                task.required_equipment.set([drill, crane][:j % 3])
+
+
+def serialize_dashboard(user):
+    # The dashboard through the nested serializer stack, which build_dashboard()
+    # replaced; its output is what the API must keep serving
+    tasks = dashboard_tasks(user).annotate(
+        date=TruncDate('job__scheduled_date')  # Group by Job.scheduled_date
+    ).order_by(*DASHBOARD_ORDERING).select_related('job').prefetch_related(
+        Prefetch('required_equipment', queryset=Equipment.objects.order_by('id'))
+    )
+
+    # Group tasks by date
+    grouped_tasks = {}
+    for task in tasks:
+        date_str = task.date.strftime('%Y-%m-%d')
+        if date_str not in grouped_tasks:
+            grouped_tasks[date_str] = []
+        grouped_tasks[date_str].append(task)
+
+    data = [
+        {'date': date, 'tasks': tasks}
+        for date, tasks in grouped_tasks.items()
+    ]
+    return TechnicianDashboardSerializer(data, many=True).data
+
+
+class TechnicianDashboardTest(DashboardDataMixin, TestCase):
+
+    def test_build_dashboard_matches_serializer_path(self):
+        expected = JSONRenderer().render(serialize_dashboard(self.tech))
+        self.assertEqual(JSONRenderer().render(build_dashboard(self.tech)), expected)
+
+        data = build_dashboard(self.tech)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(sum(len(day['tasks']) for day in data), 6)
+
+    def test_build_dashboard_query_count(self):
+        with self.assertNumQueries(2):
+            build_dashboard(self.tech)
+
+    def test_dashboard_view(self):
+        client = APIClient()
+        client.force_authenticate(self.tech)
+        response = client.get('/api/technician-dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(serialize_dashboard(self.tech)))
+
+
+class DashboardCacheTest(DashboardDataMixin, TestCase):
+    def test_cached_payload_is_served(self):
+        first = get_dashboard(self.tech)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard(self.tech), first)
+        self.assertEqual(dashboard_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_task_save_invalidates(self):
+        get_dashboard(self.tech)
+        task = JobTask.objects.filter(job__assigned_to=self.tech, status='IN_PROGRESS').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.description = 'Changed'
+            task.save()
+        self.assertEqual(get_dashboard(self.tech), build_dashboard(self.tech))
+        self.assertEqual(dashboard_cache_stats()['misses'], 2)
+
+    def test_job_reassignment_invalidates_both_technicians(self):
+        get_dashboard(self.tech)
+        get_dashboard(self.other)
+        job = Job.objects.filter(assigned_to=self.tech).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            job.assigned_to = self.other
+            job.save()
+        self.assertEqual(get_dashboard(self.tech), build_dashboard(self.tech))
+        self.assertEqual(get_dashboard(self.other), build_dashboard(self.other))
+        self.assertEqual(dashboard_cache_stats()['misses'], 4)
+
+    def test_equipment_changes_invalidate(self):
+        get_dashboard(self.tech)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.drill.name = 'Hammer drill'
+            self.drill.save()
+        self.assertEqual(get_dashboard(self.tech), build_dashboard(self.tech))
+
+        task = JobTask.objects.filter(job__assigned_to=self.tech, status='UPCOMING').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.required_equipment.add(self.drill)
+        self.assertEqual(get_dashboard(self.tech), build_dashboard(self.tech))
+        self.assertEqual(dashboard_cache_stats(), {'hits': 0, 'misses': 3})
+
+    def test_metrics_endpoint(self):
+        get_dashboard(self.tech)
+        admin = User.objects.create_user(username='admin', password='admin12345', role='ADMIN')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'jobops_dashboard_cache_misses_total 1', response.content)
+
+
+@override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+class RequestProfilingTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+
+    def test_server_timing_and_metrics(self):
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.tech).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.get('/api/technician-dashboard/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('3 queries, 0 duplicate', timing)
+        for metric in ('auth;dur=', 'view;dur=', 'serialize;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+        # The user and the two dashboard queries; the validators come from
+        # the cache
+        stats, _ = profiling.snapshot()
+        dashboard = stats['technician-dashboard']
+        self.assertEqual((dashboard['requests'], dashboard['queries']), (1, 3))
+        for key in ('auth_ms', 'view_ms', 'serialize_ms', 'render_ms'):
+            self.assertGreater(dashboard[key], 0)
+        self.assertLess(dashboard['serialize_ms'], dashboard['view_ms'])
+        self.assertLess(dashboard['view_ms'] + dashboard['render_ms'], dashboard['total_ms'])
+        # Profiling leaves DRF's classes as they are
+        self.assertEqual(APIView.perform_authentication.__module__, 'rest_framework.views')
+        self.assertEqual(JSONRenderer.render.__module__, 'rest_framework.renderers')
+
+        admin = User.objects.create_user(username='admin', password='admin12345', role='ADMIN')
+        client.credentials()
+        client.force_authenticate(admin)
+        # List views time their serializers' ``.data``
+        self.assertEqual(client.get('/api/jobs/').status_code, 200)
+        jobs = profiling.snapshot()[0]['job-list']
+        self.assertGreater(jobs['serialize_ms'], 0)
+        self.assertLess(jobs['serialize_ms'], jobs['view_ms'])
+        content = client.get('/api/metrics/').content.decode()
+        self.assertIn('jobops_request_sql_queries_total{view="technician-dashboard"} 3', content)
+        self.assertIn('jobops_request_serialize_duration_ms_total{view="job-list"}', content)
+
+    def test_duplicate_queries_are_reported_by_signature(self):
+        profile = profiling.RequestProfile()
+        with connection.execute_wrapper(profile.record_query):
+            for task_id in JobTask.objects.values_list('id', flat=True)[:3]:
+                JobTask.objects.get(id=task_id)
+        self.assertEqual(profile.query_count, 4)
+        [(sql, count)] = profile.duplicates().items()
+        self.assertEqual(count, 3)
+        self.assertIn('%s', sql)
+
+        profiling.record('task-detail', profile, 1.0)
+        stats, duplicates = profiling.snapshot()
+        self.assertEqual(stats['task-detail']['duplicate_queries'], 2)
+        self.assertEqual(duplicates['task-detail'], [(sql, 2)])
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_disabled_when_sample_rate_is_zero(self):
+        client = APIClient()
+        client.force_authenticate(self.tech)
+        response = client.get('/api/technician-dashboard/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiling.snapshot(), ({}, {}))
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessJWTAuthTest(DashboardDataMixin, TestCase):
+    def login(self, username, password, url='/api/login/'):
+        response = APIClient().post(url, {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    def test_dashboard_without_user_query(self):
+        client = self.login('tech', 'tech12345')
+        client.get('/api/technician-dashboard/')
+        # Cached token version, dashboard and validators: no query at all
+        with self.assertNumQueries(0):
+            response = client.get('/api/technician-dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_role_change_revokes_tokens(self):
+        client = self.login('tech', 'tech12345')
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tech.role = 'SALES_AGENT'
+            self.tech.save()
+        response = client.get('/api/technician-dashboard/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['detail'].code, 'token_revoked')
+
+    def test_password_change_and_deactivation_revoke_tokens(self):
+        client = self.login('tech', 'tech12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tech.set_password('changed12345')
+            self.tech.save(update_fields=['password'])
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 401)
+
+        client = self.login('tech', 'changed12345')
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.tech.pk)
+            user.is_active = False
+            user.save()
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 401)
+
+    def test_unrelated_saves_keep_tokens(self):
+        client = self.login('tech', 'tech12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tech.email = 'tech@example.com'
+            self.tech.save()
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 200)
+
+    def test_token_endpoint_after_password_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tech.set_password('changed12345')
+            self.tech.save()
+        self.assertEqual(User.objects.get(pk=self.tech.pk).token_version, 1)
+        client = self.login('tech', 'changed12345', url='/api/token/')
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 200)
+
+    def test_tokens_without_role_claim_use_the_database(self):
+        # Issued before the claims existed: only the active check applies
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tech.set_password('changed12345')
+            self.tech.save()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.tech)}')
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.tech.pk).update(is_active=False)
+        self.assertEqual(client.get('/api/technician-dashboard/').status_code, 401)
+
+
+@override_settings(
+    LOGIN_THROTTLE_IP_RATE='1/min', LOGIN_THROTTLE_IP_BURST=3,
+    LOGIN_THROTTLE_USERNAME_RATE='1/hour', LOGIN_THROTTLE_USERNAME_BURST=2,
+)
+class LoginThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tech = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+
+    def login(self, username, password, ip='10.0.0.1'):
+        return APIClient().post('/api/login/', {'username': username, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_ip_flood_is_rejected_before_hashing(self):
+        for i in range(3):
+            self.assertEqual(self.login(f'user{i}', 'wrong').status_code, 401)
+        # No user lookup, so no password hash either
+        with self.assertNumQueries(0):
+            response = self.login('tech', 'tech12345')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(response['Retry-After'], ('59', '60'))
+        self.assertEqual(self.login('tech', 'tech12345', ip='10.0.0.2').status_code, 200)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        for i in range(3):
+            response = APIClient().post(
+                '/api/login/', {'username': f'user{i}', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{i}',
+            )
+            self.assertEqual(response.status_code, 401)
+        response = APIClient().post(
+            '/api/login/', {'username': 'tech', 'password': 'tech12345'},
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.99',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_failed_logins_exhaust_the_username_bucket(self):
+        self.assertEqual(self.login('tech', 'wrong', ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self.login('TECH', 'wrong', ip='10.0.0.2').status_code, 401)
+        response = self.login('tech', 'tech12345', ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.login('other', 'wrong', ip='10.0.0.4').status_code, 401)
+
+    def test_successful_logins_do_not_use_the_username_bucket(self):
+        for i in range(3):
+            response = APIClient().post(
+                '/api/token/', {'username': 'tech', 'password': 'tech12345'}, REMOTE_ADDR=f'10.0.1.{i}',
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_bucket_refills(self):
+        bucket = TokenBucket('test', rate=0.5, burst=2)
+        with mock.patch('core.throttling.time.time', return_value=1000.0):
+            self.assertEqual(bucket.take('a'), 0)
+            self.assertEqual(bucket.take('a'), 0)
+            self.assertEqual(bucket.take('a'), 2.0)
+            self.assertEqual(bucket.take('b'), 0)
+        with mock.patch('core.throttling.time.time', return_value=1003.0):
+            self.assertEqual(bucket.wait('a'), 0)
+            self.assertEqual(bucket.take('a'), 0)
+            self.assertEqual(bucket.take('a'), 1.0)
+
+    @override_settings(LOGIN_THROTTLE_IP_RATE='', LOGIN_THROTTLE_USERNAME_RATE='')
+    def test_empty_rates_turn_the_throttle_off(self):
+        for _ in range(4):
+            self.assertEqual(self.login('tech', 'wrong').status_code, 401)
+
+
+class PasswordHasherPolicyTest(TestCase):
+    def test_login_rehashes_at_the_configured_cost(self):
+        user = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$600000$'))
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            client = APIClient()
+            response = client.post('/api/login/', {'username': 'tech', 'password': 'tech12345'})
+            self.assertEqual(response.status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+            self.assertTrue(user.check_password('tech12345'))
+        # Rehashing the same password keeps issued tokens valid
+        self.assertEqual(user.token_version, 0)
+
+
+class StreamClient:
+    """Drives the dashboard events ASGI app the way an ASGI server would.
+
+    All clients created with the same ``disconnect`` event hang up together.
+    With ``keep=False`` sent messages are only counted, not kept.
+    """
+
+    def __init__(self, token=None, last_event_id=None, method='GET', disconnect=None, keep=True):
+        headers = []
+        if token:
+            headers.append((b'authorization', f'Bearer {token}'.encode()))
+        if last_event_id:
+            headers.append((b'last-event-id', last_event_id.encode()))
+        self.scope = {'type': 'http', 'method': method, 'path': DASHBOARD_EVENTS_PATH, 'headers': headers}
+        self.disconnect = disconnect or asyncio.Event()
+        self.messages = asyncio.Queue() if keep else None
+        self.sent = 0
+
+    async def receive(self):
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.sent += 1
+        if self.messages is not None:
+            await self.messages.put(message)
+
+    def start(self):
+        self.task = asyncio.ensure_future(dashboard_events(self.scope, self.receive, self.send))
+        return self
+
+    async def response(self):
+        start = await asyncio.wait_for(self.messages.get(), 5)
+        return start['status'], dict(start['headers'])
+
+    async def next_event(self):
+        while True:
+            body = (await asyncio.wait_for(self.messages.get(), 5)).get('body', b'').decode()
+            if body.startswith('event:'):
+                fields = dict(line.split(': ', 1) for line in body.strip().split('\n'))
+                return fields['event'], fields.get('id'), json.loads(fields['data'])
+
+    async def close(self):
+        self.disconnect.set()
+        await asyncio.wait_for(self.task, 5)
+
+
+class DashboardEventsTest(DashboardDataMixin, TransactionTestCase):
+    # Streams close obsolete connections as Django's handler does, which a
+    # TestCase transaction would not survive; writes commit, in autocommit
+    def access_token(self, user):
+        return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+    def tech_task(self, task_status):
+        return JobTask.objects.filter(job__assigned_to=self.tech, status=task_status).order_by('id').first()
+
+    def update_task(self, task, **fields):
+        for name, value in fields.items():
+            setattr(task, name, value)
+        task.save()
+
+    async def test_snapshot_then_deltas(self):
+        token = await sync_to_async(self.access_token)(self.tech)
+        stream = StreamClient(token).start()
+        status_code, headers = await stream.response()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(headers[b'content-type'], b'text/event-stream')
+        event, _, data = await stream.next_event()
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual(data, json.loads(JSONRenderer().render(await sync_to_async(build_dashboard)(self.tech))))
+
+        task = await sync_to_async(self.tech_task)('IN_PROGRESS')
+        await sync_to_async(self.update_task)(task, status='COMPLETED')
+        event, _, data = await stream.next_event()
+        self.assertEqual((event, data), ('delta', {'upsert': [], 'remove': [task.id]}))
+
+        task = await sync_to_async(self.tech_task)('UPCOMING')
+        await sync_to_async(self.update_task)(task, description='Bring a ladder')
+        event, _, data = await stream.next_event()
+        self.assertEqual(event, 'delta')
+        self.assertEqual([item['task']['description'] for item in data['upsert']], ['Bring a ladder'])
+        self.assertEqual(data['remove'], [])
+        await stream.close()
+        self.assertEqual(events.broker.count(), 0)
+
+    async def test_reconnect_with_last_event_id_gets_a_delta(self):
+        token = await sync_to_async(self.access_token)(self.tech)
+        stream = StreamClient(token).start()
+        _, event_id, _ = await stream.next_event()
+        await stream.close()
+
+        task = await sync_to_async(self.tech_task)('UPCOMING')
+        await sync_to_async(self.update_task)(task, description='Changed while offline')
+        stream = StreamClient(token, last_event_id=event_id).start()
+        event, _, data = await stream.next_event()
+        self.assertEqual(event, 'delta')
+        self.assertEqual([item['task']['id'] for item in data['upsert']], [task.id])
+        await stream.close()
+
+    async def test_stream_survives_a_broken_connection(self):
+        token = await sync_to_async(self.access_token)(self.tech)
+        stream = StreamClient(token).start()
+        self.assertEqual((await stream.next_event())[0], 'snapshot')
+
+        # As after a database restart: the server side of the connection is
+        # gone, and Django only finds out on the next query
+        await sync_to_async(lambda: connection.connection.close())()
+        task = await sync_to_async(self.tech_task)('UPCOMING')
+        await sync_to_async(self.update_task)(task, description='After the restart')
+        event, _, data = await stream.next_event()
+        self.assertEqual(event, 'delta')
+        self.assertEqual([item['task']['description'] for item in data['upsert']], ['After the restart'])
+
+        # A query failing in the stream does not end it
+        with mock.patch('core.streams.get_dashboard', side_effect=DatabaseError):
+            await sync_to_async(self.update_task)(task, description='While failing')
+            await asyncio.sleep(0.1)
+        self.assertFalse(stream.task.done())
+        await sync_to_async(self.update_task)(task, description='Recovered')
+        event, _, data = await stream.next_event()
+        self.assertEqual([item['task']['description'] for item in data['upsert']], ['Recovered'])
+        await stream.close()
+
+    async def test_authentication_and_role(self):
+        stream = StreamClient().start()
+        self.assertEqual((await stream.response())[0], 401)
+        sales = await sync_to_async(User.objects.get)(username='sales')
+        stream = StreamClient(await sync_to_async(self.access_token)(sales)).start()
+        self.assertEqual((await stream.response())[0], 403)
+
+    @override_settings(JWT_STATELESS_AUTH=True)
+    async def test_idle_connections_use_bounded_memory(self):
+        connections_count = 5000
+        token = await sync_to_async(self.access_token)(self.tech)
+        # Two halves, disconnected one after the other
+        halves = [asyncio.Event(), asyncio.Event()]
+        groups = [
+            [StreamClient(token, disconnect=half, keep=False) for _ in range(connections_count // 2)]
+            for half in halves
+        ]
+        streams = groups[0] + groups[1]
+        gc.collect()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            for stream in streams:
+                stream.start()
+            # Response start and snapshot sent: every stream is now idle
+            while sum(stream.sent >= 2 for stream in streams) < connections_count:
+                await asyncio.sleep(0.05)
+            self.assertEqual(events.broker.count(), connections_count)
+            gc.collect()
+            held = [tracemalloc.get_traced_memory()[0]]
+
+            # Everything a stream allocated goes away with it
+            streams.clear()
+            for half, group in zip(halves, groups):
+                half.set()
+                await asyncio.gather(*(stream.task for stream in group))
+                group.clear()
+                await asyncio.sleep(0)
+                gc.collect()
+                held.append(tracemalloc.get_traced_memory()[0])
+        finally:
+            tracemalloc.stop()
+        per_connection = (held[0] - baseline) / connections_count
+        self.assertLess(per_connection, 8 * 1024)
+        self.assertEqual(events.broker.count(), 0)
+        # Each half frees what its streams held; a leak in some of them
+        # would leave a half short. asyncio's set of all tasks keeps the
+        # size it grew to, a few bytes per stream.
+        for before, after in zip(held, held[1:]):
+            freed = (before - after) / (connections_count / 2)
+            self.assertGreater(freed, 0.9 * per_connection)
+
+
+class AsyncViewsTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+
+    def access_token(self, user):
+        return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+    async def get_dashboard(self, token=None, **headers):
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        request = self.factory.get('/api/technician-dashboard/', headers=headers)
+        return await AsyncTechnicianDashboardView.as_view()(request)
+
+    async def login(self, username, password):
+        request = self.factory.post('/api/login/', {'username': username, 'password': password})
+        return await AsyncTokenObtainPairView.as_view()(request)
+
+    async def test_dashboard_matches_the_sync_view(self):
+        token = await sync_to_async(self.access_token)(self.tech)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        expected = await sync_to_async(client.get)('/api/technician-dashboard/')
+
+        response = await self.get_dashboard(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        response = await self.get_dashboard(token, **{'If-None-Match': expected['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_dashboard_authentication_and_role(self):
+        response = await self.get_dashboard()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        sales = await User.objects.aget(username='sales')
+        response = await self.get_dashboard(await sync_to_async(self.access_token)(sales))
+        self.assertEqual(response.status_code, 403)
+
+    async def test_login(self):
+        response = await self.login('tech', 'tech12345')
+        self.assertEqual(response.status_code, 200)
+        response = await self.get_dashboard(json.loads(response.content)['access'])
+        self.assertEqual(response.status_code, 200)
+
+        response = await self.login('tech', 'wrong')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content), {'detail': 'No active account found with the given credentials'})
+        response = await self.login('nobody', 'wrong')
+        self.assertEqual(response.status_code, 401)
+        response = await self.login('tech', '')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_login_goes_through_the_auth_backends(self):
+        failures = []
+
+        def receiver(credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(receiver)
+        try:
+            sync_response = await sync_to_async(APIClient().post)(
+                '/api/login/', {'username': 'tech', 'password': 'wrong'},
+            )
+            self.assertEqual(sync_response.status_code, 401)
+            self.assertEqual((await self.login('tech', 'wrong')).status_code, 401)
+        finally:
+            user_login_failed.disconnect(receiver)
+        self.assertEqual(failures, ['tech', 'tech'])
+
+        await User.objects.filter(username='tech').aupdate(is_active=False)
+        self.assertEqual((await self.login('tech', 'tech12345')).status_code, 401)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    async def test_login_rehashes_at_the_configured_cost(self):
+        self.assertEqual((await self.login('tech', 'tech12345')).status_code, 200)
+        user = await User.objects.aget(username='tech')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(user.token_version, 0)
+
+    @override_settings(LOGIN_THROTTLE_IP_RATE='1/min', LOGIN_THROTTLE_IP_BURST=1)
+    async def test_login_is_throttled(self):
+        self.assertEqual((await self.login('tech', 'tech12345')).status_code, 200)
+        response = await self.login('tech', 'tech12345')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class ConditionalDashboardTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.tech)
+
+    def test_etag_round_trip(self):
+        response = self.client.get('/api/technician-dashboard/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/technician-dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_no_last_modified(self):
+        # Tasks leaving the dashboard would not move a newest timestamp
+        response = self.client.get('/api/technician-dashboard/')
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get('/api/technician-dashboard/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_when_rows_leave_the_dashboard(self):
+        etag = self.client.get('/api/technician-dashboard/')['ETag']
+        task = JobTask.objects.filter(job__assigned_to=self.tech, status='IN_PROGRESS').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'COMPLETED'
+            task.save()
+        response = self.client.get('/api/technician-dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn(task.pk, [t['id'] for day in response.data for t in day['tasks']])
+
+    def test_etag_changes_when_equipment_is_swapped_between_tasks(self):
+        first, second = JobTask.objects.filter(job__assigned_to=self.tech, status__in=['UPCOMING', 'IN_PROGRESS'])[:2]
+        truck = Equipment.objects.create(name='Truck', type='VEHICLE', serial_number='TR202')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.required_equipment.set([self.drill])
+            second.required_equipment.set([truck])
+        etag = self.client.get('/api/technician-dashboard/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            first.required_equipment.set([truck])
+            second.required_equipment.set([self.drill])
+        response = self.client.get('/api/technician-dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, build_dashboard(self.tech))
+
+    def test_etag_names_the_payload_served(self):
+        # A payload cached before a write is served under the ETag it was
+        # cached with, never under the ETag of a newer version
+        response = self.client.get('/api/technician-dashboard/')
+        JobTask.objects.filter(job__assigned_to=self.tech).update(description='Changed')
+        stale = self.client.get('/api/technician-dashboard/')
+        self.assertEqual((stale['ETag'], stale.data), (response['ETag'], response.data))
+        bump_dashboard_version(self.tech.pk)
+        fresh = self.client.get('/api/technician-dashboard/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.data, build_dashboard(self.tech))
+
+
+class QueryPlanTest(TestCase):
+    def test_hot_queries_use_indexes(self):
+        tech = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+        results = {result['name']: result for result in check_query_plans(tech, force_index=True)}
+
+        self.assertTrue(results['technician_dashboard']['used'], results['technician_dashboard']['plan'])
+        self.assertTrue(results['open_tasks_per_job']['used'], results['open_tasks_per_job']['plan'])
+        if connection.vendor == 'postgresql':
+            # SQLite cannot match a partial index against bound parameters
+            self.assertTrue(results['flag_overdue_jobs']['used'], results['flag_overdue_jobs']['plan'])
+            self.assertTrue(results['admin_job_search']['used'], results['admin_job_search']['plan'])
+            self.assertTrue(results['admin_task_search']['used'], results['admin_task_search']['plan'])
+
+
+class GenerateDummyDataTest(TestCase):
+    def snapshot(self):
+        return [
+            (task.job.title, task.job.assigned_to.username, task.job.status, task.job.priority,
+             task.job.scheduled_date, task.title, task.status,
+             sorted(task.required_equipment.values_list('serial_number', flat=True)))
+            for task in JobTask.objects.select_related('job__assigned_to').order_by('job__title', 'order')
+        ]
+
+    def test_seeded_runs_are_reproducible(self):
+        options = {'jobs': 7, 'technicians': 4, 'equipment': 8, 'tasks_per_job': '1-3', 'seed': 42, 'batch_size': 3}
+        call_command('generate_dummy_data', stdout=StringIO(), **options)
+        first = self.snapshot()
+        self.assertEqual(Job.objects.count(), 7)
+        self.assertEqual(User.objects.filter(role='TECHNICIAN').count(), 4)
+        self.assertEqual(Equipment.objects.count(), 8)
+        self.assertTrue(all(1 <= len([t for t in first if t[0] == job.title]) <= 3 for job in Job.objects.all()))
+
+        Job.objects.all().delete()
+        call_command('generate_dummy_data', stdout=StringIO(), **options)
+        self.assertEqual(self.snapshot(), first)
+        self.assertTrue(User.objects.get(username='tech1').check_password('tech1123'))
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+    def test_copy_loads_the_same_rows(self):
+        options = {'jobs': 7, 'technicians': 4, 'equipment': 8, 'tasks_per_job': '1-3', 'seed': 42, 'batch_size': 3}
+        call_command('generate_dummy_data', stdout=StringIO(), **options)
+        expected = self.snapshot()
+        through = JobTask.required_equipment.through
+        links = through.objects.count()
+
+        Job.objects.all().delete()
+        call_command('generate_dummy_data', '--copy', stdout=StringIO(), **options)
+        self.assertEqual(Job.objects.count(), 7)
+        self.assertEqual(JobTask.objects.count(), len(expected))
+        self.assertEqual(through.objects.count(), links)
+        self.assertEqual(self.snapshot(), expected)
+
+        # Every sequence is past the ids COPY wrote, so ORM inserts still work
+        with connection.cursor() as cursor:
+            for model in (Job, JobTask, through):
+                cursor.execute(
+                    "SELECT currval(pg_get_serial_sequence(%s, 'id'))", [model._meta.db_table],
+                )
+                self.assertGreaterEqual(cursor.fetchone()[0], model.objects.aggregate(Max('id'))['id__max'])
+        job = Job.objects.create(
+            title='After COPY', description='', client_name='Client', status='PENDING',
+            created_by=User.objects.get(username='sales1'), scheduled_date=timezone.now(),
+        )
+        task = JobTask.objects.create(job=job, title='Task', description='', order=1)
+        task.required_equipment.add(Equipment.objects.first())
+
+
+class OverdueJobsTest(TestCase):
+    def setUp(self):
+        tech = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+        sales = User.objects.create_user(username='sales', password='sales12345', role='SALES_AGENT')
+        now = timezone.now()
+        statuses = ['PENDING', 'IN_PROGRESS', 'COMPLETED']
+        for i in range(10):
+            Job.objects.create(
+                title=f'Job {i}', description='', client_name='Client', created_by=sales, assigned_to=tech,
+                status=statuses[i % 3], scheduled_date=now + timedelta(days=i - 7, hours=12),
+            )
+        # Past open jobs: days -7..-1 with status index 0 or 1
+        self.expected = Job.objects.filter(scheduled_date__lt=now).exclude(status='COMPLETED').count()
+
+    def test_flag_in_chunks(self):
+        stats = flag_overdue_jobs(batch_size=2)
+        self.assertEqual(stats['flagged'], self.expected)
+        self.assertTrue(stats['complete'])
+        self.assertEqual(stats['chunks'], 3)
+        self.assertEqual(Job.objects.filter(overdue=True).count(), self.expected)
+        self.assertFalse(Checkpoint.objects.exists())
+
+    def test_resume_from_checkpoint(self):
+        stats = flag_overdue_jobs(batch_size=2, time_budget=0)
+        self.assertEqual(stats['flagged'], 2)
+        self.assertFalse(stats['complete'])
+        self.assertTrue(Checkpoint.objects.filter(name='flag_overdue_jobs').exists())
+
+        stats = flag_overdue_jobs(batch_size=2)
+        self.assertTrue(stats['resumed'])
+        self.assertTrue(stats['complete'])
+        self.assertEqual(stats['flagged'], self.expected - 2)
+
+    def test_clear_completed_and_rescheduled(self):
+        flag_overdue_jobs()
+        completed, rescheduled, *_ = Job.objects.filter(overdue=True).order_by('scheduled_date')
+        completed.status = 'COMPLETED'
+        completed.save()
+        rescheduled.scheduled_date = timezone.now() + timedelta(days=1)
+        rescheduled.save()
+
+        stats = clear_overdue_jobs(batch_size=2)
+        self.assertEqual(stats['cleared'], 2)
+        self.assertEqual(stats['scanned'], self.expected)
+        self.assertEqual(Job.objects.filter(overdue=True).count(), self.expected - 2)
+
+
+class JobListTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='admin12345', role='ADMIN')
+        # Same scheduled date for several jobs, so ties are broken by id
+        tie = timezone.now() + timedelta(days=3)
+        sales = User.objects.get(username='sales')
+        for i in range(3):
+            Job.objects.create(
+                title=f'Tied {i}', description='', client_name='Client', created_by=sales,
+                assigned_to=self.tech, scheduled_date=tie, priority='HIGH',
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_every_job_once(self):
+        expected = list(Job.objects.order_by('scheduled_date', 'id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/jobs/?page_size=2'), expected)
+
+    def test_task_pages_cover_every_task_once(self):
+        expected = list(JobTask.objects.order_by('job__scheduled_date', 'id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/tasks/?page_size=3'), expected)
+
+    def test_filters(self):
+        ids = self.walk(f'/api/jobs/?priority=HIGH&assigned_to={self.tech.pk}')
+        self.assertEqual(ids, list(Job.objects.filter(title__startswith='Tied').order_by('id').values_list('id', flat=True)))
+
+        cutoff = (timezone.now() + timedelta(days=1)).isoformat()
+        response = self.client.get('/api/tasks/', {'scheduled_from': cutoff, 'status': 'IN_PROGRESS'})
+        expected = JobTask.objects.filter(job__scheduled_date__gte=cutoff, status='IN_PROGRESS').count()
+        self.assertEqual(len(response.data['results']), expected)
+
+    def test_nested_tasks_without_n_plus_one(self):
+        # Page query, tasks prefetch, equipment prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/jobs/?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/jobs/?page_size=100')
+        self.assertEqual(len(response.data['results']), Job.objects.count())
+        self.assertEqual(len(response.data['results'][0]['tasks']), 4)
+
+    def test_invalid_cursor_and_permissions(self):
+        self.assertEqual(self.client.get('/api/jobs/?cursor=bogus').status_code, 404)
+        self.client.force_authenticate(self.tech)
+        self.assertEqual(self.client.get('/api/jobs/').status_code, 403)
+
+
+class BulkJobIngestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sales = User.objects.create_user(username='sales', password='sales12345', role='SALES_AGENT')
+        self.tech = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+        Equipment.objects.create(name='Drill', type='TOOL', serial_number='DR123')
+        Equipment.objects.create(name='Crane', type='MACHINE', serial_number='CR101')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sales)
+
+    def job(self, i, **overrides):
+        data = {
+            'external_id': f'CRM-{i}', 'title': f'Job {i}', 'client_name': 'Acme', 'assigned_to': 'tech',
+            'scheduled_date': (timezone.now() + timedelta(days=1)).isoformat(),
+            'tasks': [
+                {'title': 'Inspect', 'equipment': ['DR123']},
+                {'title': 'Lift', 'equipment': ['DR123', 'CR101'], 'status': 'IN_PROGRESS'},
+            ],
+        }
+        data.update(overrides)
+        return data
+
+    def test_create_with_per_item_errors(self):
+        jobs = [
+            self.job(1),
+            self.job(2, priority='URGENT'),
+            self.job(3, assigned_to='nobody'),
+            self.job(4, tasks=[{'title': 'Dig', 'equipment': ['XX999']}]),
+            self.job(1),
+            self.job(5, external_id=None),
+        ]
+        response = self.client.post('/api/jobs/bulk/', {'jobs': jobs}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3, 4])
+        self.assertIn('priority', response.data['errors'][0]['errors'])
+        self.assertIn('XX999', response.data['errors'][2]['errors']['tasks'][0])
+
+        job = Job.objects.get(external_id='CRM-1')
+        self.assertEqual(job.created_by, self.sales)
+        self.assertEqual(list(job.tasks.values_list('title', 'order')), [('Inspect', 1), ('Lift', 2)])
+        self.assertEqual(job.tasks.get(order=2).required_equipment.count(), 2)
+
+    def test_unassigned_jobs_keep_their_technician_on_update(self):
+        self.client.post('/api/jobs/bulk/', {'jobs': [self.job(1, assigned_to=None), self.job(2)]}, format='json')
+        self.assertIsNone(Job.objects.get(external_id='CRM-1').assigned_to)
+        job = self.job(2)
+        del job['assigned_to']
+        response = self.client.post('/api/jobs/bulk/', {'jobs': [job]}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(Job.objects.get(external_id='CRM-2').assigned_to, self.tech)
+
+    def test_upsert_replaces_tasks(self):
+        self.client.post('/api/jobs/bulk/', {'jobs': [self.job(1)]}, format='json')
+        job_id = Job.objects.get(external_id='CRM-1').id
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/jobs/bulk/', {'jobs': [
+                self.job(1, title='Renamed', tasks=[{'title': 'Only', 'equipment': ['CR101']}]),
+            ]}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual(job.title, 'Renamed')
+        self.assertEqual(list(job.tasks.values_list('title', flat=True)), ['Only'])
+
+    def test_query_count_is_independent_of_batch_size(self):
+        def queries(count, offset):
+            jobs = [self.job(offset + i) for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/jobs/bulk/', {'jobs': jobs}, format='json')
+            self.assertEqual(response.data['created'], count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(2, 0), queries(20, 100))
+
+    def test_database_errors_are_not_returned_to_clients(self):
+        def fail_job_inserts(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "core_job"'):
+                raise DatabaseError('violates constraint "core_job_secret_idx"')
+            return execute(sql, params, many, context)
+
+        with self.assertLogs('core.ingest', 'ERROR') as logs, connection.execute_wrapper(fail_job_inserts):
+            response = self.client.post('/api/jobs/bulk/', {'jobs': [self.job(1)]}, format='json')
+        self.assertEqual(response.data['errors'], [{'index': 0, 'errors': {'non_field_errors': ['Could not be saved.']}}])
+        self.assertNotIn('core_job', json.dumps(response.data))
+        self.assertIn('core_job_secret_idx', '\n'.join(logs.output))
+
+    def test_rejects_non_list_and_technicians(self):
+        self.assertEqual(self.client.post('/api/jobs/bulk/', {'jobs': 'x'}, format='json').status_code, 400)
+        self.client.force_authenticate(self.tech)
+        self.assertEqual(self.client.post('/api/jobs/bulk/', {'jobs': []}, format='json').status_code, 403)
+
+
+class TaskTransitionTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.tech)
+        self.job = Job.objects.filter(assigned_to=self.tech).order_by('id').first()
+        self.tasks = list(self.job.tasks.order_by('order'))
+
+    def post(self, transitions):
+        return self.client.post('/api/tasks/transitions/', {'transitions': transitions}, format='json')
+
+    def test_complete_all_tasks_completes_job(self):
+        foreign = JobTask.objects.filter(job__assigned_to=self.other).first()
+        transitions = [{'id': task.id, 'status': 'IN_PROGRESS'} for task in self.tasks]
+        transitions += [{'id': task.id, 'status': 'COMPLETED'} for task in self.tasks]
+        transitions += [{'id': foreign.id, 'status': 'COMPLETED'}, {'id': 'x', 'status': 'DONE'}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(transitions)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error['index'] for error in response.data['errors']], [8, 9])
+        self.assertEqual(response.data['jobs'], [{'id': self.job.id, 'status': 'COMPLETED'}])
+        self.assertTrue(all(task['completed_at'] for task in response.data['tasks']))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'COMPLETED')
+        self.assertEqual(JobTask.objects.get(pk=foreign.pk).status, foreign.status)
+
+    def test_reopen_clears_completed_at_and_rolls_up(self):
+        completed = self.tasks[2]
+        self.assertEqual(completed.status, 'COMPLETED')
+        response = self.post([
+            {'id': completed.id, 'status': 'PENDING'},
+            {'id': self.tasks[1].id, 'status': 'PENDING'},
+        ])
+        self.assertEqual(response.data['jobs'], [{'id': self.job.id, 'status': 'PENDING'}])
+        self.assertIsNone(JobTask.objects.get(pk=completed.pk).completed_at)
+
+    def test_completed_at_is_kept_for_already_completed_tasks(self):
+        earlier = timezone.now() - timedelta(days=1)
+        JobTask.objects.filter(pk=self.tasks[2].pk).update(completed_at=earlier)
+        self.post([{'id': self.tasks[2].id, 'status': 'COMPLETED'}, {'id': self.tasks[0].id, 'status': 'COMPLETED'}])
+        self.assertEqual(JobTask.objects.get(pk=self.tasks[2].pk).completed_at, earlier)
+        self.assertIsNotNone(JobTask.objects.get(pk=self.tasks[0].pk).completed_at)
+
+    def test_query_count_is_independent_of_batch_size(self):
+        def queries(tasks):
+            with CaptureQueriesContext(connection) as ctx:
+                self.post([{'id': task.id, 'status': 'IN_PROGRESS'} for task in tasks])
+            return len(ctx.captured_queries)
+
+        all_tasks = list(JobTask.objects.filter(job__assigned_to=self.tech))
+        self.assertEqual(queries(all_tasks[:1]), queries(all_tasks))
+
+    def test_dashboard_reflects_transitions(self):
+        get_dashboard(self.tech)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([{'id': self.tasks[1].id, 'status': 'COMPLETED'}])
+        self.assertEqual(get_dashboard(self.tech), build_dashboard(self.tech))
+        self.assertEqual(dashboard_cache_stats()['misses'], 2)
+
+
+class TaskTransitionLockTest(DashboardDataMixin, TransactionTestCase):
+    def test_job_reassigned_while_waiting_for_its_lock(self):
+        task = JobTask.objects.filter(job__assigned_to=self.tech, status='UPCOMING').order_by('id').first()
+        result = {}
+
+        def transition():
+            try:
+                result['errors'] = transition_tasks(self.tech, [{'id': task.id, 'status': 'COMPLETED'}])[2]
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            Job.objects.select_for_update().get(pk=task.job_id)
+            thread = threading.Thread(target=transition)
+            thread.start()
+            # Until the transition waits on the job's lock
+            with connection.cursor() as cursor:
+                for _ in range(100):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND datname = %s",
+                        [connection.settings_dict['NAME']],
+                    )
+                    if cursor.fetchone()[0]:
+                        break
+                    cursor.execute('SELECT pg_sleep(0.05)')
+            Job.objects.filter(pk=task.job_id).update(assigned_to=self.other)
+        thread.join(5)
+
+        self.assertEqual(result['errors'], [{'index': 0, 'errors': {'id': [f'Task {task.id} not found.']}}])
+        self.assertEqual(JobTask.objects.get(pk=task.pk).status, 'UPCOMING')
+
+
+class WorkloadRollupTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        # Rollups are refreshed once the writes commit
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='admin12345', role='ADMIN')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertInSync(self):
+        self.assertEqual(diff_workload(), [])
+
+    def test_writes_keep_the_rollup_in_sync(self):
+        self.assertInSync()
+        self.assertEqual(sum(WorkloadRollup.objects.values_list('jobs', flat=True)), 4)
+        job = Job.objects.filter(assigned_to=self.tech).order_by('id').first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.priority, job.scheduled_date = 'HIGH', job.scheduled_date + timedelta(days=3)
+            job.save()
+        self.assertInSync()
+        with self.captureOnCommitCallbacks(execute=True):
+            job.assigned_to = self.other
+            job.save()
+        self.assertInSync()
+        with self.captureOnCommitCallbacks(execute=True):
+            job.tasks.first().delete()
+        self.assertInSync()
+
+        self.client.force_authenticate(self.tech)
+        tasks = JobTask.objects.filter(job__assigned_to=self.tech)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/transitions/', {
+                'transitions': [{'id': task.id, 'status': 'COMPLETED'} for task in tasks],
+            }, format='json')
+        self.assertInSync()
+
+        Job.objects.update(scheduled_date=F('scheduled_date') - timedelta(days=30))
+        refresh_workload(job_buckets(Job.objects.all()) | set(WorkloadRollup.objects.values_list('technician', 'date')))
+        with self.captureOnCommitCallbacks(execute=True):
+            flag_overdue_jobs()
+        self.assertTrue(WorkloadRollup.objects.filter(overdue_jobs__gt=0).exists())
+        self.assertInSync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertInSync()
+
+    def test_bulk_ingest_keeps_the_rollup_in_sync(self):
+        self.client.force_authenticate(User.objects.get(username='sales'))
+        item = {
+            'external_id': 'crm-1', 'title': 'Imported', 'client_name': 'Client', 'assigned_to': 'tech',
+            'scheduled_date': timezone.now().isoformat(), 'tasks': [{'title': 'A'}, {'title': 'B'}],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/jobs/bulk/', {'jobs': [item]}, format='json')
+        self.assertInSync()
+        item.update(assigned_to='other', scheduled_date=(timezone.now() + timedelta(days=2)).isoformat())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/jobs/bulk/', {'jobs': [item]}, format='json')
+        self.assertInSync()
+
+    def test_a_transaction_refreshes_once(self):
+        with mock.patch('core.workload.refresh_workload') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for task in JobTask.objects.filter(job__assigned_to=self.tech).select_related('job'):
+                    task.status = 'COMPLETED'
+                    task.save()
+        refresh.assert_called_once()
+        self.assertEqual(len(refresh.call_args.args[0]), 2)
+
+    def test_rebuild_and_check(self):
+        WorkloadRollup.objects.filter(technician=self.tech).delete()
+        WorkloadRollup.objects.filter(technician=self.other).update(jobs=5)
+        with self.assertRaisesMessage(CommandError, '3 workload rollup rows differ'):
+            call_command('check_workload_rollup', stdout=StringIO())
+
+        today = timezone.localdate()
+        self.assertEqual(rebuild_workload_rollup(today.isoformat(), today.isoformat()), 1)
+        self.assertEqual(len(diff_workload()), 2)
+        call_command('check_workload_rollup', fix=True, stdout=StringIO())
+        self.assertInSync()
+
+        WorkloadRollup.objects.all().delete()
+        self.assertEqual(rebuild_workload_rollup(), 3)
+        out = StringIO()
+        call_command('check_workload_rollup', stdout=out)
+        self.assertIn('matches', out.getvalue())
+
+    def test_api(self):
+        today = timezone.localdate()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/workload/', {'group_by': 'technician'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['start'], today)
+        self.assertEqual(response.data['end'], today + timedelta(days=6))
+        self.assertEqual(response.data['results'], [
+            {'technician': self.tech.pk, 'jobs': 3, 'overdue_jobs': 0, 'open_tasks': 9},
+            {'technician': self.other.pk, 'jobs': 1, 'overdue_jobs': 0, 'open_tasks': 3},
+        ])
+
+        response = self.client.get('/api/workload/', {'technician': self.other.pk})
+        self.assertEqual([row['technician'] for row in response.data['results']], [self.other.pk])
+        self.assertEqual(set(response.data['results'][0]), {
+            'technician', 'date', 'status', 'priority', 'jobs', 'overdue_jobs', 'open_tasks',
+        })
+        response = self.client.get('/api/workload/', {'group_by': '', 'priority': 'HIGH'})
+        self.assertEqual(response.data['results'], [{'jobs': 0, 'overdue_jobs': 0, 'open_tasks': 0}])
+
+        self.client.force_authenticate(self.tech)
+        response = self.client.get('/api/workload/', {'group_by': 'technician', 'technician': self.other.pk})
+        self.assertEqual(response.data['results'], [
+            {'technician': self.tech.pk, 'jobs': 3, 'overdue_jobs': 0, 'open_tasks': 9},
+        ])
+
+    def test_api_validation_and_roles(self):
+        today = timezone.localdate()
+        for params in (
+            {'group_by': 'client'},
+            {'start': today.isoformat(), 'end': (today - timedelta(days=1)).isoformat()},
+            {'start': today.isoformat(), 'end': (today + timedelta(days=366)).isoformat()},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/workload/', params).status_code, 400)
+        self.client.force_authenticate(User.objects.get(username='sales'))
+        self.assertEqual(self.client.get('/api/workload/').status_code, 403)
+
+
+class EquipmentReservationTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        # Reservations are refreshed once the writes commit
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.sales = User.objects.get(username='sales')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sales)
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def assertInSync(self):
+        self.assertEqual(diff_reservations(), [])
+
+    def reschedule(self, jobs, day):
+        # Every job at noon of day, through save() as the app does
+        with self.captureOnCommitCallbacks(execute=True):
+            for job in jobs:
+                job.scheduled_date = timezone.make_aware(datetime.combine(day, time(12)))
+                job.save()
+
+    def test_writes_keep_reservations_in_sync(self):
+        # Each job's in-progress task needs the drill; the crane only a completed one
+        self.assertInSync()
+        self.assertEqual(EquipmentReservation.objects.filter(equipment=self.drill).count(), 4)
+        crane = Equipment.objects.get(serial_number='CR101')
+        self.assertFalse(EquipmentReservation.objects.filter(equipment=crane).exists())
+
+        job = Job.objects.filter(assigned_to=self.tech).order_by('id').first()
+        self.reschedule([job], self.day)
+        self.assertEqual(EquipmentReservation.objects.get(job=job).date, self.day)
+        self.assertInSync()
+
+        task = job.tasks.get(order=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            crane.jobtask_set.add(task)
+        self.assertTrue(EquipmentSlot.objects.filter(equipment=crane, date=self.day, jobs=1).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            crane.jobtask_set.clear()
+        self.assertInSync()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.required_equipment.add(crane)
+            job.tasks.get(order=2).required_equipment.remove(self.drill)
+        self.assertEqual(set(EquipmentReservation.objects.filter(job=job).values_list('equipment', flat=True)), {crane.pk})
+        self.assertInSync()
+
+        self.client.force_authenticate(self.tech)
+        tasks = JobTask.objects.filter(job__assigned_to=self.tech)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/transitions/', {
+                'transitions': [{'id': task.id, 'status': 'COMPLETED'} for task in tasks],
+            }, format='json')
+        self.assertFalse(EquipmentReservation.objects.filter(job__in=Job.objects.filter(assigned_to=self.tech)).exists())
+        self.assertInSync()
+
+        other_job = Job.objects.get(assigned_to=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            other_job.tasks.get(order=2).delete()
+        self.assertInSync()
+        with self.captureOnCommitCallbacks(execute=True):
+            other_job.delete()
+        self.assertFalse(EquipmentSlot.objects.exists())
+        self.assertInSync()
+
+    def test_bulk_ingest_rebuild_and_check(self):
+        item = {
+            'external_id': 'crm-1', 'title': 'Imported', 'client_name': 'Client', 'assigned_to': 'tech',
+            'scheduled_date': timezone.now().isoformat(), 'tasks': [{'title': 'A', 'equipment': ['DR123']}],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/jobs/bulk/', {'jobs': [item]}, format='json')
+        self.assertInSync()
+        item['scheduled_date'] = (timezone.now() + timedelta(days=2)).isoformat()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/jobs/bulk/', {'jobs': [item]}, format='json')
+        self.assertInSync()
+
+        EquipmentSlot.objects.update(jobs=7)
+        EquipmentReservation.objects.order_by('id').first().delete()
+        with self.assertRaisesMessage(CommandError, 'differ from the tasks'):
+            call_command('check_equipment_reservations', stdout=StringIO())
+        self.assertEqual(rebuild_equipment_reservations(), 5)
+        self.assertInSync()
+        EquipmentSlot.objects.all().delete()
+        call_command('check_equipment_reservations', fix=True, stdout=StringIO())
+        out = StringIO()
+        call_command('check_equipment_reservations', stdout=out)
+        self.assertIn('match', out.getvalue())
+
+    def test_available(self):
+        saw = Equipment.objects.create(name='Saw', type='TOOL', serial_number='SW1')
+        lift = Equipment.objects.create(name='Lift', type='MACHINE', serial_number='LF1')
+        self.reschedule(Job.objects.all(), self.day)
+        params = {'start': self.day.isoformat(), 'end': self.day.isoformat(), 'type': 'TOOL'}
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/equipment/available/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['serial_number'] for row in response.data['results']], ['SW1'])
+        self.assertIsNone(response.data['next'])
+
+        # The day after is free for both tools; the inactive crane never is
+        params = {'start': (self.day + timedelta(days=1)).isoformat()}
+        response = self.client.get('/api/equipment/available/', {**params, 'limit': 1})
+        self.assertEqual([row['serial_number'] for row in response.data['results']], ['DR123'])
+        response = self.client.get('/api/equipment/available/', {**params, 'after': response.data['next']})
+        self.assertEqual([row['serial_number'] for row in response.data['results']], ['SW1', 'LF1'])
+        self.assertEqual(response.data['end'], self.day + timedelta(days=7))
+        # Taken on any day of the range is taken
+        response = self.client.get('/api/equipment/available/', {
+            'start': (self.day - timedelta(days=1)).isoformat(), 'end': self.day.isoformat(),
+        })
+        self.assertEqual([row['id'] for row in response.data['results']], [saw.pk, lift.pk])
+
+    def test_conflicts(self):
+        jobs = list(Job.objects.order_by('id'))
+        self.reschedule(jobs[:3], self.day)
+        self.reschedule(jobs[3:], self.day + timedelta(days=1))
+        params = {'start': self.day.isoformat(), 'end': (self.day + timedelta(days=1)).isoformat()}
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/equipment/conflicts/', params)
+        self.assertEqual(response.data['results'], [{
+            'equipment': self.drill.pk, 'serial_number': 'DR123', 'date': self.day,
+            'jobs': [job.pk for job in jobs[:3]],
+        }])
+        self.assertEqual(self.client.get('/api/equipment/conflicts/', {**params, 'type': 'MACHINE'}).data['results'], [])
+
+        items = [
+            {'equipment': 'DR123', 'date': self.day.isoformat()},
+            {'equipment': 'DR123', 'date': self.day.isoformat(), 'job': jobs[0].pk},
+            {'equipment': 'DR123', 'date': (self.day + timedelta(days=2)).isoformat()},
+            {'equipment': 'NOPE', 'date': self.day.isoformat()},
+            {'equipment': 'DR123', 'date': 'soon'},
+        ]
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/equipment/conflicts/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'index': 0, 'jobs': [job.pk for job in jobs[:3]], 'items': [1]},
+            {'index': 1, 'jobs': [job.pk for job in jobs[1:3]], 'items': [0]},
+            {'index': 2, 'jobs': [], 'items': []},
+        ])
+        self.assertEqual([error['index'] for error in response.data['errors']], [3, 4])
+        self.assertIn('equipment', response.data['errors'][0]['errors'])
+        self.assertIn('date', response.data['errors'][1]['errors'])
+
+    def test_validation_and_roles(self):
+        for params in (
+            {'start': self.day.isoformat(), 'end': (self.day - timedelta(days=1)).isoformat()},
+            {'start': self.day.isoformat(), 'end': (self.day + timedelta(days=92)).isoformat()},
+            {'limit': 0},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/equipment/available/', params).status_code, 400)
+        self.assertEqual(self.client.post('/api/equipment/conflicts/', {'items': 'x'}, format='json').status_code, 400)
+        with override_settings(EQUIPMENT_CHECK_MAX_ITEMS=1):
+            response = self.client.post('/api/equipment/conflicts/', {'items': [{}, {}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.tech)
+        self.assertEqual(self.client.get('/api/equipment/available/').status_code, 403)
+        self.assertEqual(self.client.get('/api/equipment/conflicts/').status_code, 403)
+
+
+@override_settings(SCHEDULER_DAILY_CAPACITY=2)
+class SchedulingTest(TestCase):
+    def setUp(self):
+        self.sales = User.objects.create_user(username='sales', password='sales12345', role='SALES_AGENT')
+        self.techs = [
+            User.objects.create_user(username=f'tech{i}', password='tech12345', role='TECHNICIAN') for i in range(2)
+        ]
+        self.drill = Equipment.objects.create(name='Drill', type='TOOL', serial_number='DR123')
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.hour = 8
+
+    def create_job(self, assigned_to=None, priority='MEDIUM', client=None, equipment=(), status='PENDING'):
+        # Jobs of one day, an hour apart, each with a task needing ``equipment``
+        self.hour += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            job = Job.objects.create(
+                title='Job', description='', client_name=client or f'Client {self.hour}', created_by=self.sales,
+                assigned_to=assigned_to, priority=priority, status=status,
+                scheduled_date=timezone.make_aware(datetime.combine(self.day, time(self.hour))),
+            )
+            JobTask.objects.create(job=job, title='Task', description='').required_equipment.set(equipment)
+        return job
+
+    def schedule(self, **kwargs):
+        changes, report = plan_schedule(self.day, self.day, **kwargs)
+        with self.captureOnCommitCallbacks(execute=True):
+            written = apply_schedule(changes)
+        return changes, report, written
+
+    def test_priority_and_capacity(self):
+        self.create_job(self.techs[0])
+        high = [self.create_job(priority='HIGH') for _ in range(2)]
+        medium = [self.create_job() for _ in range(2)]
+        low = self.create_job(priority='LOW')
+        self.create_job(status='IN_PROGRESS')
+
+        changes, report = plan_schedule(self.day, self.day)
+        self.assertEqual(Job.objects.filter(assigned_to__isnull=True).count(), 6)
+        self.assertEqual((report['jobs'], report['assigned'], report['unplaced']), (5, 3, 2))
+        self.assertEqual(report['unplaced_jobs'], [medium[1].pk, low.pk])
+        self.assertEqual(report['max_daily_load'], 2)
+        self.assertEqual({job_id for job_id, *_ in changes}, {high[0].pk, high[1].pk, medium[0].pk})
+
+        *_, written = self.schedule()
+        self.assertEqual(written, 3)
+        loads = Counter(Job.objects.exclude(assigned_to=None).values_list('assigned_to', flat=True))
+        self.assertEqual(loads, {self.techs[0].pk: 2, self.techs[1].pk: 2})
+        self.assertEqual(diff_workload(), [])
+
+    def test_visits_and_equipment_stay_together(self):
+        held = self.create_job(self.techs[1], equipment=[self.drill])
+        drill_job = self.create_job(equipment=[self.drill])
+        visit = [self.create_job(client='Acme'), self.create_job(client='Acme')]
+        self.schedule()
+        drill_job.refresh_from_db()
+        self.assertEqual(drill_job.assigned_to_id, held.assigned_to_id)
+        self.assertEqual(len({job.assigned_to_id for job in Job.objects.filter(pk__in=[job.pk for job in visit])}), 1)
+
+    @override_settings(SCHEDULER_DAILY_CAPACITY=8)
+    def test_rebalance_moves_jobs_and_yields_to_later_edits(self):
+        jobs = [self.create_job(self.techs[0]) for _ in range(6)]
+        self.techs[1].daily_capacity = 6
+        self.techs[1].save()
+        changes, report = plan_schedule(self.day, self.day, rebalance=True)
+        self.assertEqual(report['moves'], 2)
+        self.assertEqual([(old, new) for _, old, new, _ in changes], [(self.techs[0].pk, self.techs[1].pk)] * 2)
+
+        moved = Job.objects.get(pk=changes[0][0])
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.assigned_to = None
+            moved.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(apply_schedule(changes), 1)
+        self.assertEqual(Job.objects.filter(pk__in=[job.pk for job in jobs], assigned_to=self.techs[1]).count(), 1)
+        self.assertEqual(diff_workload(), [])
+
+    def test_command_and_task(self):
+        job = self.create_job()
+        out = StringIO()
+        call_command('assign_jobs', start=self.day, end=self.day, dry_run=True, verbosity=2, stdout=out)
+        self.assertIn(f'job {job.pk} {self.day}: unassigned -> ', out.getvalue())
+        self.assertIn('Dry run', out.getvalue())
+        job.refresh_from_db()
+        self.assertIsNone(job.assigned_to)
+
+        report = assign_jobs(self.day.isoformat(), self.day.isoformat())
+        self.assertEqual((report['assigned'], report['written'], report['dry_run']), (1, 1, False))
+        job.refresh_from_db()
+        self.assertIsNotNone(job.assigned_to)
+
+
+class ArchiveTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.sales = User.objects.get(username='sales')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sales)
+        # Two jobs completed long ago, one just now
+        jobs = list(Job.objects.order_by('id'))
+        self.old = [jobs[0].pk, jobs[3].pk]
+        Job.objects.filter(pk=jobs[0].pk).update(external_id='CRM-1')
+        Job.objects.filter(pk__in=[*self.old, jobs[1].pk]).update(status='COMPLETED')
+        Job.objects.filter(pk__in=self.old).update(updated_at=timezone.now() - timedelta(days=91))
+
+    def snapshot(self, job_ids):
+        # The old jobs as the job list serves them, without updated_at
+        response = self.client.get('/api/jobs/', {'page_size': 100})
+        return [
+            {key: value for key, value in job.items() if key not in ('updated_at', 'archived_at')}
+            for job in response.data['results'] if job['id'] in job_ids
+        ]
+
+    def test_archive_moves_old_completed_jobs_and_restore_moves_them_back(self):
+        before = self.snapshot(self.old)
+        links = JobTask.required_equipment.through.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = archive_completed_jobs(days=90, batch_size=1)
+        self.assertEqual((stats['archived'], stats['chunks'], stats['complete']), (2, 2, True))
+        self.assertFalse(Job.objects.filter(pk__in=self.old).exists())
+        self.assertFalse(JobTask.objects.filter(job__in=self.old).exists())
+        self.assertEqual(ArchivedJobTask.objects.filter(job__in=self.old).count(), 8)
+        self.assertEqual(
+            JobTask.required_equipment.through.objects.count() + ArchivedJobTask.required_equipment.through.objects.count(),
+            links,
+        )
+        self.assertFalse(Checkpoint.objects.exists())
+        # Archived jobs count towards no workload and hold no equipment
+        self.assertEqual(diff_workload(), [])
+        self.assertEqual(diff_reservations(), [])
+
+        # Served by the archive endpoints as the job list served them
+        response = self.client.get('/api/jobs/archived/', {'page_size': 1})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(self.snapshot(self.old), [])
+        archived = [
+            {key: value for key, value in job.items() if key not in ('updated_at', 'archived_at')}
+            for job in self.client.get('/api/jobs/archived/').data['results']
+        ]
+        self.assertEqual(archived, before)
+        response = self.client.get(f'/api/jobs/archived/{self.old[1]}/')
+        self.assertEqual(response.data['assigned_to'], self.other.pk)
+        self.assertEqual(self.client.get(f'/api/jobs/archived/{Job.objects.first().pk}/').status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(restore_jobs(self.old), 2)
+        self.assertFalse(ArchivedJob.objects.exists())
+        self.assertEqual(self.snapshot(self.old), before)
+        self.assertEqual(diff_workload(), [])
+        self.assertEqual(diff_reservations(), [])
+        # Restored jobs count as written now
+        self.assertEqual(archive_completed_jobs(days=90)['archived'], 0)
+
+    def test_ingest_restores_an_archived_job(self):
+        call_command('archive_jobs', '--days', '90', stdout=StringIO())
+        response = self.client.post('/api/jobs/bulk/', {'jobs': [{
+            'external_id': 'CRM-1', 'title': 'Job 0 again', 'client_name': 'Client 0', 'assigned_to': 'tech',
+            'scheduled_date': timezone.now().isoformat(), 'tasks': [{'title': 'Revisit', 'equipment': ['DR123']}],
+        }]}, format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        job = Job.objects.get(external_id='CRM-1')
+        self.assertEqual((job.pk, job.title), (self.old[0], 'Job 0 again'))
+        self.assertEqual(list(ArchivedJob.objects.values_list('id', flat=True)), [self.old[1]])
+
+    def test_ingest_keeps_a_rejected_job_archived(self):
+        call_command('archive_jobs', '--days', '90', stdout=StringIO())
+        archived_at = ArchivedJob.objects.get(pk=self.old[0]).updated_at
+        response = self.client.post('/api/jobs/bulk/', {'jobs': [{
+            'external_id': 'CRM-1', 'title': 'Job 0 again', 'client_name': 'Client 0', 'assigned_to': 'nobody',
+            'scheduled_date': timezone.now().isoformat(), 'tasks': [{'title': 'Revisit', 'equipment': ['DR123']}],
+        }]}, format='json')
+        self.assertEqual(response.data['errors'][0]['index'], 0)
+        self.assertFalse(Job.objects.filter(external_id='CRM-1').exists())
+        job = ArchivedJob.objects.get(external_id='CRM-1')
+        self.assertEqual((job.pk, job.updated_at), (self.old[0], archived_at))
+
+    def test_permissions(self):
+        self.client.force_authenticate(self.tech)
+        self.assertEqual(self.client.get('/api/jobs/archived/').status_code, 403)
+
+
+class ExportTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='admin12345', role='ADMIN'))
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get('/api/export/tasks/', {'status': 'IN_PROGRESS'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        expected = list(JobTask.objects.filter(status='IN_PROGRESS').order_by('id').values_list('id', flat=True))
+        self.assertEqual([int(row['id']) for row in rows], expected)
+        self.assertEqual(rows[0]['job_title'], JobTask.objects.get(pk=expected[0]).job.title)
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/export/jobs/', {'output': 'ndjson', 'priority': 'MEDIUM'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), Job.objects.filter(priority='MEDIUM').count())
+        self.assertEqual(rows[0]['assigned_to'], 'tech')
+
+    async def test_asgi_export_streams_asynchronously(self):
+        expected = await sync_to_async(
+            lambda: b''.join(self.client.get('/api/export/tasks/', {'output': 'ndjson'}).streaming_content)
+        )()
+
+        request = AsyncRequestFactory().get('/api/export/tasks/', {'output': 'ndjson'})
+        force_authenticate(request, await User.objects.aget(username='admin'))
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            response = await sync_to_async(ExportView.as_view())(request, dataset='tasks')
+            self.assertTrue(response.is_async)
+            parts = [part async for part in response]
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(b''.join(parts), expected)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/jobs/', {'status': 'LOST'}).status_code, 400)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_data', 'task_equipment', '--chunk-size', '2', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'task_id,equipment_id,serial_number')
+        self.assertEqual(len(lines) - 1, JobTask.required_equipment.through.objects.count())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(DashboardDataMixin, TestCase):
+    # A second connection to the test database stands in for the replica.
+    # It is added after the test case wraps its databases in transactions, so
+    # it stays in autocommit and only sees committed rows. The test's rows
+    # never are, so whatever it serves looks like a replica that has not
+    # caught up yet.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings['replica'] = {**connections['default'].settings_dict}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='admin12345', role='ADMIN')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_lists_exports_and_dashboard_read_the_replica(self):
+        client = self.client_for(self.admin)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(client.get('/api/jobs/').data['results'], [])
+            self.assertEqual(client.get('/api/tasks/').data['results'], [])
+            response = client.get('/api/export/jobs/')
+            self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+                'id,external_id,title,description,client_name,status,priority,scheduled_date,overdue,'
+                'created_by,assigned_to,created_at,updated_at',
+            ])
+            self.assertEqual(self.client_for(self.tech).get('/api/technician-dashboard/').data, [])
+        # A page query per list (no prefetches for empty pages), the export and the dashboard's two
+        self.assertEqual(len(replica.captured_queries), 5)
+        self.assertEqual(router.db_for_write(Job), 'default')
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        task = JobTask.objects.filter(job__assigned_to=self.tech, status='UPCOMING').first()
+        client = self.client_for(self.tech)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                '/api/tasks/transitions/', {'transitions': [{'id': task.id, 'status': 'IN_PROGRESS'}]}, format='json'
+            )
+        self.assertEqual(response.data['errors'], [])
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(client.get('/api/technician-dashboard/').data, build_dashboard(self.tech))
+            # Other users still read the replica
+            self.assertEqual(self.client_for(self.admin).get('/api/jobs/').data['results'], [])
+        self.assertEqual(len(replica.captured_queries), 1)
+
+        # Pins expire with the cache entry
+        cache.clear()
+        self.assertEqual(client.get('/api/technician-dashboard/').data, [])
+
+    def test_dashboard_changes_pin_their_technician(self):
+        # A job moved to the other tech by someone else bumps their dashboard
+        job = Job.objects.filter(assigned_to=self.tech).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            job.assigned_to = self.other
+            job.save()
+        self.assertEqual(self.client_for(self.other).get('/api/technician-dashboard/').data, build_dashboard(self.other))
+        cache.clear()
+        self.assertEqual(self.client_for(self.other).get('/api/technician-dashboard/').data, [])
+
+    def test_without_replicas_everything_reads_the_primary(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = self.client_for(self.admin).post('/api/jobs/bulk/', {'jobs': []}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(cache.has_key(f'replica:pin:{self.admin.pk}'))
+            self.assertEqual(len(self.client_for(self.admin).get('/api/jobs/').data['results']), Job.objects.count())
+
+
+class LargeTableAdminTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Job.objects.filter(title='Job 3').update(title='Old Job 1')
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin12345', role='ADMIN',
+        )
+        self.client.force_login(self.admin)
+        # Row estimates, as autovacuum would have made them
+        with connection.cursor() as cursor:
+            for model in (User, Job, JobTask):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def changelist(self, model, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/admin/core/{model}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def titles(self, response):
+        return sorted(job.title for job in response.context['cl'].result_list)
+
+    def test_small_tables_are_counted_and_searched_by_substring(self):
+        response, queries = self.changelist('job', q='job 1')
+        self.assertEqual(self.titles(response), ['Job 1', 'Old Job 1'])
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertTrue(any('COUNT(*)' in sql for sql in queries))
+
+    @override_settings(ADMIN_LARGE_TABLE_ROWS=3)
+    def test_large_tables_are_estimated_and_searched_by_prefix(self):
+        response, queries = self.changelist('job')
+        self.assertEqual(response.context['cl'].result_count, 4)
+        self.assertIsNone(response.context['cl'].full_result_count)
+        self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql])
+
+        # A search the planner expects few rows for is counted exactly
+        response, queries = self.changelist('job', q='job 1')
+        self.assertEqual(self.titles(response), ['Job 1'])
+        self.assertTrue(any(sql.startswith('EXPLAIN') for sql in queries))
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+        response, _ = self.changelist('jobtask', q='task 1')
+        self.assertEqual(len(response.context['cl'].result_list), 4)
+
+    def test_job_filter_renders_the_selected_job_only(self):
+        job, other = Job.objects.order_by('id')[:2]
+        response, _ = self.changelist('jobtask')
+        self.assertNotContains(response, f'<option value="{job.pk}"')
+        response, _ = self.changelist('jobtask', job__id__exact=job.pk, status__exact='PENDING')
+        self.assertContains(response, f'<option value="{job.pk}" selected>{job}</option>', html=True)
+        self.assertNotContains(response, f'<option value="{other.pk}"')
+        # The other filters are kept when another job is picked
+        self.assertContains(response, '<input type="hidden" name="status__exact" value="PENDING">', html=True)
+        self.assertEqual([task.job_id for task in response.context['cl'].result_list], [job.pk])
+
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'core', 'model_name': 'jobtask', 'field_name': 'job', 'term': 'old',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Old Job 1 (Client 3)'])
+
+        response, _ = self.changelist('job', assigned_to__isnull='True')
+        self.assertEqual(response.context['cl'].result_list.count(), 0)
+
+
+class SearchTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username='sales'))
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def titles(self, results):
+        return [result['title'] for result in results]
+
+    def test_vectors_follow_writes(self):
+        job = Job.objects.get(title='Job 0')
+        job.title = 'Boiler service'
+        job.save()
+        Job.objects.filter(title='Job 1').update(client_name='Northwind Traders')
+        JobTask.objects.filter(job__title='Job 2', order=1).update(description='Replace the boiler valve')
+        self.client.post('/api/jobs/bulk/', {'jobs': [{
+            'external_id': 'crm-1', 'title': 'Imported', 'client_name': 'Boilerworks', 'assigned_to': 'tech',
+            'scheduled_date': timezone.now().isoformat(), 'tasks': [{'title': 'Survey'}],
+        }]}, format='json')
+
+        self.assertEqual(
+            sorted(self.titles(search_jobs('boiler'))), ['Boiler service', 'Imported', 'Job 2'],
+        )
+        self.assertEqual(self.titles(search_jobs('NORTHWIND trad')), ['Job 1'])
+        self.assertEqual(self.titles(search_jobs('survey')), ['Imported'])
+        self.assertEqual(search_jobs('boiler service northwind'), [])
+        self.assertEqual(search_jobs('&!:*'), [])
+
+    def test_ranking_and_matching_tasks(self):
+        Job.objects.filter(title='Job 3').update(title='Boiler service')
+        job = Job.objects.get(title='Job 1')
+        JobTask.objects.filter(job=job, order=2).update(title='Check boiler')
+
+        results = self.search(q='boiler')['results']
+        self.assertEqual(self.titles(results), ['Boiler service', 'Job 1'])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+        self.assertEqual(results[0]['tasks'], [])
+        task = JobTask.objects.get(job=job, order=2)
+        self.assertEqual(results[1]['tasks'], [{'id': task.pk, 'title': 'Check boiler', 'status': task.status}])
+        self.assertEqual(results[1]['client_name'], 'Client 1')
+        self.assertEqual(results[1]['assigned_to'], self.tech.pk)
+
+    def test_filters_and_pages(self):
+        data = self.search(q='task', assigned_to=self.tech.pk)
+        self.assertEqual(sorted(self.titles(data['results'])), ['Job 0', 'Job 1', 'Job 2'])
+        self.assertIsNone(data['next'])
+        self.assertEqual(len(data['results'][0]['tasks']), 4)
+
+        Job.objects.filter(title='Job 2').update(status='COMPLETED')
+        self.assertEqual(self.titles(self.search(q='task', status='COMPLETED')['results']), ['Job 2'])
+        later = (timezone.now() + timedelta(days=1)).isoformat()
+        self.assertEqual(sorted(self.titles(self.search(q='job', scheduled_from=later)['results'])), ['Job 2', 'Job 3'])
+
+        first = self.search(q='job', limit=3)
+        self.assertEqual(first['next'], 3)
+        rest = self.search(q='job', limit=3, offset=first['next'])
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+        self.assertEqual(len(set(self.titles(first['results'] + rest['results']))), 4)
+
+    def test_invalid_requests(self):
+        for params in ({}, {'q': 'job', 'limit': 0}, {'q': 'job', 'status': 'LOST'}, {'q': 'x' * 201}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/search/', params).status_code, 400)
+        self.client.force_authenticate(self.tech)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'job'}).status_code, 403)
+
+
+
+class SQLiteSearchTest(SimpleTestCase):
+    """search_jobs() on a SQLite database migrated from scratch, which has
+    no full-text search and falls back to substring matches."""
+    alias = 'search_sqlite'
+
+    @classmethod
+    def setUpClass(cls):
+        # Not in DATABASES, so the alias is only declared once it exists;
+        # the runner sets up and checks the declared ones before this runs
+        connections.settings[cls.alias] = connections.configure_settings({
+            'default': {}, cls.alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })[cls.alias]
+        cls.databases = {cls.alias}
+        # ReplicaRouter migrates the primary only
+        with override_settings(DATABASE_ROUTERS=[]):
+            connections[cls.alias].creation.create_test_db(verbosity=0, serialize=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.alias].close()
+        del connections[cls.alias]
+        del connections.settings[cls.alias]
+
+    def test_substring_fallback(self):
+        db = self.alias
+        # bulk_create(), as the signals of save() write to the primary
+        [sales] = User.objects.using(db).bulk_create([User(username='sales', role='SALES_AGENT')])
+        now = timezone.now()
+        jobs = Job.objects.using(db).bulk_create([
+            Job(title=title, description='', client_name=client, created_by=sales, scheduled_date=now + timedelta(days=day))
+            for day, (title, client) in enumerate([('Boiler service', 'Acme'), ('Survey', 'Boilerworks'), ('Roof', 'Acme')])
+        ])
+        JobTask.objects.using(db).bulk_create([
+            JobTask(job=jobs[2], title='Inspect', description='Check the BOILER flue'),
+            JobTask(job=jobs[2], title='Tiles', description=''),
+        ])
+
+        results = search_jobs('boil', Job.objects.using(db))
+        # Unranked, latest scheduled first
+        self.assertEqual([result['title'] for result in results], ['Roof', 'Survey', 'Boiler service'])
+        self.assertEqual({result['rank'] for result in results}, {0.0})
+        self.assertEqual([task['title'] for task in results[0]['tasks']], ['Inspect'])
+        self.assertEqual([result['title'] for result in search_jobs('acme roo', Job.objects.using(db))], ['Roof'])
+        self.assertEqual(search_jobs('boil', Job.objects.using(db), limit=1, offset=2)[0]['title'], 'Boiler service')
+
+
+class OutboxTest(DashboardDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        OutboxEvent.objects.all().delete()
+        self.job = Job.objects.filter(assigned_to=self.tech).order_by('id').first()
+        self.tasks = list(self.job.tasks.order_by('order'))
+
+    def events(self):
+        return [(event.event_type, event.payload) for event in OutboxEvent.objects.order_by('id')]
+
+    def job_event(self, job, status, previous):
+        return ('job.status_changed', {'job': job.pk, 'status': status, 'previous_status': previous})
+
+    def task_event(self, task, status, previous):
+        return (
+            'task.status_changed',
+            {'task': task.pk, 'job': task.job_id, 'status': status, 'previous_status': previous},
+        )
+
+    def test_saves_record_status_changes(self):
+        self.job.title = 'Renamed'
+        self.job.save()
+        self.job.status = 'IN_PROGRESS'
+        self.job.save()
+        task = JobTask.objects.get(pk=self.tasks[0].pk)
+        task.status = 'COMPLETED'
+        task.save()
+        new = JobTask.objects.create(job=self.job, title='Extra', description='')
+        # A status that was not loaded was not changed
+        Job.objects.only('id', 'title').get(pk=self.job.pk).save()
+
+        self.assertEqual(self.events(), [
+            self.job_event(self.job, 'IN_PROGRESS', 'PENDING'),
+            self.task_event(task, 'COMPLETED', 'UPCOMING'),
+            self.task_event(new, 'PENDING', None),
+        ])
+
+    def test_events_commit_with_the_change(self):
+        def fail_outbox_inserts(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "core_outboxevent"'):
+                raise DatabaseError('outbox unavailable')
+            return execute(sql, params, many, context)
+
+        self.job.status = 'COMPLETED'
+        with self.assertRaises(DatabaseError), connection.execute_wrapper(fail_outbox_inserts):
+            with transaction.atomic():
+                self.job.save()
+        self.assertEqual(Job.objects.get(pk=self.job.pk).status, 'PENDING')
+
+    def test_transitions_and_ingest_record_status_changes(self):
+        client = APIClient()
+        client.force_authenticate(self.tech)
+        client.post('/api/tasks/transitions/', {'transitions': [
+            {'id': task.pk, 'status': 'COMPLETED'} for task in self.tasks
+        ]}, format='json')
+        self.assertEqual(self.events(), [
+            *(self.task_event(task, 'COMPLETED', task.status) for task in self.tasks if task.status != 'COMPLETED'),
+            self.job_event(self.job, 'COMPLETED', 'PENDING'),
+        ])
+
+        OutboxEvent.objects.all().delete()
+        client.force_authenticate(User.objects.get(username='sales'))
+        item = {
+            'external_id': 'crm-1', 'title': 'Imported', 'client_name': 'Client', 'assigned_to': 'tech',
+            'scheduled_date': timezone.now().isoformat(), 'tasks': [{'title': 'A'}],
+        }
+        client.post('/api/jobs/bulk/', {'jobs': [item]}, format='json')
+        job = Job.objects.get(external_id='crm-1')
+        self.assertEqual(self.events(), [
+            self.job_event(job, 'PENDING', None), self.task_event(job.tasks.get(), 'PENDING', None),
+        ])
+        OutboxEvent.objects.all().delete()
+        client.post('/api/jobs/bulk/', {'jobs': [dict(item, status='IN_PROGRESS', tasks=[])]}, format='json')
+        self.assertEqual(self.events(), [self.job_event(job, 'IN_PROGRESS', 'PENDING')])
+
+    def test_publish_drains_the_outbox_in_batches(self):
+        for status in ('IN_PROGRESS', 'COMPLETED', 'PENDING'):
+            self.job.status = status
+            self.job.save()
+        events = list(OutboxEvent.objects.order_by('id'))
+        sink = MemorySink()
+        with CaptureQueriesContext(connection) as queries:
+            stats = publish_events(batch_size=2, sink=sink)
+        self.assertEqual((stats['published'], stats['batches'], stats['complete']), (3, 2, True))
+        self.assertTrue(any('FOR UPDATE SKIP LOCKED' in query['sql'] for query in queries))
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(sink.messages[0], {
+            'id': events[0].pk, 'dedup_key': str(events[0].dedup_key), 'type': 'job.status_changed',
+            'occurred_at': events[0].created_at.isoformat(),
+            'data': {'job': self.job.pk, 'status': 'IN_PROGRESS', 'previous_status': 'PENDING'},
+        })
+        self.assertEqual([message['data']['status'] for message in sink.messages], ['IN_PROGRESS', 'COMPLETED', 'PENDING'])
+
+    def test_failed_batches_are_published_again(self):
+        self.job.status = 'COMPLETED'
+        self.job.save()
+        key = str(OutboxEvent.objects.get().dedup_key)
+        unreachable = RedisStreamSink('redis://127.0.0.1:1/0', 'jobops:events', 1000)
+        with self.assertLogs('core.outbox', 'ERROR'):
+            stats = publish_events(sink=unreachable)
+        self.assertEqual((stats['published'], stats['complete']), (0, False))
+        self.assertTrue(OutboxEvent.objects.exists())
+
+        sink = MemorySink()
+        with override_settings(OUTBOX_SINK='memory'), mock.patch('core.outbox.get_sink', return_value=sink):
+            self.assertEqual(publish_outbox_events()['published'], 1)
+        self.assertEqual([message['dedup_key'] for message in sink.messages], [key])
+
+    def test_webhook_sink(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(204 if len(received) > 1 else 503)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        sink = WebhookSink(f'http://127.0.0.1:{server.server_port}/events', timeout=5)
+
+        self.job.status = 'COMPLETED'
+        self.job.save()
+        with self.assertLogs('core.outbox', 'ERROR'):
+            self.assertEqual(publish_events(sink=sink)['published'], 0)
+        self.assertEqual(publish_events(sink=sink)['published'], 1)
+        self.assertEqual(received[0], received[1])
+        self.assertEqual(received[1]['events'][0]['data']['status'], 'COMPLETED')
+
+
+class BenchmarkTest(TestCase):
+    def test_compare_flags_slower_p95_and_extra_queries(self):
+        baseline = {'dashboard': {'p95_ms': 10.0, 'queries': 2}, 'login': {'p95_ms': 100.0, 'queries': 1}}
+        results = {
+            'dashboard': {'p95_ms': 12.0, 'queries': 3},
+            'login': {'p95_ms': 140.0, 'queries': 1},
+            'job_list': {'p95_ms': 50.0, 'queries': 4},
+        }
+        self.assertEqual(compare(results, baseline, 0.25), [
+            'dashboard: 3 queries vs baseline 2',
+            'login: p95 140.0ms vs baseline 100.0ms',
+        ])
+
+    def test_run_scenario_reports_latency_and_queries(self):
+        call_command('generate_dummy_data', jobs=5, seed=1, stdout=StringIO())
+        result = run_scenario(SCENARIOS['job_list'], BenchmarkContext({}), iterations=3, warmup=1)
+        self.assertEqual(result['iterations'], 3)
+        # Page query, two prefetches and the user row the JWT is checked against
+        self.assertEqual(result['queries'], 4)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+
+class QueryCountGuardMixin:
+    """Run a call at each of ``sizes`` tasks and fail if its query count grows.
+
+    ``grow_to(size)`` adds rows up to ``size`` tasks; everything it and the
+    call write is rolled back before the next size. Queries are grouped by
+    their SQL before parameters are filled in, so the failure message names
+    the statement that runs once per row.
+    """
+    sizes = (10, 1000)
+
+    def grow_to(self, size):
+        raise NotImplementedError
+
+    def assertConstantQueries(self, call, prepare=None):
+        profiles = []
+        for size in self.sizes:
+            # Each size starts again from the fixture
+            with transaction.atomic():
+                self.grow_to(size)
+                cache.clear()
+                args = prepare() if prepare else ()
+                profile = profiling.RequestProfile()
+                with connection.execute_wrapper(profile.record_query):
+                    call(*args)
+                profiles.append((size, profile))
+                transaction.set_rollback(True)
+
+        (small_size, small), (large_size, large) = profiles[0], profiles[-1]
+        if large.query_count == small.query_count:
+            return
+        before, after = self.signatures(small), self.signatures(large)
+        grown = sorted(((count - before[sql], sql) for sql, count in after.items() if count > before[sql]), reverse=True)
+        report = '\n'.join(f'  +{extra}x {sql}' for extra, sql in grown[:5])
+        self.fail(
+            f'{small.query_count} queries at {small_size} tasks but {large.query_count} at {large_size} tasks; '
+            f'repeated SQL:\n{report}'
+        )
+
+    def signatures(self, profile):
+        # IN lists and multi-row VALUES differ in length between the runs
+        counts = Counter()
+        for sql, count in profile.queries.items():
+            sql = re.sub(r'\(%s(, %s)*\)', '(%s, ...)', sql)
+            counts[re.sub(r'(\(%s, \.\.\.\))(, \1)+', r'\1, ...', sql)] += count
+        return counts
+
+
+class QueryCountGuardTest(QueryCountGuardMixin, TestCase):
+    TASK_STATUSES = ['UPCOMING', 'IN_PROGRESS', 'COMPLETED', 'PENDING']
+    JOB_STATUSES = ['PENDING', 'IN_PROGRESS', 'COMPLETED']
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin12345', role='ADMIN',
+        )
+        self.tech = User.objects.create_user(username='tech', password='tech12345', role='TECHNICIAN')
+        self.other = User.objects.create_user(username='other', password='other12345', role='TECHNICIAN')
+        self.sales = User.objects.create_user(username='sales', password='sales12345', role='SALES_AGENT')
+        self.equipment = [
+            Equipment.objects.create(name=f'Equipment {i}', type='TOOL', serial_number=f'EQ{i}') for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def grow_to(self, size):
+        # Four tasks per job; odd jobs are past due, even ones flagged overdue
+        # while still in the future, so both overdue tasks have work
+        now = timezone.now()
+        first = Job.objects.count()
+        count = (size - JobTask.objects.count()) // 4
+        jobs = Job.objects.bulk_create([
+            Job(
+                title=f'Job {i}', description='', client_name=f'Client {i}',
+                created_by=self.sales, assigned_to=self.tech if i % 5 else self.other,
+                status=self.JOB_STATUSES[i % 3], overdue=i % 2 == 0,
+                scheduled_date=now + timedelta(days=-5 if i % 2 else 5, minutes=i),
+            )
+            for i in range(first, first + count)
+        ])
+        tasks = JobTask.objects.bulk_create([
+            JobTask(job=job, title=f'Task {j}', description='', status=status, order=j + 1)
+            for job in jobs for j, status in enumerate(self.TASK_STATUSES)
+        ])
+        through = JobTask.required_equipment.through
+        through.objects.bulk_create([
+            through(jobtask_id=task.id, equipment_id=equipment.id)
+            for k, task in enumerate(tasks) for equipment in self.equipment[:k % 3]
+        ])
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_technician_dashboard(self):
+        self.client.force_authenticate(self.tech)
+        self.assertConstantQueries(lambda: self.get('/api/technician-dashboard/'))
+
+    def test_job_and_task_lists(self):
+        self.assertConstantQueries(lambda: self.get('/api/jobs/', page_size=500))
+        self.assertConstantQueries(lambda: self.get('/api/tasks/', page_size=500))
+        self.assertConstantQueries(lambda: self.get('/api/search/', q='Task', limit=100))
+
+    def test_exports(self):
+        for dataset in ('jobs', 'tasks', 'equipment', 'task_equipment'):
+            with self.subTest(dataset=dataset):
+                self.assertConstantQueries(lambda: self.get(f'/api/export/{dataset}/', output='ndjson'))
+
+    def test_bulk_ingest(self):
+        def prepare():
+            # Same payload size at both table sizes: a growing payload also
+            # grows the number of insert batches, which is not an N+1
+            jobs = []
+            for job in Job.objects.order_by('-id')[:10]:
+                jobs.append({
+                    'external_id': f'ext-{job.pk}', 'title': job.title, 'client_name': job.client_name,
+                    'assigned_to': 'tech', 'scheduled_date': job.scheduled_date.isoformat(),
+                    'tasks': [{'title': f'Task {j}', 'equipment': ['EQ0', 'EQ1'][:j % 3]} for j in range(4)],
+                })
+            return (jobs,)
+
+        def call(jobs):
+            response = self.client.post('/api/jobs/bulk/', {'jobs': jobs}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['errors'], [])
+
+        self.assertConstantQueries(call, prepare)
+
+    def test_task_transitions(self):
+        def prepare():
+            ids = JobTask.objects.filter(job__assigned_to=self.tech).values_list('id', flat=True)
+            return ([{'id': task_id, 'status': 'IN_PROGRESS'} for task_id in ids],)
+
+        def call(transitions):
+            response = self.client.post('/api/tasks/transitions/', {'transitions': transitions}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(self.tech)
+        self.assertConstantQueries(call, prepare)
+
+    def test_equipment_availability(self):
+        items = [{'equipment': f'EQ{i % 3}', 'date': timezone.localdate().isoformat()} for i in range(10)]
+        self.assertConstantQueries(lambda: self.get('/api/equipment/available/'))
+        self.assertConstantQueries(lambda: self.get('/api/equipment/conflicts/'))
+        self.assertConstantQueries(lambda: self.client.post('/api/equipment/conflicts/', {'items': items}, format='json'))
+
+    def test_signup_login_and_metrics(self):
+        usernames = iter(f'new{i}' for i in range(len(self.sizes)))
+        self.assertConstantQueries(lambda: self.client.post('/api/signup/', {
+            'username': next(usernames), 'email': 'new@example.com', 'password': 'new12345', 'role': 'TECHNICIAN',
+        }))
+        self.assertConstantQueries(lambda: APIClient().post('/api/login/', {'username': 'tech', 'password': 'tech12345'}))
+        self.assertConstantQueries(lambda: self.get('/api/metrics/'))
+        self.assertConstantQueries(lambda: self.get('/api/workload/'))
+
+    def test_admin_changelists(self):
+        client = APIClient()
+        client.force_login(self.admin)
+        for model in ('user', 'job', 'jobtask', 'equipment', 'archivedjob'):
+            with self.subTest(model=model):
+                def call():
+                    response = client.get(f'/admin/core/{model}/')
+                    self.assertEqual(response.status_code, 200)
+                self.assertConstantQueries(call)
+
+    @override_settings(ADMIN_LARGE_TABLE_ROWS=0)
+    def test_admin_changelists_of_large_tables(self):
+        client = APIClient()
+        client.force_login(self.admin)
+
+        def prepare():
+            with connection.cursor() as cursor:
+                for model in (Job, JobTask):
+                    cursor.execute(f'ANALYZE {model._meta.db_table}')
+            return (Job.objects.order_by('id').values_list('id', flat=True).first(),)
+
+        for model, params in [
+            ('job', {}),
+            ('job', {'q': 'Job 1', 'status__exact': 'PENDING', 'assigned_to__id__exact': self.tech.pk}),
+            ('jobtask', {'q': 'Task'}),
+            ('jobtask', {'job__id__exact': None}),
+        ]:
+            with self.subTest(model=model, params=params):
+                def call(job_id):
+                    query = {name: job_id if value is None else value for name, value in params.items()}
+                    response = client.get(f'/admin/core/{model}/', query)
+                    self.assertEqual(response.status_code, 200)
+                self.assertConstantQueries(call, prepare)
+
+    def test_celery_tasks(self):
+        self.assertConstantQueries(flag_overdue_jobs)
+        self.assertConstantQueries(clear_overdue_jobs)
+        self.assertConstantQueries(rebuild_workload_rollup)
+        self.assertConstantQueries(rebuild_equipment_reservations)
+        self.assertConstantQueries(lambda: assign_jobs(rebalance=True))
+
+        def complete():
+            # The fixture's first jobs are not completed, so none would move
+            # at the smaller size
+            Job.objects.update(status='COMPLETED')
+            return ()
+
+        self.assertConstantQueries(lambda: archive_completed_jobs(days=0, batch_size=10000), complete)
+
+        def change_statuses():
+            # Three events at both sizes
+            job = Job.objects.order_by('id').first()
+            for status in ('IN_PROGRESS', 'COMPLETED', 'PENDING'):
+                job.status = status
+                job.save()
+            return ()
+
+        self.assertConstantQueries(lambda: publish_outbox_events(batch_size=2), change_statuses)
@@ -0,0 +1,124 @@
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+CACHE_PREFIX = 'login-throttle'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'30/min'`` -> tokens per second, or None for an empty rate."""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num) / PERIODS[period[0]]
+
+
+class TokenBucket:
+    """Token buckets kept in the Django cache, one per identifier.
+
+    An entry holds the tokens left and when they were counted. Tokens refill
+    at ``rate`` per second up to ``burst``, and an entry expires once its
+    bucket would be full again, which is the same as having no entry. Reading
+    and writing an entry are separate cache calls, so concurrent attempts can
+    take the same token; that lets a few extra attempts through, not a flood.
+    """
+
+    def __init__(self, scope, rate, burst):
+        self.scope = scope
+        self.rate = rate
+        self.burst = burst
+
+    def _key(self, ident):
+        return f'{CACHE_PREFIX}:{self.scope}:{ident}'
+
+    def _tokens(self, ident, now):
+        tokens, counted_at = cache.get(self._key(ident), (self.burst, now))
+        return min(self.burst, tokens + (now - counted_at) * self.rate)
+
+    def wait(self, ident):
+        """Seconds until ``ident`` has a token; 0 when it has one now."""
+        tokens = self._tokens(ident, time.time())
+        return 0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, ident):
+        """Take a token from ``ident``'s bucket and return 0, or return the
+        seconds until one is available when the bucket is empty.
+        """
+        now = time.time()
+        tokens = self._tokens(ident, now)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        tokens -= 1
+        cache.set(self._key(ident), (tokens, now), math.ceil((self.burst - tokens) / self.rate))
+        return 0
+
+
+class LoginThrottle(BaseThrottle):
+    """Rejects a login attempt with 429 once its bucket is empty.
+
+    DRF checks throttles before the view runs, so a rejected attempt costs
+    a cache read instead of a password hash. The bucket is configured by
+    ``LOGIN_THROTTLE_<SCOPE>_RATE`` and ``LOGIN_THROTTLE_<SCOPE>_BURST``; an
+    empty rate turns it off.
+    """
+    scope = None
+
+    def get_bucket(self):
+        rate = parse_rate(getattr(settings, f'LOGIN_THROTTLE_{self.scope.upper()}_RATE'))
+        if rate is None:
+            return None
+        return TokenBucket(self.scope, rate, getattr(settings, f'LOGIN_THROTTLE_{self.scope.upper()}_BURST'))
+
+    def get_login_ident(self, request):
+        raise NotImplementedError
+
+    def check(self, bucket, ident):
+        return bucket.take(ident)
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket()
+        ident = self.get_login_ident(request)
+        if bucket is None or ident is None:
+            return True
+        self.retry_after = self.check(bucket, ident)
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
+
+
+class LoginIPThrottle(LoginThrottle):
+    """Every attempt takes a token from the client IP's bucket."""
+    scope = 'ip'
+
+    def get_login_ident(self, request):
+        return self.get_ident(request)
+
+
+class LoginUsernameThrottle(LoginThrottle):
+    """Failed attempts take a token from the username's bucket.
+
+    A correct password costs nothing, but once a username is out of tokens
+    every attempt on it waits, including its owner's.
+    """
+    scope = 'username'
+
+    def get_login_ident(self, request):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        # Unvalidated input; hashed so any string makes a safe cache key
+        return hashlib.sha256(username.lower().encode()).hexdigest()
+
+    def check(self, bucket, ident):
+        return bucket.wait(ident)
+
+    def record_failure(self, request):
+        bucket = self.get_bucket()
+        ident = self.get_login_ident(request)
+        if bucket is not None and ident is not None:
+            bucket.take(ident)
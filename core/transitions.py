@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .dashboard import bump_dashboard_version
+from .models import Job, JobTask
+from .outbox import job_status_changed, record_events, task_status_changed
+from .reservations import mark_reservations_changed
+from .serializers import TaskTransitionSerializer
+from .workload import mark_workload_changed, workload_date
+
+
+def job_status(total, started, completed):
+    # A job is completed once all its tasks are, in progress once any started
+    if total and completed == total:
+        return 'COMPLETED'
+    if started:
+        return 'IN_PROGRESS'
+    return 'PENDING'
+
+
+def transition_tasks(user, transitions):
+    """Apply many ``{'id', 'status'}`` task transitions in one transaction.
+
+    Technicians may only move tasks on jobs assigned to them; admins may move
+    any task. When a task id appears more than once the last entry wins, as
+    offline clients replay their queue in order. Each target status is one
+    ``UPDATE ... WHERE id IN``, ``completed_at`` is set server-side, and the
+    parent jobs' statuses are recomputed from a single aggregate query. The
+    parent jobs are locked first, so concurrent transitions of one job's
+    tasks recompute its status one after the other, and ownership is checked
+    once they are locked. Every status that changes gets an outbox event.
+
+    Returns ``(tasks, jobs, errors)``.
+    """
+    errors = {}
+    targets = {}
+    validator = TaskTransitionSerializer()
+    for index, item in enumerate(transitions):
+        try:
+            data = validator.run_validation(item)
+        except ValidationError as exc:
+            errors[index] = exc.detail
+            continue
+        targets[data['id']] = (index, data['status'])
+
+    now = timezone.now()
+    with transaction.atomic():
+        # The jobs are locked before ownership is read, so a job reassigned
+        # meanwhile is seen with its new technician, who is then also the
+        # one whose dashboard and workload change
+        locked = dict(
+            Job.objects.filter(tasks__in=targets).order_by('id').select_for_update(of=('self',))
+            .values_list('id', 'status')
+        )
+        tasks = JobTask.objects.filter(id__in=targets)
+        if user.role != 'ADMIN':
+            tasks = tasks.filter(job__assigned_to=user.pk)
+        owned = {
+            task_id: (job_id, assignee, scheduled_date)
+            for task_id, job_id, assignee, scheduled_date in tasks.values_list(
+                'id', 'job_id', 'job__assigned_to_id', 'job__scheduled_date'
+            )
+        }
+        for task_id, (index, _) in list(targets.items()):
+            if task_id not in owned:
+                errors[index] = {'id': [f'Task {task_id} not found.']}
+                del targets[task_id]
+
+        by_status = {}
+        for task_id, (_, target) in targets.items():
+            by_status.setdefault(target, []).append(task_id)
+
+        job_ids = {owned[task_id][0] for task_id in targets}
+        previous_jobs = {job_id: status for job_id, status in locked.items() if job_id in job_ids}
+        previous_tasks = dict(JobTask.objects.filter(id__in=targets).values_list('id', 'status'))
+        for target, task_ids in by_status.items():
+            if target == 'COMPLETED':
+                # Keep the original completion time of tasks already completed
+                completed_at = Case(
+                    When(status='COMPLETED', completed_at__isnull=False, then=F('completed_at')),
+                    default=Value(now),
+                )
+            else:
+                completed_at = None
+            JobTask.objects.filter(id__in=task_ids).update(status=target, completed_at=completed_at, updated_at=now)
+
+        jobs = {}
+        counts = JobTask.objects.filter(job_id__in=job_ids).values('job_id').annotate(
+            total=Count('id'),
+            started=Count('id', filter=Q(status__in=['IN_PROGRESS', 'COMPLETED'])),
+            completed=Count('id', filter=Q(status='COMPLETED')),
+        )
+        for row in counts:
+            jobs[row['job_id']] = job_status(row['total'], row['started'], row['completed'])
+        by_job_status = {}
+        for job_id, status in jobs.items():
+            by_job_status.setdefault(status, []).append(job_id)
+        for status, ids in by_job_status.items():
+            Job.objects.filter(id__in=ids).exclude(status=status).update(status=status, updated_at=now)
+        # A task or job deleted meanwhile counts as unchanged
+        events = [
+            task_status_changed(task_id, owned[task_id][0], target, previous_tasks[task_id])
+            for task_id, (_, target) in targets.items() if previous_tasks.get(task_id, target) != target
+        ]
+        events += [
+            job_status_changed(job_id, status, previous_jobs[job_id])
+            for job_id, status in jobs.items() if previous_jobs.get(job_id, status) != status
+        ]
+        record_events(events)
+
+        # update() sends no signals, so invalidate the dashboards here
+        user_ids = {owned[task_id][1] for task_id in targets}
+        transaction.on_commit(lambda: bump_dashboard_version(*user_ids))
+        mark_workload_changed({(owned[task_id][1], workload_date(owned[task_id][2])) for task_id in targets})
+        mark_reservations_changed(job_ids)
+
+    results = list(
+        JobTask.objects.filter(id__in=targets).order_by('id').values('id', 'job_id', 'status', 'completed_at')
+    )
+    return (
+        results,
+        [{'id': job_id, 'status': status} for job_id, status in sorted(jobs.items())],
+        [{'index': index, 'errors': errors[index]} for index in sorted(errors)],
+    )
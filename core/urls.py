@@ -1,8 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from .views import SignupView, CustomTokenObtainPairView, TechnicianDashboardView
+from .async_views import AsyncTechnicianDashboardView, AsyncTokenObtainPairView
+from .views import (
+    SignupView, CustomTokenObtainPairView, TechnicianDashboardView, MetricsView,
+    JobListView, JobTaskListView, BulkJobIngestView, TaskTransitionView,
+    ExportView, WorkloadView, EquipmentAvailableView, EquipmentConflictView, ArchivedJobListView,
+    ArchivedJobDetailView, SearchView,
+)
+
+# ASYNC_VIEWS serves login and the dashboard from async views under ASGI
+if settings.ASYNC_VIEWS:
+    LoginView, DashboardView = AsyncTokenObtainPairView, AsyncTechnicianDashboardView
+else:
+    LoginView, DashboardView = CustomTokenObtainPairView, TechnicianDashboardView
 
 urlpatterns = [
     path('signup/', SignupView.as_view(), name='signup'),
-    path('login/', CustomTokenObtainPairView.as_view(), name='login'),
-    path('technician-dashboard/', TechnicianDashboardView.as_view(), name='technician-dashboard'),
+    path('login/', LoginView.as_view(), name='login'),
+    path('technician-dashboard/', DashboardView.as_view(), name='technician-dashboard'),
+    path('jobs/', JobListView.as_view(), name='job-list'),
+    path('jobs/bulk/', BulkJobIngestView.as_view(), name='job-bulk'),
+    path('jobs/archived/', ArchivedJobListView.as_view(), name='archived-job-list'),
+    path('jobs/archived/<int:pk>/', ArchivedJobDetailView.as_view(), name='archived-job-detail'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('tasks/', JobTaskListView.as_view(), name='jobtask-list'),
+    path('tasks/transitions/', TaskTransitionView.as_view(), name='task-transitions'),
+    path('export/<str:dataset>/', ExportView.as_view(), name='export'),
+    path('workload/', WorkloadView.as_view(), name='workload'),
+    path('equipment/available/', EquipmentAvailableView.as_view(), name='equipment-available'),
+    path('equipment/conflicts/', EquipmentConflictView.as_view(), name='equipment-conflicts'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
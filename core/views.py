@@ -1,13 +1,34 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .serializers import UserSerializer, CustomTokenObtainPairSerializer, TechnicianDashboardSerializer
-from .permissions import IsAdmin, IsTechnician
-from .models import JobTask
-from django.db.models import Q
-from django.db.models.functions import TruncDate
+from .serializers import (
+    UserSerializer, CustomTokenObtainPairSerializer, JobSerializer, JobTaskListSerializer, WorkloadQuerySerializer,
+    EquipmentQuerySerializer, ArchivedJobSerializer, SearchQuerySerializer,
+)
+from .permissions import IsAdmin, IsTechnician, IsSalesAgent
+from .filters import ArchivedJobFilter, JobFilter, JobTaskFilter
+from .models import ArchivedJob, Job, JobTask
+from .pagination import KeysetPagination
+from .ingest import ingest_jobs
+from .transitions import transition_tasks
+from .export import DATASETS, OUTPUT_FORMATS, aexport_rows, export_queryset, export_rows
+from .conditional import ConditionalGetMixin
+from .dashboard import dashboard_etag, dashboard_key, get_dashboard
+from .metrics import render_metrics
+from .throttling import LoginIPThrottle, LoginUsernameThrottle
+from .workload import read_workload
+from .reservations import check_reservations, equipment_conflicts, free_equipment
+from .routers import ReplicaReadMixin
+from .search import search_jobs
 
 class SignupView(APIView):
     permission_classes = [IsAdmin]
@@ -25,31 +46,214 @@ class SignupView(APIView):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    # Checked before the serializer authenticates, so floods skip the hashing
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
 
-class TechnicianDashboardView(APIView):
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            LoginUsernameThrottle().record_failure(request)
+            raise
+
+class TechnicianDashboardView(ReplicaReadMixin, ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated, IsTechnician]
 
+    def get_validators(self, request):
+        # The payload below comes from the cache entry the ETag names
+        self.dashboard_key = dashboard_key(request.user)
+        return dashboard_etag(self.dashboard_key), None
+
+    def get(self, request):
+        return Response(get_dashboard(request.user, self.dashboard_key))
+
+
+class JobListView(ReplicaReadMixin, ListAPIView):
+    permission_classes = [IsAdmin | IsSalesAgent]
+    serializer_class = JobSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = JobFilter
+    queryset = Job.objects.prefetch_related('tasks__required_equipment')
+
+
+class JobTaskListView(ReplicaReadMixin, ListAPIView):
+    permission_classes = [IsAdmin | IsSalesAgent]
+    serializer_class = JobTaskListSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('job__scheduled_date', 'id')
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = JobTaskFilter
+    queryset = JobTask.objects.select_related('job').prefetch_related('required_equipment')
+
+
+class ArchivedJobListView(ReplicaReadMixin, ListAPIView):
+    # Jobs moved out of the live tables by core.archive, as JobListView pages them
+    permission_classes = [IsAdmin | IsSalesAgent]
+    serializer_class = ArchivedJobSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ArchivedJobFilter
+    queryset = ArchivedJob.objects.prefetch_related('tasks__required_equipment')
+
+
+class ArchivedJobDetailView(ReplicaReadMixin, RetrieveAPIView):
+    permission_classes = [IsAdmin | IsSalesAgent]
+    serializer_class = ArchivedJobSerializer
+    queryset = ArchivedJob.objects.prefetch_related('tasks__required_equipment')
+
+
+class SearchView(ReplicaReadMixin, APIView):
+    # Full-text search over jobs, their clients and tasks, narrowed by the
+    # job list's filters
+    permission_classes = [IsAdmin | IsSalesAgent]
+
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        jobs = JobFilter(request.query_params, queryset=Job.objects.all())
+        if not jobs.is_valid():
+            return Response(jobs.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = search_jobs(params['q'], jobs.qs, params['limit'], params['offset'])
+        return Response({
+            'q': params['q'],
+            # Pass as ``offset`` for the next page
+            'next': params['offset'] + params['limit'] if len(results) == params['limit'] else None,
+            'results': results,
+        })
+
+
+class BulkJobIngestView(APIView):
+    permission_classes = [IsAdmin | IsSalesAgent]
+
+    def post(self, request):
+        items = request.data.get('jobs') if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
+            return Response({'jobs': ['Expected a list of jobs.']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_INGEST_MAX_ITEMS:
+            return Response(
+                {'jobs': [f'At most {settings.BULK_INGEST_MAX_ITEMS} jobs per request.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        results, errors = ingest_jobs(items, request.user)
+        return Response({
+            'created': sum(1 for result in results if result['created']),
+            'updated': sum(1 for result in results if not result['created']),
+            'results': results,
+            'errors': errors,
+        })
+
+
+class TaskTransitionView(APIView):
+    permission_classes = [IsTechnician | IsAdmin]
+
+    def post(self, request):
+        transitions = request.data.get('transitions') if isinstance(request.data, dict) else None
+        if not isinstance(transitions, list):
+            return Response({'transitions': ['Expected a list of transitions.']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(transitions) > settings.TASK_TRANSITIONS_MAX_ITEMS:
+            return Response(
+                {'transitions': [f'At most {settings.TASK_TRANSITIONS_MAX_ITEMS} transitions per request.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        tasks, jobs, errors = transition_tasks(request.user, transitions)
+        return Response({'tasks': tasks, 'jobs': jobs, 'errors': errors})
+
+
+class ExportView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request, dataset):
+        # ``output`` rather than ``format``, which DRF reserves for renderers
+        output = request.query_params.get('output', 'csv')
+        if dataset not in DATASETS or output not in OUTPUT_FORMATS:
+            return Response(
+                {'detail': f"Expected one of {', '.join(DATASETS)} as ndjson or csv."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        try:
+            queryset, columns = export_queryset(dataset, request.query_params)
+        except ValueError as exc:
+            return Response(exc.args[0], status=status.HTTP_400_BAD_REQUEST)
+        # Rows are streamed after the view returns, so the alias is fixed now
+        queryset = queryset.using(router.db_for_read(queryset.model))
+        # ASGI only streams async iterators; it would buffer a sync one whole
+        rows = aexport_rows if isinstance(request._request, ASGIRequest) else export_rows
+        response = StreamingHttpResponse(rows(queryset, columns, output), content_type=OUTPUT_FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{output}"'
+        return response
+
+
+class WorkloadView(APIView):
+    # Technicians see their own workload; admins anyone's, or everyone's summed
+    permission_classes = [IsAdmin | IsTechnician]
+
+    def get(self, request):
+        query = WorkloadQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        filters = {field: params[field] for field in ('status', 'priority') if field in params}
+        if request.user.role == 'TECHNICIAN':
+            filters['technician_id'] = request.user.pk
+        elif 'technician' in params:
+            filters['technician_id'] = params['technician']
+        return Response({
+            'start': params['start'],
+            'end': params['end'],
+            'group_by': params['group_by'],
+            'results': read_workload(params['start'], params['end'], params['group_by'], **filters),
+        })
+
+
+class EquipmentAvailableView(APIView):
+    permission_classes = [IsAdmin | IsSalesAgent]
+
+    def get(self, request):
+        query = EquipmentQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        results = free_equipment(
+            params['start'], params['end'], params.get('type'), params.get('after'), params['limit'],
+        )
+        return Response({
+            'start': params['start'],
+            'end': params['end'],
+            # Pass as ``after`` for the next page
+            'next': results[-1]['id'] if len(results) == params['limit'] else None,
+            'results': results,
+        })
+
+
+class EquipmentConflictView(APIView):
+    # GET lists double-booked equipment; POST checks planned bookings
+    permission_classes = [IsAdmin | IsSalesAgent]
+
+    def get(self, request):
+        query = EquipmentQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        return Response({
+            'start': params['start'],
+            'end': params['end'],
+            'results': equipment_conflicts(params['start'], params['end'], params.get('type'), params['limit']),
+        })
+
+    def post(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
+            return Response({'items': ['Expected a list of items.']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.EQUIPMENT_CHECK_MAX_ITEMS:
+            return Response(
+                {'items': [f'At most {settings.EQUIPMENT_CHECK_MAX_ITEMS} items per request.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        results, errors = check_reservations(items)
+        return Response({'results': results, 'errors': errors})
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdmin]
+
     def get(self, request):
-        # Get upcoming and in-progress tasks for the authenticated technician's jobs
-        tasks = JobTask.objects.filter(
-            Q(job__assigned_to=request.user) &
-            (Q(status='UPCOMING') | Q(status='IN_PROGRESS'))
-        ).annotate(
-            date=TruncDate('job__scheduled_date')  # Group by Job.scheduled_date
-        ).order_by('job__scheduled_date').prefetch_related('required_equipment')
-
-        # Group tasks by date
-        grouped_tasks = {}
-        for task in tasks:
-            date_str = task.date.strftime('%Y-%m-%d')
-            if date_str not in grouped_tasks:
-                grouped_tasks[date_str] = []
-            grouped_tasks[date_str].append(task)
-
-        # Serialize grouped data
-        data = [
-            {'date': date, 'tasks': tasks}
-            for date, tasks in grouped_tasks.items()
-        ]
-        serializer = TechnicianDashboardSerializer(data, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,157 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .deferred import WORKLOAD_LOCKS, day_key, lock_keys, on_commit_batched
+from .models import Job, WorkloadRollup
+
+# Counts kept per (technician, date, status, priority)
+COUNTS = ('jobs', 'overdue_jobs', 'open_tasks')
+KEY_FIELDS = ('technician_id', 'date', 'status', 'priority')
+# GET /api/workload/ group_by names and their fields
+GROUPS = {'technician': 'technician_id', 'date': 'date', 'status': 'status', 'priority': 'priority'}
+# Buckets recomputed per statement, and rows inserted per statement by a rebuild
+REFRESH_BATCH_SIZE = 500
+REBUILD_BATCH_SIZE = 2000
+
+
+def workload_date(scheduled_date):
+    # The day a job counts towards, in the same time zone TruncDate uses
+    return timezone.localdate(scheduled_date)
+
+
+def _day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _between(start, end):
+    # Jobs and rollup rows of the days from start to end, either one open;
+    # unassigned jobs count towards nobody's workload
+    jobs, stored = Job.objects.filter(assigned_to__isnull=False), WorkloadRollup.objects.all()
+    if start is not None:
+        jobs = jobs.filter(scheduled_date__gte=_day_range(start)[0])
+        stored = stored.filter(date__gte=start)
+    if end is not None:
+        jobs = jobs.filter(scheduled_date__lt=_day_range(end)[1])
+        stored = stored.filter(date__lte=end)
+    return jobs, stored
+
+
+def live_workload(jobs):
+    """Aggregate ``jobs`` into rollup rows, straight from the live tables."""
+    return jobs.annotate(date=TruncDate('scheduled_date')).values(
+        'assigned_to_id', 'date', 'status', 'priority'
+    ).annotate(
+        jobs=Count('id', distinct=True),
+        overdue_jobs=Count('id', filter=Q(overdue=True), distinct=True),
+        open_tasks=Count('tasks', filter=~Q(tasks__status='COMPLETED')),
+    ).order_by()
+
+
+def _rollup_rows(jobs):
+    for row in live_workload(jobs).iterator(chunk_size=REBUILD_BATCH_SIZE):
+        yield WorkloadRollup(
+            technician_id=row['assigned_to_id'], date=row['date'], status=row['status'],
+            priority=row['priority'], **{count: row[count] for count in COUNTS},
+        )
+
+
+def refresh_workload(buckets):
+    """Recompute the rollup rows of ``buckets``, ``(technician id, date)``
+    pairs, from the live tables.
+
+    Each bucket is locked before it is read, so of two refreshes racing on a
+    bucket the second one reads what the first one saw and anything
+    committed since. Returns the number of buckets refreshed.
+    """
+    buckets = sorted({bucket for bucket in buckets if None not in bucket})
+    for start in range(0, len(buckets), REFRESH_BATCH_SIZE):
+        batch = buckets[start:start + REFRESH_BATCH_SIZE]
+        live, stored = Q(), Q()
+        for technician_id, day in batch:
+            day_start, day_end = _day_range(day)
+            live |= Q(assigned_to=technician_id, scheduled_date__gte=day_start, scheduled_date__lt=day_end)
+            stored |= Q(technician=technician_id, date=day)
+        with transaction.atomic():
+            lock_keys(WORKLOAD_LOCKS, [day_key(technician_id, day) for technician_id, day in batch])
+            rows = list(_rollup_rows(Job.objects.filter(live)))
+            WorkloadRollup.objects.filter(stored).delete()
+            WorkloadRollup.objects.bulk_create(rows)
+    return len(buckets)
+
+
+def mark_workload_changed(buckets):
+    """Refresh ``buckets`` once the current transaction commits, together
+    with every other bucket it marks; outside a transaction, right away.
+    """
+    on_commit_batched('workload', refresh_workload, buckets)
+
+
+def job_buckets(jobs):
+    """The buckets of ``jobs``, a queryset, as of now."""
+    return {
+        (technician_id, workload_date(scheduled_date))
+        for technician_id, scheduled_date in jobs.values_list('assigned_to_id', 'scheduled_date')
+    }
+
+
+def rebuild_workload(start=None, end=None):
+    """Rebuild the rollup from the live tables, for days from ``start`` to
+    ``end`` inclusive, or for every day.
+
+    The table is locked against other writers while it is rebuilt, so
+    refreshes queued behind the lock recompute their buckets afterwards;
+    readers are not blocked. Returns the number of rows written.
+    """
+    jobs, stored = _between(start, end)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {WorkloadRollup._meta.db_table} IN EXCLUSIVE MODE')
+        stored.delete()
+        written = 0
+        rows = _rollup_rows(jobs)
+        while batch := list(islice(rows, REBUILD_BATCH_SIZE)):
+            WorkloadRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def diff_workload(start=None, end=None):
+    """Compare the rollup with a live aggregate. Returns a list of
+    ``(key, stored counts, live counts)`` for every row that differs, where a
+    missing row's counts are None.
+    """
+    jobs, stored = _between(start, end)
+    live = {
+        (row['assigned_to_id'], row['date'], row['status'], row['priority']): tuple(row[c] for c in COUNTS)
+        for row in live_workload(jobs)
+    }
+    rolled = {row[:4]: row[4:] for row in stored.values_list(*KEY_FIELDS, *COUNTS)}
+    return [
+        (key, rolled.get(key), live.get(key))
+        for key in sorted(live.keys() | rolled.keys())
+        if rolled.get(key) != live.get(key)
+    ]
+
+
+def read_workload(start, end, group_by, **filters):
+    """Sum the rollup rows of the days from ``start`` to ``end`` by the
+    ``group_by`` names, in that order. One indexed read of the rollup, however
+    many jobs the days hold.
+    """
+    rows = WorkloadRollup.objects.filter(date__gte=start, date__lte=end, **filters)
+    sums = {f'sum_{count}': Sum(count) for count in COUNTS}
+    if not group_by:
+        totals = rows.aggregate(**sums)
+        return [{count: totals[f'sum_{count}'] or 0 for count in COUNTS}]
+    fields = [GROUPS[name] for name in group_by]
+    return [
+        {
+            **{name: row[GROUPS[name]] for name in group_by},
+            **{count: row[f'sum_{count}'] for count in COUNTS},
+        }
+        for row in rows.values(*fields).annotate(**sums).order_by(*fields)
+    ]
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jobops.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from core.streams import DASHBOARD_EVENTS_PATH, dashboard_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Event streams are long-lived, so they bypass Django's request cycle
+    if scope['type'] == 'http' and scope['path'] == DASHBOARD_EVENTS_PATH:
+        return await dashboard_events(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -16,6 +17,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'django_filters',
@@ -31,6 +33,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Disabled (removed at startup) unless DATABASE_REPLICA_HOSTS is set
+    'core.middleware.ReplicaPinMiddleware',
+    # Disabled (removed at startup) unless REQUEST_PROFILING_SAMPLE_RATE > 0
+    'core.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'jobops.urls'
@@ -62,9 +68,115 @@ DATABASES = {
         'PASSWORD': config('DATABASE_PASSWORD'),
         'HOST': config('DATABASE_HOST'),
         'PORT': config('DATABASE_PORT'),
+        # Connections are reused by the requests a worker thread serves for
+        # up to DATABASE_CONN_MAX_AGE seconds (0 opens one per request), and
+        # pinged before the first query of each request reusing one, so a
+        # connection the server dropped is replaced instead of failing the
+        # request. Django 4.2 has no pool of its own: under jobops.asgi, or
+        # with more workers than the server takes connections, set 0 and put
+        # PgBouncer in front.
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool),
     }
 }
 
+# Read replicas as comma-separated host[:port], reached with the primary's
+# name and credentials as aliases replica1, replica2, ... The dashboard, job
+# and task lists and exports read from one of them, except for users pinned
+# to the primary for DATABASE_REPLICA_PIN_SECONDS after a write of theirs or
+# one changing their dashboard; keep it above the replication lag.
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, config('DATABASE_REPLICA_HOSTS', default='').split(',')), 1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # Tests read the test database through it
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=10, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='jobops'),
+    }
+}
+# Backends whose entries only the writing process sees. Features that rely
+# on other processes seeing a write (token revocation) refuse to start on
+# them.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SHARED_CACHE = CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+if DATABASE_REPLICAS and not SHARED_CACHE:
+    raise ImproperlyConfigured(
+        'DATABASE_REPLICA_HOSTS needs a CACHE_BACKEND shared between processes, such as '
+        'django.core.cache.backends.redis.RedisCache, so every worker sees who is pinned to the primary'
+    )
+
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+# /api/events/dashboard/, served by jobops.asgi: 'memory' wakes streams on
+# writes made in the same process, 'redis' on writes made in any process,
+# through DASHBOARD_EVENTS_REDIS_URL. Idle streams get a keepalive comment
+# every DASHBOARD_EVENTS_KEEPALIVE seconds.
+DASHBOARD_EVENTS_BACKEND = config('DASHBOARD_EVENTS_BACKEND', default='memory')
+DASHBOARD_EVENTS_REDIS_URL = config('DASHBOARD_EVENTS_REDIS_URL', default='redis://localhost:6379/2')
+DASHBOARD_EVENTS_KEEPALIVE = config('DASHBOARD_EVENTS_KEEPALIVE', default=15, cast=float)
+
+# POST /api/jobs/bulk/: jobs per request and jobs written per transaction
+BULK_INGEST_MAX_ITEMS = config('BULK_INGEST_MAX_ITEMS', default=10000, cast=int)
+BULK_INGEST_CHUNK_SIZE = config('BULK_INGEST_CHUNK_SIZE', default=500, cast=int)
+
+# POST /api/tasks/transitions/: transitions per request
+TASK_TRANSITIONS_MAX_ITEMS = config('TASK_TRANSITIONS_MAX_ITEMS', default=5000, cast=int)
+
+# GET /api/workload/: days per request
+WORKLOAD_MAX_DAYS = config('WORKLOAD_MAX_DAYS', default=366, cast=int)
+
+# /api/equipment/available/ and /api/equipment/conflicts/: days per request,
+# and items per conflict check
+EQUIPMENT_MAX_DAYS = config('EQUIPMENT_MAX_DAYS', default=92, cast=int)
+EQUIPMENT_CHECK_MAX_ITEMS = config('EQUIPMENT_CHECK_MAX_ITEMS', default=5000, cast=int)
+
+# GET /api/search/: matching jobs, and matching tasks, ranked per search. A
+# search matching more ranks the first ones its index finds.
+SEARCH_MAX_CANDIDATES = config('SEARCH_MAX_CANDIDATES', default=1000, cast=int)
+
+# /api/export/ and export_data: rows fetched per server-side cursor round trip
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Fraction of requests profiled by RequestProfilingMiddleware (0 turns it off)
+REQUEST_PROFILING_SAMPLE_RATE = config('REQUEST_PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+
+# Password hashing. The first hasher hashes new passwords, the others only
+# verify existing hashes. A password stored by another hasher, or with a
+# different PASSWORD_HASH_ITERATIONS, is rehashed on the user's next
+# successful login, so both can change without a password reset.
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=600000, cast=int)
+PASSWORD_HASHERS = list(dict.fromkeys([
+    config('PASSWORD_HASHER', default='core.hashers.TunablePBKDF2PasswordHasher'),
+    'core.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]))
+
+# /api/login/ and /api/token/: token buckets checked before any password is
+# hashed. Every attempt takes a token from its client IP's bucket, every
+# failed one also from its username's. Rates are '<tokens>/<s|min|hour|day>',
+# refilled continuously up to BURST; an empty rate turns a bucket off.
+LOGIN_THROTTLE_IP_RATE = config('LOGIN_THROTTLE_IP_RATE', default='30/min')
+LOGIN_THROTTLE_IP_BURST = config('LOGIN_THROTTLE_IP_BURST', default=20, cast=int)
+LOGIN_THROTTLE_USERNAME_RATE = config('LOGIN_THROTTLE_USERNAME_RATE', default='10/hour')
+LOGIN_THROTTLE_USERNAME_BURST = config('LOGIN_THROTTLE_USERNAME_BURST', default=10, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -89,13 +201,33 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
+# Serve login (/api/login/, /api/token/) and the technician dashboard from
+# async views, which run on the event loop under jobops.asgi instead of
+# taking a thread per request. Under WSGI they still work, but gain nothing.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Authenticate API requests from the JWT claims alone, without loading the
+# user row; the token version each user's tokens must carry is cached. A
+# revocation must reach every worker's cache, so this needs a shared one.
+JWT_STATELESS_AUTH = config('JWT_STATELESS_AUTH', default=False, cast=bool)
+TOKEN_VERSION_CACHE_TIMEOUT = config('TOKEN_VERSION_CACHE_TIMEOUT', default=300, cast=int)
+if JWT_STATELESS_AUTH and not SHARED_CACHE:
+    raise ImproperlyConfigured(
+        'JWT_STATELESS_AUTH needs a CACHE_BACKEND shared between processes, such as '
+        'django.core.cache.backends.redis.RedisCache'
+    )
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Proxies in front of the app that append to X-Forwarded-For. At 0 the
+    # login throttles key on REMOTE_ADDR; DRF's own default of None would
+    # trust whatever X-Forwarded-For a client sends.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 SIMPLE_JWT = {
@@ -110,4 +242,35 @@ CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'UTC'
\ No newline at end of file
+CELERY_TIMEZONE = 'UTC'
+
+# core.scheduling: jobs per technician day for technicians without their own
+# daily_capacity, and days ahead a run plans when given no end
+SCHEDULER_DAILY_CAPACITY = config('SCHEDULER_DAILY_CAPACITY', default=8, cast=int)
+SCHEDULER_HORIZON_DAYS = config('SCHEDULER_HORIZON_DAYS', default=7, cast=int)
+
+# flag_overdue_jobs / clear_overdue_jobs: rows per transaction and seconds per run
+OVERDUE_BATCH_SIZE = config('OVERDUE_BATCH_SIZE', default=1000, cast=int)
+OVERDUE_TIME_BUDGET = config('OVERDUE_TIME_BUDGET', default=60, cast=float)
+
+# Django admin: tables PostgreSQL estimates at more rows than this are
+# counted from estimates and searched by prefix (core.admin.LargeTableAdmin)
+ADMIN_LARGE_TABLE_ROWS = config('ADMIN_LARGE_TABLE_ROWS', default=100000, cast=int)
+
+# archive_completed_jobs: days a completed job stays in the live tables, jobs
+# moved per transaction and seconds per run
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=90, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=500, cast=int)
+ARCHIVE_TIME_BUDGET = config('ARCHIVE_TIME_BUDGET', default=60, cast=float)
+
+# publish_outbox_events: where job and task status changes are published
+# ('memory' keeps them in the process, for tests; 'redis' appends them to a
+# stream; 'webhook' POSTs them), events per transaction and seconds per run
+OUTBOX_SINK = config('OUTBOX_SINK', default='memory')
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=500, cast=int)
+OUTBOX_TIME_BUDGET = config('OUTBOX_TIME_BUDGET', default=60, cast=float)
+OUTBOX_REDIS_URL = config('OUTBOX_REDIS_URL', default='redis://localhost:6379/3')
+OUTBOX_REDIS_STREAM = config('OUTBOX_REDIS_STREAM', default='jobops:events')
+OUTBOX_REDIS_MAXLEN = config('OUTBOX_REDIS_MAXLEN', default=1000000, cast=int)
+OUTBOX_WEBHOOK_URL = config('OUTBOX_WEBHOOK_URL', default='')
+OUTBOX_WEBHOOK_TIMEOUT = config('OUTBOX_WEBHOOK_TIMEOUT', default=10, cast=float)
\ No newline at end of file